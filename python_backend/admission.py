@@ -0,0 +1,263 @@
+"""
+Admission control for work that calls the model.
+
+Requests are admitted by priority class, each with its own concurrency limit
+and tokens/minute budget, before any prompt is sent. Interactive work (student
+Q&A) goes ahead of bulk work (summaries, batches, imports): a bulk request is
+held back while an interactive one is waiting for admission, and while the
+shared LLM budget is down to the reserve kept for interactive calls.
+
+A request that cannot be admitted at once is deferred for up to its class's
+max_wait; if it would wait longer, or too many requests of its class are
+already waiting, it is shed with AdmissionRejected, which carries the
+Retry-After to send back. Background work can pass max_wait=None to wait as
+long as it takes.
+
+try_admit() never blocks, so the same controller serves threads (admit) and
+the event loop (aadmit), like llm_client.RateLimiter.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llm_client import llm_processes
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, message: str, retry_after: float, priority_class: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.priority_class = priority_class
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class PriorityClass:
+    """
+    Concurrency slots plus a tokens/minute bucket refilled continuously. A
+    request larger than the whole budget is admitted once the bucket is full
+    and leaves it in debt, so an oversized request is slow, never impossible.
+    """
+
+    def __init__(self, name: str, priority: int, concurrency: int, tokens_per_minute: float,
+                 max_wait: float, max_queue: int):
+        self.name = name
+        self.priority = priority
+        self.concurrency = concurrency
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self.tokens = self.tokens_per_minute
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        # Moving average of how long admitted requests hold their slot, for Retry-After estimates
+        self.hold_seconds = 5.0
+        self.stats = {"admitted": 0, "deferred": 0, "shed": 0, "admitted_tokens": 0}
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.tokens_per_minute, self.tokens + (now - self.updated) * self.tokens_per_minute / 60)
+        self.updated = now
+
+    def token_wait(self, tokens: int) -> float:
+        needed = min(tokens, self.tokens_per_minute) - self.tokens
+        return needed * 60 / self.tokens_per_minute if needed > 0 else 0.0
+
+
+class Ticket:
+    """An admitted request's slot; release() is idempotent, so it can sit in several cleanup paths"""
+
+    def __init__(self, controller: 'AdmissionController', priority_class: str, tokens: int):
+        self.controller = controller
+        self.priority_class = priority_class
+        self.tokens = tokens
+        self.admitted_at = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.controller.release(self)
+
+    def __enter__(self) -> 'Ticket':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, classes: Dict[str, PriorityClass], headroom: Optional[Callable[[], float]] = None,
+                 reserve: float = 0.0, enabled: bool = True):
+        self.classes = classes
+        # Fraction of the shared LLM tokens/minute budget still available (RateLimiter.headroom)
+        self.headroom = headroom
+        self.reserve = reserve
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._top_priority = min(cls.priority for cls in classes.values())
+
+    def try_admit(self, name: str, tokens: int) -> Tuple[float, str]:
+        """(0, "") when admitted, else (seconds to wait before trying again, what is in the way)"""
+        cls = self.classes[name]
+        with self._cond:
+            now = time.monotonic()
+            cls.refill(now)
+            if any(other.waiting and other.priority < cls.priority for other in self.classes.values()):
+                return 0.05, 'priority'
+            if cls.in_flight >= cls.concurrency:
+                return max(0.05, cls.hold_seconds / cls.concurrency), 'concurrency'
+            wait = cls.token_wait(tokens)
+            if wait > 0:
+                return wait, 'tokens'
+            if cls.priority > self._top_priority and self.headroom is not None and self.reserve > 0:
+                headroom = self.headroom()
+                if headroom < self.reserve:
+                    return max(0.05, (self.reserve - headroom) * 60), 'reserve'
+            cls.in_flight += 1
+            cls.tokens -= tokens
+            cls.stats["admitted"] += 1
+            cls.stats["admitted_tokens"] += tokens
+            return 0.0, ''
+
+    def admit(self, name: str, tokens: int, max_wait: Any = 'default') -> Ticket:
+        """Admit a request of `tokens` tokens, waiting up to max_wait (class default; None waits indefinitely)"""
+        if not self.enabled:
+            return Ticket(self, name, 0)
+        deadline = self._deadline(name, max_wait)
+        self._enqueue(name, deadline)
+        try:
+            deferred = False
+            while True:
+                wait, reason = self.try_admit(name, tokens)
+                if wait == 0:
+                    return Ticket(self, name, tokens)
+                pause = self._pause(name, wait, reason, deadline, deferred)
+                deferred = True
+                with self._cond:
+                    self._cond.wait(pause)
+        finally:
+            self._dequeue(name)
+
+    async def aadmit(self, name: str, tokens: int, max_wait: Any = 'default') -> Ticket:
+        """admit() for the event loop"""
+        if not self.enabled:
+            return Ticket(self, name, 0)
+        deadline = self._deadline(name, max_wait)
+        self._enqueue(name, deadline)
+        try:
+            deferred = False
+            while True:
+                wait, reason = self.try_admit(name, tokens)
+                if wait == 0:
+                    return Ticket(self, name, tokens)
+                pause = self._pause(name, wait, reason, deadline, deferred)
+                deferred = True
+                await asyncio.sleep(min(pause, 0.1))
+        finally:
+            self._dequeue(name)
+
+    def release(self, ticket: Ticket) -> None:
+        if not self.enabled:
+            return
+        cls = self.classes[ticket.priority_class]
+        with self._cond:
+            cls.in_flight -= 1
+            cls.hold_seconds = 0.8 * cls.hold_seconds + 0.2 * (time.monotonic() - ticket.admitted_at)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            now = time.monotonic()
+            result = {}
+            for name, cls in self.classes.items():
+                cls.refill(now)
+                result[name] = {
+                    **cls.stats,
+                    "in_flight": cls.in_flight,
+                    "waiting": cls.waiting,
+                    "concurrency": cls.concurrency,
+                    "tokens_per_minute": cls.tokens_per_minute,
+                    "available_tokens": round(cls.tokens),
+                    "hold_seconds": round(cls.hold_seconds, 3),
+                }
+            return result
+
+    def _deadline(self, name: str, max_wait: Any) -> Optional[float]:
+        if max_wait == 'default':
+            max_wait = self.classes[name].max_wait
+        return None if max_wait is None else time.monotonic() + max_wait
+
+    def _enqueue(self, name: str, deadline: Optional[float]) -> None:
+        cls = self.classes[name]
+        with self._cond:
+            if deadline is not None and cls.waiting >= cls.max_queue:
+                cls.stats["shed"] += 1
+                retry_after = cls.hold_seconds * (cls.waiting + 1) / cls.concurrency
+                raise AdmissionRejected(f"Too many {name} requests waiting; try again later", retry_after, name)
+            cls.waiting += 1
+
+    def _dequeue(self, name: str) -> None:
+        with self._cond:
+            self.classes[name].waiting -= 1
+            self._cond.notify_all()
+
+    def _pause(self, name: str, wait: float, reason: str, deadline: Optional[float], deferred: bool) -> float:
+        """How long to sleep before the next try; sheds the request when its deadline would pass"""
+        cls = self.classes[name]
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            # Token and reserve waits are predictable: shed now instead of waiting to fail
+            if remaining <= 0 or (reason in ('tokens', 'reserve') and wait > remaining):
+                with self._cond:
+                    cls.stats["shed"] += 1
+                limit = 'token budget' if reason in ('tokens', 'reserve') else 'capacity'
+                raise AdmissionRejected(f"Over the {name} {limit}; try again later", wait, name)
+        if not deferred:
+            with self._cond:
+                cls.stats["deferred"] += 1
+        pause = min(wait, 0.25)
+        return pause if deadline is None else max(0.001, min(pause, deadline - time.monotonic()))
+
+
+def default_admission(headroom: Optional[Callable[[], float]] = None) -> AdmissionController:
+    """
+    Controller configured from ADMISSION_* settings; token budgets default to
+    shares of this process's part of LLM_TOKENS_PER_MINUTE
+    """
+    llm_tokens_per_minute = float(os.environ.get('LLM_TOKENS_PER_MINUTE', 300000)) / llm_processes()
+    classes = {
+        INTERACTIVE: PriorityClass(
+            INTERACTIVE, priority=0,
+            concurrency=int(os.environ.get('ADMISSION_INTERACTIVE_CONCURRENCY', 16)),
+            tokens_per_minute=float(os.environ.get('ADMISSION_INTERACTIVE_TOKENS_PER_MINUTE', llm_tokens_per_minute)),
+            max_wait=float(os.environ.get('ADMISSION_INTERACTIVE_MAX_WAIT', 10)),
+            max_queue=int(os.environ.get('ADMISSION_INTERACTIVE_MAX_QUEUE', 64)),
+        ),
+        BULK: PriorityClass(
+            BULK, priority=1,
+            concurrency=int(os.environ.get('ADMISSION_BULK_CONCURRENCY', 4)),
+            tokens_per_minute=float(os.environ.get('ADMISSION_BULK_TOKENS_PER_MINUTE', llm_tokens_per_minute * 0.6)),
+            max_wait=float(os.environ.get('ADMISSION_BULK_MAX_WAIT', 30)),
+            max_queue=int(os.environ.get('ADMISSION_BULK_MAX_QUEUE', 16)),
+        ),
+    }
+    return AdmissionController(
+        classes,
+        headroom=headroom,
+        reserve=float(os.environ.get('ADMISSION_BULK_RESERVE', 0.2)),
+        enabled=os.environ.get('ADMISSION_ENABLED', '1') == '1'
+    )
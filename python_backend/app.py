@@ -1,66 +1,163 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from youtube_transcript_api import YouTubeTranscriptApi
-import openai
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
 import re
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import json
+import gzip
+import hashlib
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from admission import BULK, INTERACTIVE, AdmissionRejected, Ticket, default_admission
+from cache import TieredCache, artifact_dir, cache_db_path
+from singleflight import SingleFlight
+from retrieval import needs_index, select_context, transcript_index, index_cache_stats, index_store_stats
+from tokens import count_tokens, split_by_token_budget
+from search import search_index, index_cache_stats as search_index_cache_stats, index_store_stats as search_index_store_stats
+from ingest import IngestManager, YouTubePlaylistApi
+from jobs import JobQueue, callback_url_error
+from llm_client import default_rate_limiter, estimate_tokens
+from llm_providers import provider_from_env
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, StatsCollector, finish_request_timing, profiler, registry,
+    server_timing_header, stage, start_request_timing
+)
+from summary_schema import (
+    salvage_summary_content, salvage_questions_content, salvage_summary_only_content, validate_questions
+)
+from transcript_resolver import NoUsableTranscriptError, default_resolver
+from transcript_model import Transcript, TranscriptCodec
+from youtube_urls import (
+    extract_channel_id, extract_playlist_id, extract_video_id, normalize_video_urls, uploads_playlist_id
+)
 
 app = Flask(__name__)
 CORS(app)
 
-# Configure OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Every generation call goes through one provider (see llm_providers.py): OpenAI via the
+# pooled, rate-limited client by default, or a local fake/replay stand-in
+llm_rate_limiter = default_rate_limiter()
+llm = provider_from_env(llm_rate_limiter)
 
-def extract_video_id(url: str) -> str:
-    """Extract YouTube video ID from various URL formats"""
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
-        r'youtube\.com\/v\/([^&\n?#]+)',
-        r'youtube\.com\/watch\?.*v=([^&\n?#]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    # If it's already just a video ID
-    if len(url) == 11 and re.match(r'^[a-zA-Z0-9_-]+$', url):
-        return url
-    
-    raise ValueError("Invalid YouTube URL or video ID")
+# Hot-path metrics, served on /metrics (see metrics.py); cache, single-flight, job and LLM client
+# stats are exported by collectors registered further down
+http_requests = registry.counter('focustube_http_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'status'))
+http_request_seconds = registry.histogram('focustube_http_request_seconds', 'HTTP request latency', ('endpoint',))
+llm_calls = registry.counter('focustube_llm_calls_total', 'LLM calls by call site and outcome', ('call', 'outcome'))
+llm_tokens = registry.counter('focustube_llm_tokens_total', 'Tokens used by LLM calls, as reported by the provider', ('call', 'type'))
+transcript_fetches = registry.counter('focustube_transcript_fetches_total', 'Upstream transcript fetches by outcome', ('outcome',))
+
+# Server-Timing breakdown on every response, or only when the request sends "X-Timing: 1"
+TIMING_HEADER = os.environ.get('TIMING_HEADER') == '1'
+# /debug/profiler is only routed when this is set; the profiler itself starts and stops at runtime
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED') == '1'
+
+def llm_complete(call: str, **kwargs: Any) -> Any:
+    """llm.complete timed as stage llm_<call>, with outcome and token usage counted"""
+    with stage(f'llm_{call}'):
+        try:
+            response = llm.complete(**kwargs)
+        except Exception:
+            llm_calls.inc(call=call, outcome='error')
+            raise
+    record_llm_usage(call, response)
+    return response
+
+def record_llm_usage(call: str, response: Any) -> None:
+    llm_calls.inc(call=call, outcome='ok')
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        llm_tokens.inc(usage.prompt_tokens or 0, call=call, type='prompt')
+        llm_tokens.inc(usage.completion_tokens or 0, call=call, type='completion')
+
+def record_stream_usage(call: str, kwargs: Dict[str, Any], answer: str) -> None:
+    """Streams carry no usage report, so both sides are counted locally"""
+    llm_calls.inc(call=call, outcome='ok')
+    prompt = sum(count_tokens(str(message.get('content') or '')) for message in kwargs.get('messages', []))
+    llm_tokens.inc(prompt, call=call, type='prompt')
+    llm_tokens.inc(count_tokens(answer), call=call, type='completion')
+
+# Transcripts rarely change once published, so cache them (and "no transcript" results) across requests
+transcript_cache = TieredCache(
+    'transcripts',
+    db_path=cache_db_path(),
+    max_memory_bytes=int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600)),
+    negative_ttl=float(os.environ.get('TRANSCRIPT_CACHE_NEGATIVE_TTL', 6 * 3600)),
+    codec=TranscriptCodec
+)
+
+# Lists a video's tracks once and remembers which one was used
+transcript_resolver = default_resolver()
+
+# Concurrent requests for the same video (e.g. a whole class opening it at once) share one fetch/generation
+SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_TIMEOUT', 180))
+transcript_flight = SingleFlight('transcript', timeout=SINGLEFLIGHT_TIMEOUT)
+summary_flight = SingleFlight('summary', timeout=SINGLEFLIGHT_TIMEOUT)
+
+# Errors meaning the video has no usable transcript, as opposed to a transient fetch failure
+NO_TRANSCRIPT_ERRORS = (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable, NoUsableTranscriptError)
+
+class TranscriptUnavailableError(Exception):
+    """The video has no usable transcript; retrying will not help"""
 
 def get_transcript(video_id: str) -> str:
-    """Fetch and combine transcript from YouTube video"""
+    """Fetch and combine transcript from YouTube video, served from cache when possible"""
+    return get_transcript_segments(video_id).text
+
+def get_transcript_segments(video_id: str) -> Transcript:
+    """Like get_transcript, but keeping each caption segment's timing"""
+    return transcript_flight.do(video_id, lambda: _get_transcript_uncoalesced(video_id))
+
+def cached_transcript(video_id: str) -> Optional[Transcript]:
+    """Cached transcript for video_id, if any; raises for videos known to have none"""
+    cached = transcript_cache.get(video_id)
+    if cached is None:
+        return None
+    if cached.negative:
+        raise TranscriptUnavailableError(cached.value)
+    return cached.value
+
+def _get_transcript_uncoalesced(video_id: str) -> Transcript:
+    transcript = cached_transcript(video_id)
+    if transcript is not None:
+        return transcript
+
+    transcript = _fetch_transcript(video_id)
+    transcript_cache.set(video_id, transcript)
+    return transcript
+
+def _fetch_transcript(video_id: str) -> Transcript:
+    """Fetch transcript segments from YouTube, cleaned of annotations and extra whitespace"""
+    return clean_transcript_entries(fetch_transcript_entries(video_id))
+
+def fetch_transcript_entries(video_id: str) -> List[Dict[str, Any]]:
+    """Raw caption entries from YouTube; videos without a usable transcript are remembered as such"""
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        
-        # Combine all transcript text
-        full_transcript = ' '.join([entry['text'] for entry in transcript_list])
-        
-        # Clean up the transcript
-        full_transcript = re.sub(r'\[.*?\]', '', full_transcript)  # Remove annotations
-        full_transcript = re.sub(r'\s+', ' ', full_transcript)  # Normalize whitespace
-        
-        return full_transcript.strip()
+        with stage('youtube_fetch'):
+            entries = transcript_resolver.fetch(video_id)
+        transcript_fetches.inc(outcome='ok')
+        return entries
     
     except Exception as e:
-        # Try to get auto-generated transcript if manual one fails
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-            full_transcript = ' '.join([entry['text'] for entry in transcript_list])
-            full_transcript = re.sub(r'\[.*?\]', '', full_transcript)
-            full_transcript = re.sub(r'\s+', ' ', full_transcript)
-            return full_transcript.strip()
-        except Exception as e2:
-            raise Exception(f"Could not fetch transcript: {str(e2)}")
-
-def generate_summary_and_questions(transcript: str, video_title: str = "") -> Dict[str, Any]:
-    """Generate comprehensive summary and questions using OpenAI"""
-    
-    prompt = f"""
+        message = f"Could not fetch transcript: {str(e)}"
+        if isinstance(e, NO_TRANSCRIPT_ERRORS):
+            transcript_fetches.inc(outcome='unavailable')
+            transcript_cache.set_negative(video_id, message)
+            raise TranscriptUnavailableError(message)
+        transcript_fetches.inc(outcome='error')
+        raise Exception(message)
+
+def clean_transcript_entries(entries: List[Dict[str, Any]]) -> Transcript:
+    with stage('transcript_cleanup'):
+        return Transcript.from_entries(entries)
+
+SUMMARY_SYSTEM_PROMPT = "You are an expert educational content creator. Provide comprehensive, accurate educational content based on video transcripts. Always respond with valid JSON."
+
+SUMMARY_PROMPT_TEMPLATE = """
     Analyze the following YouTube video transcript and provide:
 
     1. COMPREHENSIVE SUMMARY (300+ words):
@@ -114,35 +211,361 @@ def generate_summary_and_questions(transcript: str, video_title: str = "") -> Di
     }}
     """
 
+# Using the latest OpenAI model - gpt-4o was released May 13, 2024. do not change this unless explicitly requested by the user
+SUMMARY_MODEL = os.environ.get('SUMMARY_MODEL', "gpt-4o")
+SUMMARY_TEMPERATURE = 0.7
+
+# Long transcripts are summarized map-reduce style: notes per token-budgeted section, then one final
+# SUMMARY_PROMPT_TEMPLATE call over the combined notes
+SUMMARY_CHUNK_PROMPT_TEMPLATE = """
+    The following is part {part} of {total} of the transcript of a YouTube video titled "{video_title}".
+
+    Write study notes covering only this part. Respond with valid JSON with this structure:
+    {{
+        "main_points": ["point1", "point2", ...],
+        "key_concepts": ["concept1", "concept2", ...],
+        "prerequisites": ["prereq1", ...],
+        "applications": ["app1", ...],
+        "notes": "150-250 word summary of this part",
+        "question_ideas": ["what a good quiz question about this part would test", ...]
+    }}
+
+    Transcript part:
+    {transcript}
+    """
+
+# When the reply is missing one part (or has too few valid questions), only that part is asked for again
+QUESTION_COUNT = 10
+
+SUMMARY_REPAIR_PROMPT_TEMPLATE = """
+    Write the study summary for the following YouTube video transcript: key learning objectives,
+    main concepts, prerequisites, step-by-step breakdown of important processes, real-world
+    applications, key insights and follow-up topics.
+
+    Video Title: {video_title}
+
+    Transcript:
+    {transcript}
+
+    Respond with valid JSON with this structure:
+    {{
+        "summary": {{
+            "main_points": ["point1", "point2", ...],
+            "key_concepts": ["concept1", "concept2", ...],
+            "prerequisites": ["prereq1", "prereq2", ...],
+            "applications": ["app1", "app2", ...],
+            "detailed_explanation": "detailed 300+ word explanation",
+            "follow_up_topics": ["topic1", "topic2", ...]
+        }}
+    }}
+    """
+
+QUESTIONS_REPAIR_PROMPT_TEMPLATE = """
+    Write {count} multiple-choice questions for a YouTube video titled "{video_title}", based on the
+    material below. Mix conceptual, application, analysis and synthesis questions. Each has 4 options
+    (A-D), the index (0-3) of the correct option, a brief explanation and a difficulty level.
+    {existing}
+    Material:
+    {material}
+
+    Respond with valid JSON with this structure:
+    {{
+        "questions": [
+            {{
+                "question": "Question text",
+                "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"],
+                "correct_answer": 0,
+                "explanation": "Why this answer is correct",
+                "difficulty": "Beginner/Intermediate/Advanced",
+                "type": "conceptual/application/analysis/synthesis"
+            }}
+        ]
+    }}
+    """
+
+SUMMARY_NOTES_HEADER = "(This is a long video. Below are section-by-section study notes of the full transcript, in order.)"
+
+# Transcripts above this many tokens go through the map-reduce path
+LONG_TRANSCRIPT_TOKENS = int(os.environ.get('LONG_TRANSCRIPT_TOKENS', 24000))
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 8000))
+SUMMARY_MAP_CONCURRENCY = int(os.environ.get('SUMMARY_MAP_CONCURRENCY', 4))
+
+# Changes whenever the prompt text changes, so results generated from an older prompt are never served
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    (SUMMARY_SYSTEM_PROMPT + SUMMARY_PROMPT_TEMPLATE + SUMMARY_CHUNK_PROMPT_TEMPLATE + SUMMARY_NOTES_HEADER
+     + SUMMARY_REPAIR_PROMPT_TEMPLATE + QUESTIONS_REPAIR_PROMPT_TEMPLATE).encode('utf-8')
+).hexdigest()[:12]
+PROMPT_VERSION_KEY = '__prompt_version__'
+
+summary_cache = TieredCache(
+    'summaries',
+    db_path=cache_db_path(),
+    max_memory_bytes=int(os.environ.get('SUMMARY_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.environ.get('SUMMARY_CACHE_TTL', 30 * 24 * 3600))
+)
+
+def summary_cache_key(transcript: str, video_title: str = "") -> str:
+    """Content hash of everything that determines the generated summary and questions"""
+    normalized = re.sub(r'\s+', ' ', transcript).strip()
+    material = json.dumps(
+        [normalized, video_title.strip(), SUMMARY_MODEL, SUMMARY_PROMPT_VERSION, SUMMARY_TEMPERATURE],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def invalidate_summary_cache() -> None:
+    """Drop every cached summary, e.g. after changing the prompt template without restarting"""
+    summary_cache.clear()
+    summary_cache.set(PROMPT_VERSION_KEY, SUMMARY_PROMPT_VERSION, ttl=float('inf'))
+
+def is_valid_summary_result(result: Any) -> bool:
+    """Check the generated JSON has the summary/questions shape the client expects"""
+    return (
+        isinstance(result, dict)
+        and isinstance(result.get("summary"), dict)
+        and isinstance(result.get("questions"), list)
+    )
+
+# Entries stored under an older prompt version are unreachable anyway; clearing them reclaims space
+_stored_version = summary_cache.get(PROMPT_VERSION_KEY)
+if _stored_version is None or _stored_version.value != SUMMARY_PROMPT_VERSION:
+    invalidate_summary_cache()
+
+def generate_summary_and_questions(transcript: str, video_title: str = "", max_wait: Any = 'default') -> Dict[str, Any]:
+    """
+    Generate comprehensive summary and questions using OpenAI, reusing cached
+    results for identical input. Only the single-flight leader is admitted
+    (admit_summary with max_wait), so concurrent duplicates take no slot or
+    tokens of their own. Callers only coalesce with others of the same
+    max_wait policy, so a request that may be shed never waits behind a
+    deferred (max_wait=None) generation.
+    """
+    cache_key = summary_cache_key(transcript, video_title)
+    return summary_flight.do(
+        f'{cache_key}:{max_wait}', lambda: _generate_summary_uncoalesced(cache_key, transcript, video_title, max_wait)
+    )
+
+def _generate_summary_uncoalesced(cache_key: str, transcript: str, video_title: str, max_wait: Any = 'default') -> Dict[str, Any]:
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached.value)
+    sections = summary_sections(transcript)
+    with admit_summary(transcript, video_title, sections, max_wait):
+        return _generate_summary(cache_key, transcript, video_title, sections)
+
+def summary_sections(transcript: str) -> Optional[List[str]]:
+    """The map step's sections for a long transcript, None when it is summarized in one call"""
+    if count_tokens(transcript) <= LONG_TRANSCRIPT_TOKENS:
+        return None
+    return split_by_token_budget(transcript, SUMMARY_CHUNK_TOKENS)
+
+def _generate_summary(cache_key: str, transcript: str, video_title: str, sections: Optional[List[str]]) -> Dict[str, Any]:
     try:
-        # Using the latest OpenAI model - gpt-4o was released May 13, 2024. do not change this unless explicitly requested by the user
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert educational content creator. Provide comprehensive, accurate educational content based on video transcripts. Always respond with valid JSON."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            max_tokens=4000,
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content
-        if content is None:
-            raise Exception("No content received from OpenAI")
-        result = json.loads(content)
-        return result
+        if sections is not None:
+            with stage('summary_sections'):
+                transcript = _summarize_sections(sections, video_title)
+        with stage('prompt_build'):
+            kwargs = summary_completion_kwargs(transcript, video_title)
+        response = llm_complete('summary', **kwargs)
+        with stage('parse_summary'):
+            partial = salvage_summary_content(response.choices[0].message.content)
+        with stage('summary_repair'):
+            errors = _repair_summary(partial, transcript, video_title)
+        return finish_summary_result(cache_key, partial, errors)
         
     except Exception as e:
         raise Exception(f"Error generating content with AI: {str(e)}")
 
-def ask_question_about_transcript(question: str, transcript: str, video_title: str = "") -> str:
-    """Answer student questions based on the video transcript"""
-    
-    prompt = f"""
+def _repair_summary(partial: Dict[str, Any], transcript: str, video_title: str) -> List[str]:
+    """Regenerate the missing parts of partial in parallel; returns the errors of failed repairs"""
+    repairs = summary_repair_requests(partial, transcript, video_title)
+    if not repairs:
+        return []
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(repairs)) as pool:
+        # Each call runs in a copy of this context so its stage timings land on the request
+        futures = [
+            (part, pool.submit(contextvars.copy_context().run, llm_complete, f'repair_{part}', **kwargs))
+            for part, kwargs in repairs
+        ]
+    for part, future in futures:
+        try:
+            apply_summary_repair(partial, part, future.result().choices[0].message.content)
+        except Exception as e:
+            errors.append(f"{part}: {str(e)}")
+    return errors
+
+def _summarize_sections(sections: List[str], video_title: str) -> str:
+    """Map step: section notes generated in parallel, each cached so a retry only redoes failed sections"""
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_MAP_CONCURRENCY, len(sections))) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, _section_notes, section, video_title, part, len(sections))
+            for part, section in enumerate(sections, 1)
+        ]
+    results = []
+    errors = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(str(e))
+    if errors:
+        raise Exception(f"{len(errors)} of {len(sections)} transcript sections failed: {errors[0]}")
+    return render_section_notes(results)
+
+def _section_notes(section: str, video_title: str, part: int, total: int) -> Dict[str, Any]:
+    cache_key = section_notes_cache_key(section, video_title, part, total)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached.value)
+    response = llm_complete('section_notes', **section_notes_completion_kwargs(section, video_title, part, total))
+    return parse_section_notes(cache_key, response.choices[0].message.content)
+
+def section_notes_cache_key(section: str, video_title: str, part: int, total: int) -> str:
+    material = json.dumps(
+        ["section", section, video_title.strip(), part, total, SUMMARY_MODEL, SUMMARY_PROMPT_VERSION],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def section_notes_completion_kwargs(section: str, video_title: str, part: int, total: int) -> Dict[str, Any]:
+    prompt = SUMMARY_CHUNK_PROMPT_TEMPLATE.format(part=part, total=total, video_title=video_title, transcript=section)
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 1500,
+        "temperature": SUMMARY_TEMPERATURE
+    }
+
+def parse_section_notes(cache_key: str, content: Optional[str]) -> Dict[str, Any]:
+    if content is None:
+        raise Exception("No content received from OpenAI")
+    notes = json.loads(content)
+    if not isinstance(notes, dict) or not isinstance(notes.get("notes"), str):
+        raise Exception("AI response is missing section notes")
+    summary_cache.set(cache_key, json.dumps(notes, ensure_ascii=False))
+    return notes
+
+def render_section_notes(sections: List[Dict[str, Any]]) -> str:
+    """Reduce-step input: the section notes as compact text in place of the transcript"""
+    lines = [SUMMARY_NOTES_HEADER]
+    for part, notes in enumerate(sections, 1):
+        lines.append(f"\nPart {part}: {notes['notes']}")
+        for label, field in (("Main points", "main_points"), ("Key concepts", "key_concepts"),
+                             ("Prerequisites", "prerequisites"), ("Applications", "applications"),
+                             ("Question ideas", "question_ideas")):
+            values = [str(v) for v in notes.get(field) or [] if v]
+            if values:
+                lines.append(f"{label}: " + "; ".join(values))
+    return "\n".join(lines)
+
+def summary_completion_kwargs(transcript: str, video_title: str = "") -> Dict[str, Any]:
+    """Chat completion arguments for summary/question generation, shared by the sync and async paths"""
+    prompt = SUMMARY_PROMPT_TEMPLATE.format(video_title=video_title, transcript=transcript)
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {
+                "role": "system", 
+                "content": SUMMARY_SYSTEM_PROMPT
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 4000,
+        "temperature": SUMMARY_TEMPERATURE
+    }
+
+summary_repair_stats = {"summary": 0, "questions": 0}
+summary_repair_stats_lock = threading.Lock()
+
+def summary_repair_counts() -> Dict[str, int]:
+    with summary_repair_stats_lock:
+        return dict(summary_repair_stats)
+
+def summary_repair_requests(partial: Dict[str, Any], transcript: str, video_title: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """(part, completion kwargs) for each part of a salvaged reply that has to be asked for again"""
+    repairs = []
+    if partial["summary"] is None:
+        repairs.append(("summary", summary_repair_kwargs(transcript, video_title)))
+    missing = QUESTION_COUNT - len(partial["questions"])
+    if missing > 0:
+        repairs.append(("questions", questions_repair_kwargs(missing, partial, transcript, video_title)))
+    with summary_repair_stats_lock:
+        for part, _ in repairs:
+            summary_repair_stats[part] += 1
+    return repairs
+
+def summary_repair_kwargs(transcript: str, video_title: str) -> Dict[str, Any]:
+    prompt = SUMMARY_REPAIR_PROMPT_TEMPLATE.format(video_title=video_title, transcript=transcript)
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 2000,
+        "temperature": SUMMARY_TEMPERATURE
+    }
+
+def questions_repair_kwargs(count: int, partial: Dict[str, Any], transcript: str, video_title: str) -> Dict[str, Any]:
+    """Questions are written from the salvaged summary when there is one, which is far shorter than the transcript"""
+    summary = partial["summary"]
+    if summary is not None:
+        material = "\n".join([summary["detailed_explanation"]] + [
+            f"{label}: " + "; ".join(summary[field])
+            for label, field in (("Main points", "main_points"), ("Key concepts", "key_concepts"),
+                                 ("Applications", "applications"))
+            if summary[field]
+        ])
+    else:
+        material = transcript
+    existing = ""
+    if partial["questions"]:
+        existing = "\n    Do not repeat these existing questions:\n" + "\n".join(
+            f"    - {q['question']}" for q in partial["questions"]
+        ) + "\n"
+    prompt = QUESTIONS_REPAIR_PROMPT_TEMPLATE.format(
+        count=count, video_title=video_title, existing=existing, material=material
+    )
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": min(4000, 300 * count + 200),
+        "temperature": SUMMARY_TEMPERATURE
+    }
+
+def apply_summary_repair(partial: Dict[str, Any], part: str, content: Optional[str]) -> None:
+    if part == "summary":
+        partial["summary"] = salvage_summary_only_content(content)
+    else:
+        partial["questions"] = validate_questions(partial["questions"] + salvage_questions_content(content))[:QUESTION_COUNT]
+
+def finish_summary_result(cache_key: str, partial: Dict[str, Any], repair_errors: List[str]) -> Dict[str, Any]:
+    """
+    The salvaged and repaired result, cached under cache_key unless a repair call
+    failed (a usable but short result is served, and regenerated next time)
+    """
+    result = {"summary": partial["summary"], "questions": partial["questions"]}
+    if not is_valid_summary_result(result) or not result["questions"]:
+        detail = f" ({'; '.join(repair_errors)})" if repair_errors else ""
+        raise Exception(f"AI response is missing summary or questions{detail}")
+    if not repair_errors:
+        summary_cache.set(cache_key, json.dumps(result, ensure_ascii=False))
+    return result
+
+QUESTION_SYSTEM_PROMPT = "You are a helpful AI tutor. Provide clear, educational responses based on video content."
+
+QUESTION_PROMPT_TEMPLATE = """
     You are an AI tutor helping a student understand a YouTube video. Based on the transcript provided, answer the student's question clearly and comprehensively.
 
     Video Title: {video_title}
@@ -160,32 +583,641 @@ def ask_question_about_transcript(question: str, transcript: str, video_title: s
     If the question cannot be answered from the transcript, politely explain that and suggest what information would be needed.
     """
 
+# the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
+QUESTION_MODEL = os.environ.get('QUESTION_MODEL', "gpt-4o")
+
+def ask_question_about_transcript(question: str, transcript: str, video_title: str = "",
+                                  kwargs: Optional[Dict[str, Any]] = None) -> str:
+    """Answer student questions based on the video transcript; kwargs when the caller already built them"""
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a helpful AI tutor. Provide clear, educational responses based on video content."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content
-        if content is None:
-            raise Exception("No response content received from OpenAI")
-        return content
+        if kwargs is None:
+            with stage('qa_context'):
+                kwargs = question_completion_kwargs(question, transcript, video_title)
+        response = llm_complete('answer', **kwargs)
+        return parse_answer_content(response.choices[0].message.content)
         
     except Exception as e:
         raise Exception(f"Error answering question: {str(e)}")
 
+def stream_answer_about_transcript(question: str, transcript: str, video_title: str = "",
+                                   kwargs: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Yield answer text fragments as the model produces them"""
+    try:
+        if kwargs is None:
+            with stage('qa_context'):
+                kwargs = question_completion_kwargs(question, transcript, video_title)
+        parts = []
+        for chunk in llm.stream(**kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        record_stream_usage('answer_stream', kwargs, ''.join(parts))
+                
+    except Exception as e:
+        llm_calls.inc(call='answer_stream', outcome='error')
+        raise Exception(f"Error answering question: {str(e)}")
+
+def question_completion_kwargs(question: str, transcript: str, video_title: str = "") -> Dict[str, Any]:
+    """Chat completion arguments for answering a student question, with long transcripts cut down to relevant chunks"""
+    context = select_context(question, transcript)
+    if context is not transcript:
+        context = "(Excerpts from a longer transcript; [...] marks omitted parts)\n" + context
+    prompt = QUESTION_PROMPT_TEMPLATE.format(video_title=video_title, question=question, transcript=context)
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {
+                "role": "system", 
+                "content": QUESTION_SYSTEM_PROMPT
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.7
+    }
+
+def parse_answer_content(content: Optional[str]) -> str:
+    if content is None:
+        raise Exception("No response content received from OpenAI")
+    return content
+
+# Admission control (see admission.py): model-bound work is sized from its real prompts
+# before dispatch and admitted by priority class, so Q&A never queues behind a
+# lecture's summary; requests over their class's budget get 429 with Retry-After
+admission = default_admission(llm_rate_limiter.headroom)
+
+def summary_prompt_tokens(transcript: str, video_title: str, sections: Optional[List[str]]) -> int:
+    """
+    Tokens an uncached generation counts against the LLM budget; sections as
+    from summary_sections. Section notes cached by an earlier attempt are
+    still counted, so a retry is sized conservatively.
+    """
+    if sections is None:
+        return estimate_tokens(summary_completion_kwargs(transcript, video_title))
+    map_calls = [
+        section_notes_completion_kwargs(section, video_title, part, len(sections))
+        for part, section in enumerate(sections, 1)
+    ]
+    # The reduce prompt carries the notes, each at most a map call's max_tokens
+    reduce_call = summary_completion_kwargs(SUMMARY_NOTES_HEADER, video_title)
+    return (sum(estimate_tokens(kwargs) + kwargs["max_tokens"] for kwargs in map_calls)
+            + estimate_tokens(reduce_call))
+
+def admit_summary(transcript: str, video_title: str, sections: Optional[List[str]], max_wait: Any = 'default') -> Ticket:
+    """
+    Bulk-class slot for generating a summary that missed the cache (max_wait=None
+    defers without shedding). Taken by the single-flight leader in
+    generate_summary_and_questions, not by each request.
+    """
+    tokens = summary_prompt_tokens(transcript, video_title, sections)
+    with stage('admission'):
+        return admission.admit(BULK, tokens, max_wait)
+
+def admit_question(kwargs: Dict[str, Any]) -> Ticket:
+    """Interactive-class slot for an answer, sized from its question_completion_kwargs"""
+    with stage('admission'):
+        return admission.admit(INTERACTIVE, estimate_tokens(kwargs))
+
+def admission_error(e: AdmissionRejected) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Body and headers of the 429 response for a shed request"""
+    retry_after = e.retry_after_header()
+    return {"error": str(e), "priority_class": e.priority_class, "retry_after": int(retry_after)}, {"Retry-After": retry_after}
+
+def search_transcript_text(query: str, transcript: str, segments: Optional[Transcript] = None) -> Dict[str, Any]:
+    """
+    Ranked sentence matches for query, with one sentence of context either side.
+    When the segmented transcript is known, each hit also gets the video
+    timestamp (seconds) where it starts.
+    """
+    query = query.lower()
+    with stage('search_index'):
+        index = search_index(transcript)
+    with stage('search'):
+        found = index.search(query, limit=5)
+    
+    if segments is not None and segments.has_timestamps and segments.text == transcript:
+        for result in found["results"]:
+            result["timestamp"] = segments.time_at(result["start"])
+    
+    return {
+        "success": True,
+        "query": query,
+        "results": found["results"],
+        "total_matches": found["total_matches"]
+    }
+
+# Follow-up requests (/ask_question, /search_transcript) can name a transcript the
+# server already holds instead of posting it again: either a video ID or the content
+# hash handed back the first time a raw transcript was posted
+transcript_handles = TieredCache(
+    'transcript_handles',
+    db_path=cache_db_path(),
+    max_memory_bytes=int(os.environ.get('TRANSCRIPT_HANDLE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.environ.get('TRANSCRIPT_HANDLE_TTL', 7 * 24 * 3600)),
+    codec=TranscriptCodec
+)
+CONTENT_HANDLE_PREFIX = 'sha256:'
+
+class UnknownTranscriptHandleError(Exception):
+    """The handle names no transcript the server holds (expired, or never stored)"""
+
+def store_transcript(transcript: str) -> str:
+    """Keep a posted transcript server-side and return its content-hash handle"""
+    handle = CONTENT_HANDLE_PREFIX + hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    if transcript_handles.get(handle) is None:
+        transcript_handles.set(handle, Transcript(transcript))
+    return handle
+
+def has_transcript(data: Optional[Dict[str, Any]]) -> bool:
+    return bool(data) and ('transcript' in data or bool(data.get('transcript_handle')))
+
+def request_transcript(data: Dict[str, Any]) -> Tuple[Optional[Transcript], str]:
+    """
+    (transcript, handle) for a request carrying either the raw transcript or a
+    transcript_handle. Posted text is stored so the reply can hand out its handle
+    (or the video ID, when an optional video_id names the same cached transcript).
+    For a video ID handle whose transcript is not cached yet, returns (None,
+    video_id) and the caller fetches it.
+    """
+    if 'transcript' in data:
+        text = data['transcript']
+        video_id = data.get('video_id')
+        if video_id:
+            try:
+                cached = cached_transcript(str(video_id))
+            except TranscriptUnavailableError:
+                cached = None
+            if cached is not None and cached.text == text:
+                return cached, str(video_id)
+        return Transcript(text), store_transcript(text)
+
+    handle = str(data['transcript_handle'])
+    if handle.startswith(CONTENT_HANDLE_PREFIX):
+        cached = transcript_handles.get(handle)
+        if cached is None:
+            raise UnknownTranscriptHandleError(f"Unknown transcript handle: {handle}")
+        return cached.value, handle
+
+    try:
+        video_id = extract_video_id(handle)
+    except ValueError:
+        raise UnknownTranscriptHandleError(f"Unknown transcript handle: {handle}")
+    return cached_transcript(video_id), video_id
+
+def include_transcript(data: Dict[str, Any]) -> bool:
+    """Clients holding a transcript_handle can skip downloading the full text"""
+    return data.get('include_transcript', True) is not False
+
+# Shorter transcripts are almost always captions-only noise (music videos, intros)
+MIN_TRANSCRIPT_LENGTH = 50
+
+def process_video_payload(video_id: str, transcript: str, ai_content: Dict[str, Any],
+                          with_transcript: bool = True) -> Dict[str, Any]:
+    payload = {
+        "success": True,
+        "video_id": video_id,
+        "transcript_handle": video_id,
+        "transcript": transcript,
+        "summary": ai_content["summary"],
+        "questions": ai_content["questions"],
+        "transcript_length": len(transcript)
+    }
+    if not with_transcript:
+        del payload["transcript"]
+    return payload
+
+# Streaming responses are newline-delimited JSON events, opted into with "stream": true in the request body
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def wants_stream(data: Dict[str, Any]) -> bool:
+    return bool(data.get('stream'))
+
+def ndjson_event(event: str, **fields: Any) -> str:
+    return json.dumps({"event": event, **fields}, ensure_ascii=False) + '\n'
+
+def transcript_event(video_id: str, transcript: str, with_transcript: bool = True) -> str:
+    if not with_transcript:
+        return ndjson_event("transcript", video_id=video_id, transcript_handle=video_id, transcript_length=len(transcript))
+    return ndjson_event("transcript", video_id=video_id, transcript_handle=video_id,
+                        transcript=transcript, transcript_length=len(transcript))
+
+# JSON responses above GZIP_MIN_BYTES are gzipped for clients that accept it (0 disables)
+GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES', 1024))
+GZIP_LEVEL = 5
+
+def should_gzip(status_code: int, mimetype: str, accept_encoding: str, size: int) -> bool:
+    return (GZIP_MIN_BYTES > 0 and status_code == 200 and mimetype == 'application/json'
+            and size >= GZIP_MIN_BYTES and 'gzip' in accept_encoding.lower())
+
+def transcript_resource(handle: str, transcript: Transcript, with_segments: bool) -> Dict[str, Any]:
+    """Body of GET /transcripts/<handle>"""
+    payload = {
+        "success": True,
+        "transcript_handle": handle,
+        "transcript": transcript.text,
+        "transcript_length": len(transcript)
+    }
+    if with_segments:
+        payload["segments"] = transcript.segments()
+    return payload
+
+# Batch processing (/process_videos): stage limits are shared by all running batches
+BATCH_MAX_VIDEOS = int(os.environ.get('BATCH_MAX_VIDEOS', 200))
+BATCH_TRANSCRIPT_CONCURRENCY = int(os.environ.get('BATCH_TRANSCRIPT_CONCURRENCY', 8))
+BATCH_GENERATION_CONCURRENCY = int(os.environ.get('BATCH_GENERATION_CONCURRENCY', 3))
+batch_transcript_slots = threading.BoundedSemaphore(BATCH_TRANSCRIPT_CONCURRENCY)
+batch_generation_slots = threading.BoundedSemaphore(BATCH_GENERATION_CONCURRENCY)
+
+def parse_batch_videos(items: List[Any]) -> Tuple[List[Tuple[int, str, str]], List[Dict[str, Any]]]:
+    """
+    Resolve batch entries (URL/ID strings or {"video_url", "video_title"} objects)
+    to unique (index, video_id, title) jobs, plus error results for entries that
+    cannot be parsed. Duplicates keep their first position.
+    """
+    urls = []
+    titles = []
+    for item in items:
+        if isinstance(item, dict):
+            urls.append(item.get('video_url', ''))
+            titles.append(item.get('video_title', ''))
+        else:
+            urls.append(item)
+            titles.append('')
+    parsed = normalize_video_urls(urls)
+    jobs = [(index, video_id, titles[index]) for index, video_id in zip(parsed['positions'], parsed['video_ids'])]
+    invalid = [{"index": entry['index'], "input": entry['input'], "success": False,
+                "error": f"Invalid video URL: {entry['error']}"} for entry in parsed['invalid']]
+    return jobs, invalid
+
+def batch_item_error(index: int, video_id: str, error: str) -> Dict[str, Any]:
+    return {"index": index, "video_id": video_id, "success": False, "error": error}
+
+def _process_batch_item(index: int, video_id: str, video_title: str) -> Dict[str, Any]:
+    try:
+        with batch_transcript_slots:
+            transcript = get_transcript(video_id)
+        if len(transcript) < MIN_TRANSCRIPT_LENGTH:
+            return batch_item_error(index, video_id, "Transcript too short or unavailable")
+        with batch_generation_slots:
+            ai_content = generate_summary_and_questions(transcript, video_title, max_wait=None)
+        return {"index": index, **process_video_payload(video_id, transcript, ai_content)}
+    except Exception as e:
+        return batch_item_error(index, video_id, str(e))
+
+def iter_batch_results(jobs: List[Tuple[int, str, str]]) -> Iterator[Dict[str, Any]]:
+    """Yield each video's result as soon as it finishes"""
+    if not jobs:
+        return
+    pool = ThreadPoolExecutor(max_workers=min(len(jobs), BATCH_TRANSCRIPT_CONCURRENCY + BATCH_GENERATION_CONCURRENCY))
+    futures = [pool.submit(_process_batch_item, *job) for job in jobs]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # A disconnected streaming client should not keep the queued videos running
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def batch_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    succeeded = sum(1 for r in results if r.get("success"))
+    return {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded}
+
+def validate_batch_request(data: Any) -> Optional[str]:
+    if not data or not isinstance(data.get('videos'), list) or not data['videos']:
+        return "videos must be a non-empty list of video URLs or IDs"
+    if len(data['videos']) > BATCH_MAX_VIDEOS:
+        return f"At most {BATCH_MAX_VIDEOS} videos per batch"
+    return None
+
+def run_process_video_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The /process_video pipeline as a background job"""
+    transcript = get_transcript(payload["video_id"])
+    if len(transcript) < MIN_TRANSCRIPT_LENGTH:
+        raise TranscriptUnavailableError("Transcript too short or unavailable")
+    ai_content = generate_summary_and_questions(transcript, payload.get("video_title", ""), max_wait=None)
+    return process_video_payload(payload["video_id"], transcript, ai_content,
+                                 with_transcript=payload.get("include_transcript", True))
+
+# "async": true on /process_video queues the work here and returns a job to poll at /jobs/<id>
+job_queue = JobQueue(
+    'process_video',
+    run_process_video_job,
+    workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 3)),
+    base_delay=float(os.environ.get('JOB_RETRY_BASE_DELAY', 2)),
+    permanent_errors=(TranscriptUnavailableError, ValueError),
+    result_ttl=float(os.environ.get('JOB_RESULT_TTL', 3600)),
+    # Shared by every worker process when persisted (serve.py turns this on for more than one worker)
+    db_path=cache_db_path() if os.environ.get('JOB_QUEUE_PERSIST') == '1' else None,
+    lease=float(os.environ.get('JOB_LEASE', 60)),
+    # Comma-separated hosts callbacks may go to; when unset, any host resolving to public addresses only
+    callback_hosts=os.environ.get('JOB_CALLBACK_HOSTS', '').split(',')
+)
+
+def submit_process_video_job(video_id: str, data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Queue a process_video job; returns the response body and status code"""
+    callback_url = data.get('callback_url')
+    if callback_url:
+        error = callback_url_error(callback_url, job_queue.callback_hosts)
+        if error:
+            return {"error": error}, 400
+    payload = {"video_id": video_id, "video_title": data.get('video_title', ''), "include_transcript": include_transcript(data)}
+    job = job_queue.submit(
+        payload,
+        # Identical requests share a job; a different title or transcript option gets its own result
+        dedupe_key=json.dumps([payload["video_id"], payload["video_title"], payload["include_transcript"]]),
+        callback_url=callback_url
+    )
+    return {"success": True, "job": job, "status_url": f"/jobs/{job['id']}"}, 202
+
+# Course imports (/ingest): playlists, channels or video lists streamed through
+# fetch -> cleanup -> generation stages linked by bounded queues, checkpointed per video
+INGEST_MAX_VIDEOS = int(os.environ.get('INGEST_MAX_VIDEOS', 500))
+
+def ingest_fetch(video_id: str) -> Any:
+    """Fetch stage: the cached transcript when there is one, else raw caption entries"""
+    transcript = cached_transcript(video_id)
+    if transcript is not None:
+        return transcript
+    return fetch_transcript_entries(video_id)
+
+def ingest_cleanup(video_id: str, fetched: Any) -> str:
+    if isinstance(fetched, Transcript):
+        transcript = fetched
+    else:
+        transcript = clean_transcript_entries(fetched)
+        transcript_cache.set(video_id, transcript)
+    if len(transcript.text) < MIN_TRANSCRIPT_LENGTH:
+        raise TranscriptUnavailableError("Transcript too short or unavailable")
+    return transcript.text
+
+def ingest_generate(video_id: str, transcript: str, video_title: str) -> Dict[str, Any]:
+    with stage('summary'):
+        ai_content = generate_summary_and_questions(transcript, video_title, max_wait=None)
+    return process_video_payload(video_id, transcript, ai_content, with_transcript=False)
+
+ingest_manager = IngestManager(
+    ingest_fetch,
+    ingest_cleanup,
+    ingest_generate,
+    db_path=cache_db_path(),
+    prefetch=int(os.environ.get('INGEST_PREFETCH', 4)),
+    fetch_workers=int(os.environ.get('INGEST_FETCH_WORKERS', 4)),
+    generate_workers=int(os.environ.get('INGEST_GENERATE_WORKERS', 2)),
+    # Each run is leased by the worker process executing it; the others read, follow and cancel it from the checkpoint
+    lease=float(os.environ.get('INGEST_LEASE', 60)),
+    resume_interrupted=os.environ.get('INGEST_RESUME_ON_START') == '1'
+)
+
+# Anything with playlist_videos(playlist_id, limit); standins.FakePlaylistApi replaces the Data API offline
+playlist_api = YouTubePlaylistApi(os.environ.get('YOUTUBE_API_KEY', ''))
+
+def ingest_videos(data: Dict[str, Any]) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+    """(video_id, title) pairs and a description of the source of an /ingest request"""
+    limit = max(1, min(int(data.get('max_videos') or INGEST_MAX_VIDEOS), INGEST_MAX_VIDEOS))
+    if data.get('playlist'):
+        playlist_id = extract_playlist_id(str(data['playlist']))
+        return playlist_api.playlist_videos(playlist_id, limit), {"playlist_id": playlist_id}
+    if data.get('channel'):
+        channel_id = extract_channel_id(str(data['channel']))
+        return playlist_api.playlist_videos(uploads_playlist_id(channel_id), limit), {"channel_id": channel_id}
+    if isinstance(data.get('videos'), list) and data['videos']:
+        jobs, invalid = parse_batch_videos(data['videos'])
+        return [(video_id, title) for _, video_id, title in jobs[:limit]], {"videos": len(data['videos']), "invalid": invalid}
+    raise ValueError("playlist, channel or videos is required")
+
+def start_ingest(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Start an ingestion run, or continue one with "resume": <ingest_id>; returns the response body and status code"""
+    if data.get('resume'):
+        state = ingest_manager.resume(str(data['resume']), retry_failed=bool(data.get('retry_failed')))
+        if state is None:
+            return {"error": "Ingest run not found"}, 404
+    else:
+        try:
+            videos, source = ingest_videos(data)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": f"Could not list videos: {str(e)}"}, 502
+        if not videos:
+            return {"error": "No videos to ingest"}, 400
+        state = ingest_manager.start(videos, source)
+    run_id = state["ingest_id"]
+    return {"success": True, "ingest": state, "status_url": f"/ingest/{run_id}",
+            "events_url": f"/ingest/{run_id}/events"}, 202
+
+def ingest_event_stream(run_id: str) -> Iterator[str]:
+    for event in ingest_manager.events(run_id):
+        yield ndjson_event(**event)
+
+# Videos precomputed by prime_cache.py: their transcripts and summaries are in the
+# SQLite caches and their indexes in the artifact store, so cold requests for them
+# are cache hits. ARTIFACT_WARMUP=1 also pulls the most recent ones into memory at startup.
+PRIMED_MANIFEST = os.path.join(artifact_dir(), 'primed.jsonl') if artifact_dir() else None
+ARTIFACT_WARMUP_MAX = int(os.environ.get('ARTIFACT_WARMUP_MAX', 50))
+warmup_stats = {"videos": 0, "summaries": 0, "missing": 0, "seconds": 0.0}
+
+def record_primed(video_id: str, video_title: str) -> None:
+    if PRIMED_MANIFEST is None:
+        return
+    os.makedirs(os.path.dirname(PRIMED_MANIFEST), exist_ok=True)
+    line = json.dumps({"video_id": video_id, "video_title": video_title, "primed_at": time.time()}, ensure_ascii=False)
+    with open(PRIMED_MANIFEST, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+def primed_videos() -> List[Dict[str, Any]]:
+    """Primed videos, most recently primed last (a re-primed video keeps its latest entry)"""
+    if PRIMED_MANIFEST is None or not os.path.exists(PRIMED_MANIFEST):
+        return []
+    entries: Dict[str, Dict[str, Any]] = {}
+    with open(PRIMED_MANIFEST, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries.pop(entry["video_id"], None)
+            entries[entry["video_id"]] = entry
+    return list(entries.values())
+
+def warm_up_primed(limit: int = ARTIFACT_WARMUP_MAX) -> Dict[str, Any]:
+    """Load the last `limit` primed videos' transcripts, summaries and indexes into memory"""
+    started = time.perf_counter()
+    for entry in primed_videos()[-limit:] if limit > 0 else []:
+        try:
+            transcript = cached_transcript(entry["video_id"])
+        except TranscriptUnavailableError:
+            transcript = None
+        if transcript is None:
+            warmup_stats["missing"] += 1
+            continue
+        if summary_cache.get(summary_cache_key(transcript.text, entry.get("video_title", ""))) is not None:
+            warmup_stats["summaries"] += 1
+        search_index(transcript.text)
+        if needs_index(transcript.text):
+            transcript_index(transcript.text)
+        warmup_stats["videos"] += 1
+    warmup_stats["seconds"] = round(warmup_stats["seconds"] + time.perf_counter() - started, 3)
+    return dict(warmup_stats)
+
+if os.environ.get('ARTIFACT_WARMUP') == '1':
+    threading.Thread(target=warm_up_primed, name='artifact-warmup', daemon=True).start()
+
+def health_payload() -> Dict[str, Any]:
+    return {
+        "status": "healthy",
+        "service": "YouTube Transcript AI Processor",
+        "cache": {
+            "transcripts": transcript_cache.stats(),
+            "transcript_handles": transcript_handles.stats(),
+            "summaries": summary_cache.stats(),
+            "qa_indexes": index_cache_stats(),
+            "search_indexes": search_index_cache_stats()
+        },
+        "artifacts": {
+            "qa_indexes": index_store_stats(),
+            "search_indexes": search_index_store_stats(),
+            "warmup": dict(warmup_stats)
+        },
+        "in_flight": {
+            "transcripts": transcript_flight.stats(),
+            "summaries": summary_flight.stats()
+        },
+        "summary_repairs": summary_repair_counts(),
+        "llm": llm.stats(),
+        "jobs": job_queue.stats(),
+        "ingest": ingest_manager.stats(),
+        "admission": admission.stats()
+    }
+
+def stats_collectors() -> List[StatsCollector]:
+    """Collectors exporting the stats components already keep, read at scrape time"""
+    return [
+        StatsCollector(
+            'focustube_cache', 'cache', 'Cache statistics by cache',
+            lambda: {
+                "transcripts": transcript_cache.stats(),
+                "transcript_handles": transcript_handles.stats(),
+                "transcript_tracks": transcript_resolver.choices.stats() if transcript_resolver.choices else {},
+                "summaries": summary_cache.stats(),
+                "qa_indexes": index_cache_stats(),
+                "search_indexes": search_index_cache_stats(),
+            },
+            counters=('memory_hits', 'disk_hits', 'negative_hits', 'misses', 'hits', 'sets', 'evictions', 'expirations')
+        ),
+        StatsCollector(
+            'focustube_artifacts', 'store', 'Precomputed artifact store statistics',
+            lambda: {"qa_indexes": index_store_stats(), "search_indexes": search_index_store_stats()},
+            counters=('loads', 'misses', 'saves', 'errors')
+        ),
+        StatsCollector(
+            'focustube_singleflight', 'flight', 'Request coalescing statistics',
+            lambda: {"transcripts": transcript_flight.stats(), "summaries": summary_flight.stats()},
+            counters=('leaders', 'coalesced', 'failures', 'timeouts', 'stale')
+        ),
+        StatsCollector(
+            'focustube_jobs', 'queue', 'Background job queue statistics',
+            lambda: {job_queue.name: job_queue.stats()},
+            counters=('submitted', 'deduplicated', 'succeeded', 'failed', 'retries')
+        ),
+        StatsCollector(
+            'focustube_ingest', 'manager', 'Playlist/channel ingestion statistics',
+            lambda: {"ingest": ingest_manager.stats()},
+            counters=('started', 'resumed', 'completed', 'cancelled', 'videos_done', 'videos_failed')
+        ),
+        StatsCollector(
+            'focustube_admission', 'class', 'Admission control by priority class',
+            admission.stats,
+            counters=('admitted', 'deferred', 'shed', 'admitted_tokens')
+        ),
+        StatsCollector(
+            'focustube_summary_repairs', 'part', 'Summary parts regenerated after salvage',
+            lambda: {part: {"count": count} for part, count in summary_repair_counts().items()},
+            counters=('count',)
+        ),
+        StatsCollector(
+            'focustube_llm_client', 'client', 'LLM client statistics',
+            llm_client_stats,
+            counters=('calls', 'retries', 'rate_limited', 'errors', 'prompt_tokens', 'completion_tokens',
+                      'hits', 'misses', 'recorded', 'rate_limit_granted', 'rate_limit_delayed', 'rate_limit_throttled')
+        ),
+    ]
+
+def llm_client_stats() -> Dict[str, Dict[str, Any]]:
+    """Provider stats flattened to one dict per client (the OpenAI provider has a sync and an async one)"""
+    stats = llm.stats()
+    clients = {name: value for name, value in stats.items() if isinstance(value, dict)} or {stats["provider"]: stats}
+    return {
+        name: {**client, **{f"{group}_{key}": value for group in ("concurrency", "rate_limit")
+                            for key, value in (client.get(group) or {}).items()}}
+        for name, client in clients.items()
+    }
+
+for collector in stats_collectors():
+    registry.register(collector)
+
+def begin_request_metrics(timing_requested: bool) -> Dict[str, Any]:
+    state = {"started": time.perf_counter(), "timing_token": None}
+    if TIMING_HEADER or timing_requested:
+        state["timing_token"] = start_request_timing()
+    return state
+
+def end_request_metrics(state: Optional[Dict[str, Any]], endpoint: Optional[str], status: int) -> Optional[str]:
+    """Record the request; returns the Server-Timing header value when one was asked for"""
+    if state is None:
+        return None
+    elapsed = time.perf_counter() - state["started"]
+    endpoint = endpoint or 'unknown'
+    http_requests.inc(endpoint=endpoint, status=status)
+    http_request_seconds.observe(elapsed, endpoint=endpoint)
+    if state["timing_token"] is None:
+        return None
+    timings = finish_request_timing(state["timing_token"])
+    return server_timing_header(timings + [("total", elapsed)])
+
+@app.before_request
+def start_request_metrics():
+    g.request_metrics = begin_request_metrics(request.headers.get('X-Timing') == '1')
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    header = end_request_metrics(g.pop('request_metrics', None), request.endpoint, response.status_code)
+    if header:
+        response.headers['Server-Timing'] = header
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+def profiler_command(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """POST /debug/profiler body: {"action": "start", "interval": 0.01} or {"action": "stop"}"""
+    action = data.get('action')
+    if action == 'start':
+        profiler.start(float(data.get('interval', 0.01)))
+    elif action == 'stop':
+        profiler.stop()
+    else:
+        return {"error": "action must be start or stop"}, 400
+    return profiler.stats(), 200
+
+@app.route('/debug/profiler', methods=['GET', 'POST'])
+def debug_profiler():
+    """Sampling profiler control; GET ?format=collapsed returns the samples as collapsed stacks"""
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    if request.method == 'POST':
+        body, status = profiler_command(request.get_json(silent=True) or {})
+        return jsonify(body), status
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), content_type='text/plain; charset=utf-8')
+    return jsonify(profiler.stats())
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "YouTube Transcript AI Processor"})
+    return jsonify(health_payload())
 
 @app.route('/process_video', methods=['POST'])
 def process_video():
@@ -200,97 +1232,259 @@ def process_video():
         video_title = data.get('video_title', '')
         
         # Extract video ID
-        video_id = extract_video_id(video_url)
+        with stage('extract_video_id'):
+            video_id = extract_video_id(video_url)
+        
+        if data.get('async'):
+            body, status = submit_process_video_job(video_id, data)
+            return jsonify(body), status
+        
+        if wants_stream(data):
+            return Response(
+                stream_with_context(_stream_process_video(video_id, video_title, include_transcript(data))),
+                mimetype=NDJSON_MIMETYPE,
+                headers=STREAM_HEADERS
+            )
         
         # Get transcript
-        transcript = get_transcript(video_id)
+        with stage('transcript'):
+            transcript = get_transcript(video_id)
         
-        if len(transcript) < 50:
+        if len(transcript) < MIN_TRANSCRIPT_LENGTH:
             return jsonify({"error": "Transcript too short or unavailable"}), 400
         
         # Generate summary and questions
-        ai_content = generate_summary_and_questions(transcript, video_title)
+        with stage('summary'):
+            ai_content = generate_summary_and_questions(transcript, video_title)
         
-        return jsonify({
-            "success": True,
-            "video_id": video_id,
-            "transcript": transcript,
-            "summary": ai_content["summary"],
-            "questions": ai_content["questions"],
-            "transcript_length": len(transcript)
-        })
+        return jsonify(process_video_payload(video_id, transcript, ai_content, include_transcript(data)))
         
+    except AdmissionRejected as e:
+        body, headers = admission_error(e)
+        return jsonify(body), 429, headers
     except ValueError as e:
         return jsonify({"error": f"Invalid video URL: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _stream_process_video(video_id: str, video_title: str, with_transcript: bool = True) -> Iterator[str]:
+    """Send the transcript as soon as it is available, then the summary and questions"""
+    try:
+        transcript = get_transcript(video_id)
+        if len(transcript) < MIN_TRANSCRIPT_LENGTH:
+            yield ndjson_event("error", error="Transcript too short or unavailable")
+            return
+        yield transcript_event(video_id, transcript, with_transcript)
+        
+        ai_content = generate_summary_and_questions(transcript, video_title)
+        yield ndjson_event("done", **process_video_payload(video_id, transcript, ai_content, with_transcript))
+        
+    except AdmissionRejected as e:
+        yield ndjson_event("error", status=429, **admission_error(e)[0])
+    except Exception as e:
+        yield ndjson_event("error", error=str(e))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Status (and, once finished, result or error) of a background process_video job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return conditional_json(job)
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Import a playlist, channel or list of videos in the background; "stream": true streams progress events"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "playlist, channel or videos is required"}), 400
+        
+        body, status = start_ingest(data)
+        if status == 202 and wants_stream(data):
+            return Response(
+                stream_with_context(ingest_event_stream(body["ingest"]["ingest_id"])),
+                mimetype=NDJSON_MIMETYPE,
+                headers=STREAM_HEADERS
+            )
+        return jsonify(body), status
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/ingest/<run_id>', methods=['GET', 'DELETE'])
+def ingest_status(run_id: str):
+    """Checkpointed state of an ingestion run; DELETE cancels it (resume later with POST /ingest)"""
+    if request.method == 'DELETE' and not ingest_manager.cancel(run_id):
+        return jsonify({"error": "Ingest run not found or not running"}), 404
+    state = ingest_manager.get(run_id)
+    if state is None:
+        return jsonify({"error": "Ingest run not found"}), 404
+    if request.method == 'DELETE':
+        return jsonify({"success": True, "ingest": state}), 202
+    return conditional_json(state)
+
+@app.route('/ingest/<run_id>/events', methods=['GET'])
+def ingest_events(run_id: str):
+    """NDJSON progress events of an ingestion run, starting with a snapshot of its state"""
+    if ingest_manager.get(run_id) is None:
+        return jsonify({"error": "Ingest run not found"}), 404
+    return Response(
+        stream_with_context(ingest_event_stream(run_id)),
+        mimetype=NDJSON_MIMETYPE,
+        headers=STREAM_HEADERS
+    )
+
+@app.route('/transcripts/<path:handle>', methods=['GET'])
+def get_stored_transcript(handle: str):
+    """A stored transcript by handle; ?segments=1 adds per-segment timestamps"""
+    try:
+        transcript, handle = request_transcript({"transcript_handle": handle})
+        if transcript is None:
+            transcript = get_transcript_segments(handle)
+        return conditional_json(transcript_resource(handle, transcript, request.args.get('segments') == '1'))
+        
+    except (UnknownTranscriptHandleError, TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def conditional_json(payload: Dict[str, Any]) -> Response:
+    """JSON response with an ETag, answered with 304 when the client's copy is current"""
+    response = jsonify(payload)
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    if should_gzip(response.status_code, response.mimetype, accept_encoding, response.content_length or 0):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @app.route('/ask_question', methods=['POST'])
 def ask_question():
     """Endpoint for students to ask questions about the video"""
     try:
         data = request.get_json()
         
-        if not data or 'question' not in data or 'transcript' not in data:
-            return jsonify({"error": "question and transcript are required"}), 400
+        if not data or 'question' not in data or not has_transcript(data):
+            return jsonify({"error": "question and transcript (or transcript_handle) are required"}), 400
         
         question = data['question']
-        transcript = data['transcript']
+        segments, handle = request_transcript(data)
+        if segments is None:
+            segments = get_transcript_segments(handle)
+        transcript = segments.text
         video_title = data.get('video_title', '')
+        # Built once: it sizes the admission and is the prompt that is sent
+        with stage('qa_context'):
+            kwargs = question_completion_kwargs(question, transcript, video_title)
+        
+        if wants_stream(data):
+            # Admitted before streaming starts so a shed request still gets a real 429
+            ticket = admit_question(kwargs)
+            response = Response(
+                stream_with_context(_stream_answer(question, transcript, video_title, handle, ticket, kwargs)),
+                mimetype=NDJSON_MIMETYPE,
+                headers=STREAM_HEADERS
+            )
+            response.call_on_close(ticket.release)
+            return response
         
         # Generate answer
-        answer = ask_question_about_transcript(question, transcript, video_title)
+        with admit_question(kwargs):
+            answer = ask_question_about_transcript(question, transcript, video_title, kwargs)
         
         return jsonify({
             "success": True,
             "question": question,
-            "answer": answer
+            "answer": answer,
+            "transcript_handle": handle
         })
         
+    except AdmissionRejected as e:
+        body, headers = admission_error(e)
+        return jsonify(body), 429, headers
+    except (UnknownTranscriptHandleError, TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _stream_answer(question: str, transcript: str, video_title: str, handle: str, ticket: Ticket,
+                   kwargs: Dict[str, Any]) -> Iterator[str]:
+    try:
+        parts = []
+        for token in stream_answer_about_transcript(question, transcript, video_title, kwargs):
+            parts.append(token)
+            yield ndjson_event("token", content=token)
+        yield ndjson_event("done", success=True, question=question, answer=''.join(parts), transcript_handle=handle)
+        
+    except Exception as e:
+        yield ndjson_event("error", error=str(e))
+    finally:
+        ticket.release()
+
 @app.route('/search_transcript', methods=['POST'])
 def search_transcript():
     """Search for specific content within the transcript"""
     try:
         data = request.get_json()
         
-        if not data or 'query' not in data or 'transcript' not in data:
-            return jsonify({"error": "query and transcript are required"}), 400
+        if not data or 'query' not in data or not has_transcript(data):
+            return jsonify({"error": "query and transcript (or transcript_handle) are required"}), 400
+        
+        segments, handle = request_transcript(data)
+        if segments is None:
+            segments = get_transcript_segments(handle)
+        return jsonify({**search_transcript_text(data['query'], segments.text, segments), "transcript_handle": handle})
+        
+    except (UnknownTranscriptHandleError, TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/process_videos', methods=['POST'])
+def process_videos():
+    """Process a batch of videos (e.g. a playlist) with bounded parallelism"""
+    try:
+        data = request.get_json()
         
-        query = data['query'].lower()
-        transcript = data['transcript']
+        error = validate_batch_request(data)
+        if error:
+            return jsonify({"error": error}), 400
         
-        # Simple search implementation
-        sentences = transcript.split('.')
-        relevant_sentences = []
+        jobs, invalid = parse_batch_videos(data['videos'])
         
-        for i, sentence in enumerate(sentences):
-            if query in sentence.lower():
-                # Include context (previous and next sentence)
-                context_start = max(0, i-1)
-                context_end = min(len(sentences), i+2)
-                context = '. '.join(sentences[context_start:context_end]).strip()
-                
-                relevant_sentences.append({
-                    "text": context,
-                    "relevance_score": sentence.lower().count(query)
-                })
+        if wants_stream(data):
+            return Response(
+                stream_with_context(_stream_batch(jobs, invalid)),
+                mimetype=NDJSON_MIMETYPE,
+                headers=STREAM_HEADERS
+            )
         
-        # Sort by relevance
-        relevant_sentences.sort(key=lambda x: x["relevance_score"], reverse=True)
+        results = invalid + list(iter_batch_results(jobs))
+        results.sort(key=lambda r: r["index"])
         
-        return jsonify({
-            "success": True,
-            "query": query,
-            "results": relevant_sentences[:5],  # Top 5 results
-            "total_matches": len(relevant_sentences)
-        })
+        return jsonify({"success": True, "results": results, **batch_summary(results)})
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _stream_batch(jobs: List[Tuple[int, str, str]], invalid: List[Dict[str, Any]]) -> Iterator[str]:
+    results = []
+    for result in invalid:
+        results.append(result)
+        yield ndjson_event("video", **result)
+    for result in iter_batch_results(jobs):
+        results.append(result)
+        yield ndjson_event("video", **result)
+    yield ndjson_event("done", success=True, **batch_summary(results))
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
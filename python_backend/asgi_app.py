@@ -0,0 +1,542 @@
+"""
+Async (ASGI) serving mode for the YouTube Transcript AI backend.
+
+Exposes the same routes and JSON contracts as app.py, but the OpenAI calls go
+through the async LLM client and transcript fetches run on a bounded thread pool, so a
+slow upstream never blocks the event loop. Caches and prompt templates are
+shared with app.py.
+"""
+import asyncio
+import contextvars
+import gzip
+import json
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+
+import app as core
+from admission import BULK, INTERACTIVE, AdmissionRejected, Ticket
+from metrics import StatsCollector, profiler, registry, stage
+from singleflight import AsyncSingleFlight
+from transcript_model import Transcript
+
+app = cors(Quart(__name__))
+
+# youtube_transcript_api is blocking, so fetches get their own pool instead of the default executor
+transcript_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('TRANSCRIPT_FETCH_THREADS', 16)),
+    thread_name_prefix='transcript-fetch'
+)
+
+# SQLite cache reads, decompression, tokenizing and index builds are blocking too; they run here,
+# apart from the default executor that long-lived ingest event streams wait in
+blocking_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BLOCKING_THREADS', 16)),
+    thread_name_prefix='blocking'
+)
+
+async def off_loop(fn: Callable[..., Any], *args: Any) -> Any:
+    """fn(*args) on blocking_executor; the copied context carries the request's stage timings"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, contextvars.copy_context().run, fn, *args)
+
+transcript_flight = AsyncSingleFlight('transcript', timeout=core.SINGLEFLIGHT_TIMEOUT)
+summary_flight = AsyncSingleFlight('summary', timeout=core.SINGLEFLIGHT_TIMEOUT)
+
+# app.py's provider; its async side shares the requests/tokens budget with the job and batch threads
+llm = core.llm
+
+registry.register(StatsCollector(
+    'focustube_async_singleflight', 'flight', 'Request coalescing statistics (event loop)',
+    lambda: {"transcripts": transcript_flight.stats(), "summaries": summary_flight.stats()},
+    counters=('leaders', 'coalesced', 'failures', 'timeouts')
+))
+
+async def llm_complete(call: str, **kwargs: Any) -> Any:
+    """Async core.llm_complete"""
+    with stage(f'llm_{call}'):
+        try:
+            response = await llm.acomplete(**kwargs)
+        except Exception:
+            core.llm_calls.inc(call=call, outcome='error')
+            raise
+    core.record_llm_usage(call, response)
+    return response
+
+async def get_transcript(video_id: str) -> str:
+    """Async get_transcript: cache hits return inline, misses are coalesced and fetched off-loop"""
+    return (await get_transcript_segments(video_id)).text
+
+async def get_transcript_segments(video_id: str) -> Transcript:
+    cached = await off_loop(core.cached_transcript, video_id)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    return await transcript_flight.do(
+        video_id,
+        # The copied context carries the request's stage timings into the fetch thread
+        lambda: loop.run_in_executor(
+            transcript_executor, contextvars.copy_context().run, core._get_transcript_uncoalesced, video_id
+        )
+    )
+
+async def request_transcript(data: Dict[str, Any]) -> Tuple[Transcript, str]:
+    """core.request_transcript, fetching video ID handles that are not cached yet"""
+    transcript, handle = await off_loop(core.request_transcript, data)
+    if transcript is None:
+        transcript = await get_transcript_segments(handle)
+    return transcript, handle
+
+async def generate_summary_and_questions(transcript: str, video_title: str = "", max_wait: Any = 'default') -> Dict[str, Any]:
+    """
+    Async generate_summary_and_questions sharing the content-hash cache with
+    app.py; as there, only the single-flight leader is admitted and callers
+    only coalesce with others of the same max_wait policy
+    """
+    cache_key, cached = await off_loop(cached_summary, transcript, video_title)
+    if cached is not None:
+        return cached
+
+    return await summary_flight.do(
+        f'{cache_key}:{max_wait}', lambda: _generate_admitted_summary(cache_key, transcript, video_title, max_wait)
+    )
+
+async def _generate_admitted_summary(cache_key: str, transcript: str, video_title: str, max_wait: Any) -> Dict[str, Any]:
+    # A leader that started after an earlier one finished finds its result
+    cached = await off_loop(cached_json, cache_key)
+    if cached is not None:
+        return cached
+    sections = await off_loop(core.summary_sections, transcript)
+    ticket = await admit_summary(transcript, video_title, sections, max_wait)
+    try:
+        return await _generate_summary(cache_key, transcript, video_title, sections)
+    finally:
+        ticket.release()
+
+def cached_summary(transcript: str, video_title: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    cache_key = core.summary_cache_key(transcript, video_title)
+    cached = core.summary_cache.get(cache_key)
+    return cache_key, json.loads(cached.value) if cached is not None else None
+
+def cached_json(cache_key: str) -> Optional[Dict[str, Any]]:
+    cached = core.summary_cache.get(cache_key)
+    return json.loads(cached.value) if cached is not None else None
+
+async def _generate_summary(cache_key: str, transcript: str, video_title: str,
+                            sections: Optional[List[str]]) -> Dict[str, Any]:
+    try:
+        if sections is not None:
+            with stage('summary_sections'):
+                transcript = await _summarize_sections(sections, video_title)
+        with stage('prompt_build'):
+            kwargs = core.summary_completion_kwargs(transcript, video_title)
+        response = await llm_complete('summary', **kwargs)
+        with stage('parse_summary'):
+            partial = core.salvage_summary_content(response.choices[0].message.content)
+        with stage('summary_repair'):
+            errors = await _repair_summary(partial, transcript, video_title)
+        return await off_loop(core.finish_summary_result, cache_key, partial, errors)
+    except Exception as e:
+        raise Exception(f"Error generating content with AI: {str(e)}")
+
+async def _repair_summary(partial: Dict[str, Any], transcript: str, video_title: str) -> List[str]:
+    """Regenerate the missing parts of partial concurrently; returns the errors of failed repairs"""
+    repairs = core.summary_repair_requests(partial, transcript, video_title)
+    replies = await asyncio.gather(
+        *(llm_complete(f'repair_{part}', **kwargs) for part, kwargs in repairs),
+        return_exceptions=True
+    )
+    errors = []
+    for (part, _), reply in zip(repairs, replies):
+        try:
+            if isinstance(reply, BaseException):
+                raise reply
+            core.apply_summary_repair(partial, part, reply.choices[0].message.content)
+        except Exception as e:
+            errors.append(f"{part}: {str(e)}")
+    return errors
+
+async def _summarize_sections(sections: List[str], video_title: str) -> str:
+    """Map step of the long-transcript path, at most SUMMARY_MAP_CONCURRENCY sections at a time"""
+    limit = asyncio.Semaphore(core.SUMMARY_MAP_CONCURRENCY)
+
+    async def notes(section: str, part: int) -> Dict[str, Any]:
+        cache_key = core.section_notes_cache_key(section, video_title, part, len(sections))
+        cached = await off_loop(cached_json, cache_key)
+        if cached is not None:
+            return cached
+        async with limit:
+            response = await llm_complete(
+                'section_notes', **core.section_notes_completion_kwargs(section, video_title, part, len(sections))
+            )
+        return await off_loop(core.parse_section_notes, cache_key, response.choices[0].message.content)
+
+    results = await asyncio.gather(
+        *(notes(section, part) for part, section in enumerate(sections, 1)),
+        return_exceptions=True
+    )
+    errors = [str(r) for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise Exception(f"{len(errors)} of {len(sections)} transcript sections failed: {errors[0]}")
+    return core.render_section_notes(results)
+
+async def ask_question_about_transcript(question: str, transcript: str, video_title: str = "",
+                                        kwargs: Optional[Dict[str, Any]] = None) -> str:
+    try:
+        if kwargs is None:
+            kwargs = await question_completion_kwargs(question, transcript, video_title)
+        response = await llm_complete('answer', **kwargs)
+        return core.parse_answer_content(response.choices[0].message.content)
+    except Exception as e:
+        raise Exception(f"Error answering question: {str(e)}")
+
+async def stream_answer_about_transcript(question: str, transcript: str, video_title: str = "",
+                                         kwargs: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    try:
+        if kwargs is None:
+            kwargs = await question_completion_kwargs(question, transcript, video_title)
+        parts = []
+        async for chunk in llm.astream(**kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        core.record_stream_usage('answer_stream', kwargs, ''.join(parts))
+    except Exception as e:
+        core.llm_calls.inc(call='answer_stream', outcome='error')
+        raise Exception(f"Error answering question: {str(e)}")
+
+async def question_completion_kwargs(question: str, transcript: str, video_title: str = "") -> Dict[str, Any]:
+    with stage('qa_context'):
+        return await off_loop(core.question_completion_kwargs, question, transcript, video_title)
+
+async def admit_summary(transcript: str, video_title: str, sections: Optional[List[str]], max_wait: Any = 'default') -> Ticket:
+    """core.admit_summary on the event loop"""
+    tokens = await off_loop(core.summary_prompt_tokens, transcript, video_title, sections)
+    with stage('admission'):
+        return await core.admission.aadmit(BULK, tokens, max_wait)
+
+async def admit_question(kwargs: Dict[str, Any]) -> Ticket:
+    with stage('admission'):
+        return await core.admission.aadmit(INTERACTIVE, core.estimate_tokens(kwargs))
+
+batch_transcript_slots = asyncio.Semaphore(core.BATCH_TRANSCRIPT_CONCURRENCY)
+batch_generation_slots = asyncio.Semaphore(core.BATCH_GENERATION_CONCURRENCY)
+
+async def _process_batch_item(index: int, video_id: str, video_title: str) -> Dict[str, Any]:
+    try:
+        async with batch_transcript_slots:
+            transcript = await get_transcript(video_id)
+        if len(transcript) < core.MIN_TRANSCRIPT_LENGTH:
+            return core.batch_item_error(index, video_id, "Transcript too short or unavailable")
+        async with batch_generation_slots:
+            ai_content = await generate_summary_and_questions(transcript, video_title, max_wait=None)
+        return {"index": index, **core.process_video_payload(video_id, transcript, ai_content)}
+    except Exception as e:
+        return core.batch_item_error(index, video_id, str(e))
+
+async def iter_batch_results(jobs: List[Tuple[int, str, str]]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each video's result as soon as it finishes"""
+    tasks = [asyncio.ensure_future(_process_batch_item(*job)) for job in jobs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def ndjson_response(events: AsyncIterator[str]) -> Response:
+    return Response(events, mimetype=core.NDJSON_MIMETYPE, headers=core.STREAM_HEADERS)
+
+@app.before_request
+async def start_request_metrics():
+    g.request_metrics = core.begin_request_metrics(request.headers.get('X-Timing') == '1')
+
+@app.after_request
+async def record_request_metrics(response: Response) -> Response:
+    header = core.end_request_metrics(g.pop('request_metrics', None), request.endpoint, response.status_code)
+    if header:
+        response.headers['Server-Timing'] = header
+    return response
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(core.registry.render(), content_type=core.METRICS_CONTENT_TYPE)
+
+@app.route('/debug/profiler', methods=['GET', 'POST'])
+async def debug_profiler():
+    """Sampling profiler control; GET ?format=collapsed returns the samples as collapsed stacks"""
+    if not core.PROFILER_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    if request.method == 'POST':
+        body, status = core.profiler_command(await request.get_json(silent=True) or {})
+        return jsonify(body), status
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), content_type='text/plain; charset=utf-8')
+    return jsonify(profiler.stats())
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    payload = await off_loop(core.health_payload)
+    payload["in_flight"] = {
+        "transcripts": transcript_flight.stats(),
+        "summaries": summary_flight.stats()
+    }
+    return jsonify(payload)
+
+@app.route('/process_video', methods=['POST'])
+async def process_video():
+    """Main endpoint to process YouTube video and generate content"""
+    try:
+        data = await request.get_json(silent=True)
+
+        if not data or 'video_url' not in data:
+            return jsonify({"error": "video_url is required"}), 400
+
+        with stage('extract_video_id'):
+            video_id = core.extract_video_id(data['video_url'])
+        if data.get('async'):
+            body, status = await off_loop(core.submit_process_video_job, video_id, data)
+            return jsonify(body), status
+        if core.wants_stream(data):
+            return ndjson_response(_stream_process_video(video_id, data.get('video_title', ''), core.include_transcript(data)))
+
+        with stage('transcript'):
+            transcript = await get_transcript(video_id)
+
+        if len(transcript) < core.MIN_TRANSCRIPT_LENGTH:
+            return jsonify({"error": "Transcript too short or unavailable"}), 400
+
+        with stage('summary'):
+            ai_content = await generate_summary_and_questions(transcript, data.get('video_title', ''))
+
+        return jsonify(core.process_video_payload(video_id, transcript, ai_content, core.include_transcript(data)))
+
+    except AdmissionRejected as e:
+        body, headers = core.admission_error(e)
+        return jsonify(body), 429, headers
+    except ValueError as e:
+        return jsonify({"error": f"Invalid video URL: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def _stream_process_video(video_id: str, video_title: str, with_transcript: bool = True) -> AsyncIterator[str]:
+    """Send the transcript as soon as it is available, then the summary and questions"""
+    try:
+        transcript = await get_transcript(video_id)
+        if len(transcript) < core.MIN_TRANSCRIPT_LENGTH:
+            yield core.ndjson_event("error", error="Transcript too short or unavailable")
+            return
+        yield core.transcript_event(video_id, transcript, with_transcript)
+
+        ai_content = await generate_summary_and_questions(transcript, video_title)
+        yield core.ndjson_event("done", **core.process_video_payload(video_id, transcript, ai_content, with_transcript))
+
+    except AdmissionRejected as e:
+        yield core.ndjson_event("error", status=429, **core.admission_error(e)[0])
+    except Exception as e:
+        yield core.ndjson_event("error", error=str(e))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id: str):
+    """Status (and, once finished, result or error) of a background process_video job"""
+    job = await off_loop(core.job_queue.get, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return await conditional_json(job)
+
+@app.route('/ingest', methods=['POST'])
+async def ingest():
+    """Import a playlist, channel or list of videos in the background; "stream": true streams progress events"""
+    try:
+        data = await request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "playlist, channel or videos is required"}), 400
+
+        # Listing a playlist is a blocking HTTP call
+        body, status = await asyncio.get_running_loop().run_in_executor(None, core.start_ingest, data)
+        if status == 202 and core.wants_stream(data):
+            return ndjson_response(ingest_event_stream(body["ingest"]["ingest_id"]))
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/ingest/<run_id>', methods=['GET', 'DELETE'])
+async def ingest_status(run_id: str):
+    """Checkpointed state of an ingestion run; DELETE cancels it (resume later with POST /ingest)"""
+    if request.method == 'DELETE' and not await off_loop(core.ingest_manager.cancel, run_id):
+        return jsonify({"error": "Ingest run not found or not running"}), 404
+    state = await off_loop(core.ingest_manager.get, run_id)
+    if state is None:
+        return jsonify({"error": "Ingest run not found"}), 404
+    if request.method == 'DELETE':
+        return jsonify({"success": True, "ingest": state}), 202
+    return await conditional_json(state)
+
+@app.route('/ingest/<run_id>/events', methods=['GET'])
+async def ingest_events(run_id: str):
+    """NDJSON progress events of an ingestion run, starting with a snapshot of its state"""
+    if await off_loop(core.ingest_manager.get, run_id) is None:
+        return jsonify({"error": "Ingest run not found"}), 404
+    return ndjson_response(ingest_event_stream(run_id))
+
+async def ingest_event_stream(run_id: str) -> AsyncIterator[str]:
+    """core.ingest_event_stream; the pipeline runs on its own threads, so waiting for events happens off-loop"""
+    lines = core.ingest_event_stream(run_id)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await loop.run_in_executor(None, next, lines, None)
+            if line is None:
+                return
+            yield line
+    finally:
+        try:
+            lines.close()
+        except ValueError:
+            # Still waiting in the executor (client went away); it unsubscribes once collected
+            pass
+
+@app.route('/transcripts/<path:handle>', methods=['GET'])
+async def get_stored_transcript(handle: str):
+    """A stored transcript by handle; ?segments=1 adds per-segment timestamps"""
+    try:
+        transcript, handle = await request_transcript({"transcript_handle": handle})
+        resource = await off_loop(core.transcript_resource, handle, transcript, request.args.get('segments') == '1')
+        return await conditional_json(resource)
+
+    except (core.UnknownTranscriptHandleError, core.TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def conditional_json(payload: Dict[str, Any]) -> Response:
+    """JSON response with an ETag, answered with 304 when the client's copy is current"""
+    response = jsonify(payload)
+    await response.add_etag()
+    return await response.make_conditional(request)
+
+@app.after_request
+async def compress_response(response: Response) -> Response:
+    if response.mimetype == core.NDJSON_MIMETYPE or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    if core.should_gzip(response.status_code, response.mimetype, accept_encoding, response.content_length or 0):
+        response.set_data(await off_loop(gzip.compress, await response.get_data(), core.GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/ask_question', methods=['POST'])
+async def ask_question():
+    """Endpoint for students to ask questions about the video"""
+    try:
+        data = await request.get_json(silent=True)
+
+        if not data or 'question' not in data or not core.has_transcript(data):
+            return jsonify({"error": "question and transcript (or transcript_handle) are required"}), 400
+
+        question = data['question']
+        video_title = data.get('video_title', '')
+        transcript, handle = await request_transcript(data)
+        # Built once: it sizes the admission and is the prompt that is sent
+        kwargs = await question_completion_kwargs(question, transcript.text, video_title)
+        # Admitted before streaming starts so a shed request still gets a real 429
+        ticket = await admit_question(kwargs)
+        if core.wants_stream(data):
+            events = _stream_answer(question, transcript.text, video_title, handle, ticket, kwargs)
+            # A client gone before the first chunk never runs the generator's finally
+            weakref.finalize(events, ticket.release)
+            return ndjson_response(events)
+
+        try:
+            answer = await ask_question_about_transcript(question, transcript.text, video_title, kwargs)
+        finally:
+            ticket.release()
+
+        return jsonify({
+            "success": True,
+            "question": question,
+            "answer": answer,
+            "transcript_handle": handle
+        })
+
+    except AdmissionRejected as e:
+        body, headers = core.admission_error(e)
+        return jsonify(body), 429, headers
+    except (core.UnknownTranscriptHandleError, core.TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def _stream_answer(question: str, transcript: str, video_title: str, handle: str, ticket: Ticket,
+                         kwargs: Dict[str, Any]) -> AsyncIterator[str]:
+    try:
+        parts = []
+        async for token in stream_answer_about_transcript(question, transcript, video_title, kwargs):
+            parts.append(token)
+            yield core.ndjson_event("token", content=token)
+        yield core.ndjson_event("done", success=True, question=question, answer=''.join(parts), transcript_handle=handle)
+
+    except Exception as e:
+        yield core.ndjson_event("error", error=str(e))
+    finally:
+        ticket.release()
+
+@app.route('/search_transcript', methods=['POST'])
+async def search_transcript():
+    """Search for specific content within the transcript"""
+    try:
+        data = await request.get_json(silent=True)
+
+        if not data or 'query' not in data or not core.has_transcript(data):
+            return jsonify({"error": "query and transcript (or transcript_handle) are required"}), 400
+
+        transcript, handle = await request_transcript(data)
+        found = await off_loop(core.search_transcript_text, data['query'], transcript.text, transcript)
+        return jsonify({**found, "transcript_handle": handle})
+
+    except (core.UnknownTranscriptHandleError, core.TranscriptUnavailableError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/process_videos', methods=['POST'])
+async def process_videos():
+    """Process a batch of videos (e.g. a playlist) with bounded parallelism"""
+    try:
+        data = await request.get_json(silent=True)
+
+        error = core.validate_batch_request(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        jobs, invalid = core.parse_batch_videos(data['videos'])
+
+        if core.wants_stream(data):
+            return ndjson_response(_stream_batch(jobs, invalid))
+
+        results = invalid + [result async for result in iter_batch_results(jobs)]
+        results.sort(key=lambda r: r["index"])
+
+        return jsonify({"success": True, "results": results, **core.batch_summary(results)})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def _stream_batch(jobs: List[Tuple[int, str, str]], invalid: List[Dict[str, Any]]) -> AsyncIterator[str]:
+    results = []
+    for result in invalid:
+        results.append(result)
+        yield core.ndjson_event("video", **result)
+    async for result in iter_batch_results(jobs):
+        results.append(result)
+        yield core.ndjson_event("video", **result)
+    yield core.ndjson_event("done", success=True, **core.batch_summary(results))
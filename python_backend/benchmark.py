@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Benchmark and load-test suite for the Python backend.
+
+    python benchmark.py                          # microbenchmarks and load scenarios
+    python benchmark.py --suite micro            # microbenchmarks only
+    python benchmark.py --server asgi -c 32 -n 400
+    python benchmark.py --compare .cache/bench/results-<earlier>.json
+
+Runs offline: YouTube is replaced by standins.FakeTranscriptApi, OpenAI by the
+fake LLM provider, and the caches live in a temporary directory. Synthetic
+transcripts range from 1 minute to 4 hours. Load scenarios drive a real HTTP
+server in this process (Flask's threaded server or uvicorn) with concurrent
+clients and report p50/p95/p99 latency, requests/second and memory. Results
+are written as JSON for comparison against later runs.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+CORPUS_MINUTES = (1, 10, 60, 240)
+
+SAMPLE_URLS = (
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://www.youtube.com/embed/dQw4w9WgXcQ',
+    'https://www.youtube.com/v/dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42',
+    'https://youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube.com/live/dQw4w9WgXcQ?si=abc',
+    'https://m.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf&index=3',
+    'dQw4w9WgXcQ',
+)
+
+# Size of the batch/playlist import run through normalize_video_urls
+IMPORT_URLS = 10000
+
+# Videos in the ingestion load scenario (30-minute lectures)
+INGEST_VIDEOS = 24
+
+SEARCH_QUERIES = ('energy', 'cell membrane', '"chemical bond"', 'photosynthesis respiration', 'gravity orbit planet')
+QUESTIONS = (
+    'What is the role of the cell membrane?',
+    'How does photosynthesis relate to energy?',
+    'Explain the experiment and its hypothesis.',
+    'Why does gravity keep a planet in orbit?',
+)
+
+# Metrics where a larger number is better; everything else is a cost
+HIGHER_IS_BETTER = ('rps', 'ops_per_second', 'videos_per_second')
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def memory_stats() -> Dict[str, float]:
+    """Current and peak resident set size of this process (server and clients together)"""
+    current = 0.0
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return {"rss_mb": round(current, 1), "peak_rss_mb": round(peak_mb, 1)}
+
+
+def measure(fn: Callable[[int], Any], iterations: int, min_seconds: float) -> Dict[str, Any]:
+    """Time fn(i) per call until both the iteration count and the minimum duration are reached"""
+    timings = []
+    started = time.perf_counter()
+    i = 0
+    while i < iterations or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - t0)
+        i += 1
+    total = sum(timings)
+    return {**latency_stats(timings), "ops_per_second": round(len(timings) / total, 1) if total else 0.0}
+
+
+def run_micro(args: argparse.Namespace) -> Dict[str, Any]:
+    import app as core
+    import retrieval
+    import search
+    import youtube_urls
+    from standins import synthetic_entries, synthetic_video_id
+    from transcript_model import Transcript
+
+    results: Dict[str, Any] = {}
+
+    def record(name: str, fn: Callable[[int], Any], iterations: int) -> None:
+        results[name] = measure(fn, iterations, args.min_seconds)
+        print(f"  {name:<28} p50 {results[name]['p50_ms']:>10.3f} ms   {results[name]['ops_per_second']:>12.1f} ops/s")
+
+    record('extract_video_id', lambda i: core.extract_video_id(SAMPLE_URLS[i % len(SAMPLE_URLS)]), 20000)
+    # Every third URL repeats an earlier video and one in fifty is junk, as in pasted playlists
+    imports = [
+        'not a video' if n % 50 == 49 else
+        SAMPLE_URLS[n % len(SAMPLE_URLS)].replace('dQw4w9WgXcQ', synthetic_video_id(10, n - n % 3))
+        for n in range(IMPORT_URLS)
+    ]
+    record(f'normalize_urls_{IMPORT_URLS}', lambda i: youtube_urls.normalize_video_urls(imports), 20)
+
+    for minutes in CORPUS_MINUTES:
+        entries = synthetic_entries(minutes, seed='micro')
+        iterations = max(3, 2000 // minutes)
+        record(f'cleanup_{minutes}m', lambda i: Transcript.from_entries(entries), iterations)
+
+        text = Transcript.from_entries(entries).text
+        record(f'search_index_build_{minutes}m', lambda i: search.TranscriptSearchIndex(text), max(3, 200 // minutes))
+        index = search.TranscriptSearchIndex(text)
+        record(f'search_query_{minutes}m', lambda i: index.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]), 200)
+
+        retrieval.select_context(QUESTIONS[0], text)
+        record(f'qa_context_{minutes}m', lambda i: retrieval.select_context(QUESTIONS[i % len(QUESTIONS)], text), 200)
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind: str) -> Tuple[str, Callable[[], None]]:
+    """Serve the app on a local port in a background thread; returns (base URL, stop)"""
+    port = free_port()
+    if kind == 'asgi':
+        import uvicorn
+        import asgi_app
+        server = uvicorn.Server(uvicorn.Config(asgi_app.app, host='127.0.0.1', port=port, log_level='warning'))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop() -> None:
+            server.should_exit = True
+            thread.join(timeout=10)
+    else:
+        from werkzeug.serving import make_server
+        import app as core
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', port, core.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        def stop() -> None:
+            server.shutdown()
+    return f'http://127.0.0.1:{port}', stop
+
+
+def post(base_url: str, path: str, payload: Dict[str, Any], timeout: float) -> int:
+    request = urllib.request.Request(
+        base_url + path, data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_ingest(base_url: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """One streamed /ingest run: time to the first finished video and overall throughput"""
+    request = urllib.request.Request(
+        base_url + '/ingest', data=json.dumps({**payload, "stream": True}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    started = time.perf_counter()
+    first_video = None
+    videos = failed = 0
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            event = json.loads(line)
+            if event["event"] != "video":
+                continue
+            first_video = first_video or time.perf_counter() - started
+            videos += 1
+            failed += 0 if event["result"].get("success") else 1
+    wall = time.perf_counter() - started
+    return {
+        "videos": videos,
+        "errors": failed,
+        "first_video_ms": round((first_video or wall) * 1000, 1),
+        "wall_s": round(wall, 2),
+        "videos_per_second": round(videos / wall, 2) if wall else 0.0,
+        **memory_stats(),
+    }
+
+
+def run_scenario(base_url: str, path: str, payloads: List[Dict[str, Any]], concurrency: int,
+                 timeout: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(payload: Dict[str, Any]) -> None:
+        t0 = time.perf_counter()
+        try:
+            status = post(base_url, path, payload, timeout)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    wall = time.perf_counter() - started
+    return {
+        **latency_stats(latencies),
+        "concurrency": concurrency,
+        "rps": round(len(payloads) / wall, 2) if wall else 0.0,
+        "errors": errors,
+        **memory_stats(),
+    }
+
+
+def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    import app as core
+    from standins import FakePlaylistApi, FakeTranscriptApi, synthetic_playlist_id, synthetic_video_id
+
+    core.transcript_resolver.api = FakeTranscriptApi(latency=args.youtube_latency)
+    core.playlist_api = FakePlaylistApi(latency=args.youtube_latency)
+    base_url, stop = start_server(args.server)
+    n, c, timeout = args.requests, args.concurrency, args.timeout
+    results: Dict[str, Any] = {}
+
+    def record(name: str, path: str, payloads: List[Dict[str, Any]]) -> None:
+        results[name] = run_scenario(base_url, path, payloads, c, timeout)
+        r = results[name]
+        print(f"  {name:<28} p50 {r['p50_ms']:>9.1f}  p95 {r['p95_ms']:>9.1f}  p99 {r['p99_ms']:>9.1f} ms"
+              f"   {r['rps']:>8.1f} rps   rss {r['rss_mb']} MB   errors {r['errors'] or 0}")
+
+    try:
+        videos = [synthetic_video_id(CORPUS_MINUTES[i % len(CORPUS_MINUTES)], i) for i in range(max(1, n // 4))]
+        record('process_video_cold', '/process_video', [
+            {"video_url": video, "video_title": f"Lecture {i}", "include_transcript": False}
+            for i, video in enumerate(videos)
+        ])
+        record('process_video_warm', '/process_video', [
+            {"video_url": videos[i % len(videos)], "video_title": f"Lecture {i % len(videos)}", "include_transcript": False}
+            for i in range(n)
+        ])
+
+        for minutes in (10, 240):
+            handle = synthetic_video_id(minutes, 9000)
+            post(base_url, '/search_transcript', {"query": "warm up", "transcript_handle": handle}, timeout)
+            record(f'ask_question_{minutes}m', '/ask_question', [
+                {"question": QUESTIONS[i % len(QUESTIONS)], "transcript_handle": handle} for i in range(n)
+            ])
+            record(f'search_transcript_{minutes}m', '/search_transcript', [
+                {"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)], "transcript_handle": handle} for i in range(n)
+            ])
+
+        # The pre-handle contract: the client posts the whole transcript with every question
+        transcript = core.get_transcript(synthetic_video_id(60, 9001))
+        record('search_transcript_posted_60m', '/search_transcript', [
+            {"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)], "transcript": transcript} for i in range(n)
+        ])
+
+        # A course import: every video is new, so fetch, cleanup and generation all overlap
+        r = results['ingest_playlist'] = run_ingest(base_url, {"playlist": synthetic_playlist_id(30, INGEST_VIDEOS)}, timeout * 10)
+        print(f"  {'ingest_playlist':<28} first video {r['first_video_ms']:>9.1f} ms   {r['videos']} videos in {r['wall_s']} s"
+              f"   {r['videos_per_second']:>6.2f} videos/s   errors {r['errors'] or 0}")
+    finally:
+        stop()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=current_dir,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the change of every shared metric; a regression is flagged with '!'"""
+    print(f"\nComparison with {previous['meta'].get('timestamp')} ({previous['meta'].get('commit')}):")
+    for suite in ('micro', 'load'):
+        for name, metrics in current.get(suite, {}).items():
+            before = previous.get(suite, {}).get(name)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'ops_per_second', 'first_video_ms',
+                           'videos_per_second', 'rss_mb'):
+                if metric not in metrics or not before.get(metric):
+                    continue
+                change = (metrics[metric] - before[metric]) / before[metric] * 100
+                worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+                flag = '!' if worse and abs(change) >= 10 else ' '
+                print(f" {flag} {suite}/{name:<28} {metric:<15} {before[metric]:>12} -> {metrics[metric]:<12} {change:+.1f}%")
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Must run before app is imported: caches, LLM provider and job queue read these at import"""
+    os.environ['FOCUSTUBE_CACHE_DIR'] = args.cache_dir or tempfile.mkdtemp(prefix='focustube-bench-')
+    os.environ['LLM_PROVIDER'] = 'fake'
+    os.environ['LLM_FAKE_LATENCY'] = str(args.llm_latency)
+    os.environ['LLM_FAKE_TOKENS_PER_SECOND'] = str(args.llm_tokens_per_second)
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    # The fake provider has no tokens/minute limit; budgets sized for OpenAI would shed most load scenarios
+    os.environ.setdefault('ADMISSION_INTERACTIVE_TOKENS_PER_MINUTE', '1e9')
+    os.environ.setdefault('ADMISSION_BULK_TOKENS_PER_MINUTE', '1e9')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', choices=('all', 'micro', 'load'), default='all')
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask')
+    parser.add_argument('-n', '--requests', type=int, default=200, help='requests per load scenario')
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout (seconds)')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='minimum run time per microbenchmark')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='fake LLM time to first token (seconds)')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=2000.0)
+    parser.add_argument('--youtube-latency', type=float, default=0.05, help='fake YouTube list/fetch latency (seconds)')
+    parser.add_argument('--cache-dir', help='cache directory (default: a fresh temporary directory)')
+    parser.add_argument('--output', help='results file (default: .cache/bench/results-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    configure_environment(args)
+    timestamp = time.strftime('%Y%m%dT%H%M%S')
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": timestamp,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+    if args.suite in ('all', 'micro'):
+        print("Microbenchmarks:")
+        results["micro"] = run_micro(args)
+    if args.suite in ('all', 'load'):
+        print(f"Load scenarios ({args.server}, {args.requests} requests, concurrency {args.concurrency}):")
+        results["load"] = run_load(args)
+
+    output = args.output or os.path.join(current_dir, '.cache', 'bench', f'results-{timestamp}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+Two-level (memory + SQLite) cache used by the transcript AI backend, plus
+on-disk stores for derived objects
+"""
+import marshal
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+
+class StringCodec:
+    """Default value codec: values are stored as-is"""
+
+    @staticmethod
+    def dumps(value: str) -> str:
+        return value
+
+    @staticmethod
+    def loads(raw: str) -> str:
+        return raw
+
+    @staticmethod
+    def size(value: str) -> int:
+        return len(value.encode('utf-8'))
+
+
+class CacheEntry:
+    """A cached value together with its expiry time and negative flag"""
+    __slots__ = ('value', 'expires_at', 'negative', 'size')
+
+    def __init__(self, value: Any, expires_at: float, negative: bool = False, size: int = 0):
+        self.value = value
+        self.expires_at = expires_at
+        self.negative = negative
+        self.size = size
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at <= now
+
+
+class TieredCache:
+    """
+    Cache with an in-process LRU (bounded by total value size) in front of a
+    zlib-compressed SQLite table. Entries carry a TTL; negative entries record
+    "known missing" results (as a message string) so repeat lookups skip the
+    upstream call. The codec turns values into strings for the SQLite table;
+    the memory tier keeps the decoded objects.
+
+    The lock only guards the memory tier and counters: SQLite I/O, zlib and
+    the codec run outside it, on a connection per thread.
+    """
+
+    PURGE_EVERY = 256
+
+    def __init__(self, name: str, db_path: Optional[str] = None,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 7 * 24 * 3600, negative_ttl: float = 6 * 3600,
+                 codec: Any = StringCodec):
+        self.name = name
+        self.codec = codec
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        # Bumped by every write so a disk read racing one is not promoted over it
+        self._generation = 0
+        self._writes = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self._local = threading.local()
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            db = self._connection()
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self._table}" ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'expires_at REAL NOT NULL, negative INTEGER NOT NULL DEFAULT 0)'
+            )
+            self._purge_disk()
+
+    @property
+    def _table(self) -> str:
+        return f"cache_{self.name}"
+
+    @property
+    def disk_enabled(self) -> bool:
+        return bool(self.db_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection to the cache database"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        return db
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the live entry for key, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry.expired(now):
+                    self._drop_memory(key)
+                    self._stats["expirations"] += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self._stats["negative_hits" if entry.negative else "memory_hits"] += 1
+                    return entry
+            generation = self._generation
+
+        entry, expired = self._load_disk(key, now)
+        with self._lock:
+            if expired:
+                self._stats["expirations"] += 1
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["negative_hits" if entry.negative else "disk_hits"] += 1
+            if self._generation == generation:
+                self._store_memory(key, entry)
+            return entry
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache a positive result"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._set(key, CacheEntry(value, expires_at, size=self.codec.size(value)))
+
+    def set_negative(self, key: str, message: str, ttl: Optional[float] = None) -> None:
+        """Cache a "not available" result so it is not re-fetched until it expires"""
+        expires_at = time.time() + (self.negative_ttl if ttl is None else ttl)
+        self._set(key, CacheEntry(message, expires_at, negative=True, size=StringCodec.size(message)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._drop_memory(key)
+        if self.disk_enabled:
+            self._connection().execute(f'DELETE FROM "{self._table}" WHERE key = ?', (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.disk_enabled:
+            self._connection().execute(f'DELETE FROM "{self._table}"')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["negative_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_enabled": self.disk_enabled,
+            }
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        blob = zlib.compress(self._dumps(entry).encode('utf-8')) if self.disk_enabled else None
+        with self._lock:
+            self._generation += 1
+            self._stats["sets"] += 1
+            self._store_memory(key, entry)
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if blob is not None:
+            self._connection().execute(
+                f'INSERT OR REPLACE INTO "{self._table}" (key, value, expires_at, negative) VALUES (?, ?, ?, ?)',
+                (key, blob, entry.expires_at, int(entry.negative))
+            )
+            if purge:
+                self._purge_disk()
+
+    def _store_memory(self, key: str, entry: CacheEntry) -> None:
+        self._drop_memory(key)
+        if entry.size > self.max_memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self._stats["evictions"] += 1
+
+    def _drop_memory(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+
+    def _load_disk(self, key: str, now: float) -> Tuple[Optional[CacheEntry], bool]:
+        """(entry, expired): the live disk entry for key, and whether an expired one was dropped"""
+        if not self.disk_enabled:
+            return None, False
+        db = self._connection()
+        row = db.execute(
+            f'SELECT value, expires_at, negative FROM "{self._table}" WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None, False
+        if row[1] <= now:
+            db.execute(f'DELETE FROM "{self._table}" WHERE key = ? AND expires_at <= ?', (key, now))
+            return None, True
+        raw = zlib.decompress(row[0]).decode('utf-8')
+        if row[2]:
+            return CacheEntry(raw, row[1], negative=True, size=StringCodec.size(raw)), False
+        value = self.codec.loads(raw)
+        return CacheEntry(value, row[1], size=self.codec.size(value)), False
+
+    def _dumps(self, entry: CacheEntry) -> str:
+        return entry.value if entry.negative else self.codec.dumps(entry.value)
+
+    def _purge_disk(self) -> None:
+        self._connection().execute(f'DELETE FROM "{self._table}" WHERE expires_at <= ?', (time.time(),))
+
+
+class MemoLRU:
+    """
+    Thread-safe in-memory LRU for derived objects (indexes etc.) bounded by
+    entry count and, when max_bytes is set, by the callers' size estimates
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_build(self, key: str, build: Callable[[], Any], size: int = 0) -> Any:
+        """Return the entry for key, building it outside the lock on a miss; size is its approximate footprint"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+
+        value = build()
+        with self._lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries,
+                    "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class ArtifactStore:
+    """
+    Precomputed derived objects (search and Q&A index states) as one marshal
+    file per key under <cache dir>/artifacts/<kind>/. Files are memory-mapped
+    and decoded only when a lookup misses the in-memory LRU in front of the
+    store. marshal holds plain data only, so loading a file never runs code.
+    Bump `version` when the state layout or the tokenizer behind it changes;
+    files of other versions are ignored.
+    """
+
+    def __init__(self, kind: str, version: int, directory: Optional[str] = None):
+        self.kind = kind
+        self.version = version
+        self.directory = os.path.join(directory, kind) if directory else None
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "misses": 0, "saves": 0, "errors": 0}
+
+    def path(self, key: str) -> Optional[str]:
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, f"{key}.v{self.version}.marshal")
+
+    def has(self, key: str) -> bool:
+        path = self.path(key)
+        return path is not None and os.path.exists(path)
+
+    def load(self, key: str) -> Optional[Any]:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                value = marshal.loads(mapped)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError, EOFError, TypeError):
+            self._count("errors")
+            return None
+        self._count("loads")
+        return value
+
+    def save(self, key: str, value: Any) -> bool:
+        """Write value atomically; False when the store is disabled"""
+        path = self.path(key)
+        if path is None:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, 'wb') as f:
+            marshal.dump(value, f)
+        os.replace(temp, path)
+        self._count("saves")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "enabled": self.directory is not None}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+def artifact_dir() -> Optional[str]:
+    """Directory of precomputed artifacts (next to the SQLite cache); None when disk caching is disabled"""
+    cache_dir = os.environ.get('FOCUSTUBE_CACHE_DIR', DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, 'artifacts')
+
+
+def cache_db_path() -> Optional[str]:
+    """SQLite file shared by all backend caches; empty FOCUSTUBE_CACHE_DIR disables disk caching"""
+    cache_dir = os.environ.get('FOCUSTUBE_CACHE_DIR', DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, 'focustube.sqlite3')
@@ -0,0 +1,648 @@
+"""
+Ingestion of whole playlists, channels or video lists.
+
+Each run streams its videos through three stages connected by bounded queues:
+
+    fetch (I/O, several threads) -> cleanup (CPU, one thread) -> generate (LLM, a few threads)
+
+Fetchers run ahead of generation by at most `prefetch` videos per queue, so
+upcoming transcripts are ready when a generator frees up, and a slow stage
+blocks the one before it instead of piling up memory. Every finished video is
+checkpointed (in SQLite when a db_path is given), so a run that was
+interrupted by a crash or restart resumes with the videos it had not finished.
+The process running a run holds a renewed lease on its checkpoint, so other
+processes sharing the database report it as running, follow its progress and
+forward cancellations, and resume it only after that process stops.
+Progress is published as events to any number of subscribers.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Run statuses; a run checkpointed as "running" whose owner's lease expired was interrupted
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+INTERRUPTED = 'interrupted'
+
+# Video statuses
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+# Columns added to the original (id, run, updated_at) table; older rows get their status from the JSON
+_COLUMNS = (('status', 'TEXT'), ('owner', 'TEXT'), ('lease_until', 'REAL'), ('cancel_requested', 'INTEGER DEFAULT 0'))
+
+_END = object()
+
+
+class CheckpointStore:
+    """
+    Run states by ID, in SQLite (in memory without a db_path). The process
+    executing a run owns its row through a lease it keeps renewing, so other
+    processes sharing the database (uvicorn workers) see the run as running
+    rather than interrupted, and may only take it over once the lease expires.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, table: str = 'ingest_runs', lease: float = 60.0):
+        self.table = table
+        self.lease = lease
+        self.persistent = bool(db_path)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path or ':memory:', check_same_thread=False, isolation_level=None, timeout=30)
+        if self.persistent:
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._create_table()
+
+    def save(self, state: Dict[str, Any]) -> bool:
+        """Checkpoint a run executing here; False when another process has taken it over"""
+        now = time.time()
+        running = state["status"] == RUNNING
+        with self._transaction() as db:
+            row = db.execute(f'SELECT status, owner, lease_until FROM "{self.table}" WHERE id = ?',
+                             (state["id"],)).fetchone()
+            if row is not None and self._leased_elsewhere(*row, now):
+                return False
+            db.execute(
+                f'INSERT INTO "{self.table}" (id, run, updated_at, status, owner, lease_until) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET run = excluded.run, updated_at = excluded.updated_at, '
+                'status = excluded.status, owner = excluded.owner, lease_until = excluded.lease_until',
+                (state["id"], json.dumps(state, ensure_ascii=False), state["updated_at"], state["status"],
+                 self.owner if running else None, now + self.lease if running else None)
+            )
+        return True
+
+    def claim(self, run_id: str, prepare: Callable[[Dict[str, Any]], bool]) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        (state, claimed) for a run, or None if unknown. A run another process
+        holds a lease on is left alone; otherwise prepare(state) may edit it and
+        says whether to run it here, in which case it is saved as running under
+        this process's lease. Only one process can claim a run.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(f'SELECT run, status, owner, lease_until FROM "{self.table}" WHERE id = ?',
+                             (run_id,)).fetchone()
+            if row is None:
+                return None
+            state = json.loads(row[0])
+            if self._leased_elsewhere(*row[1:], now) or not prepare(state):
+                return state, False
+            state["status"] = RUNNING
+            state["updated_at"] = now
+            db.execute(
+                f'UPDATE "{self.table}" SET run = ?, updated_at = ?, status = ?, owner = ?, lease_until = ?, '
+                'cancel_requested = 0 WHERE id = ?',
+                (json.dumps(state, ensure_ascii=False), now, RUNNING, self.owner, now + self.lease, run_id)
+            )
+        return state, True
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f'SELECT run FROM "{self.table}" WHERE id = ?', (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def leased(self, run_id: str) -> bool:
+        """Whether some process is executing the run (its lease has not expired)"""
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT 1 FROM "{self.table}" WHERE id = ? AND status = ? AND lease_until >= ?',
+                (run_id, RUNNING, time.time())
+            ).fetchone()
+        return row is not None
+
+    def unfinished(self) -> List[str]:
+        """IDs of runs checkpointed as running whose process stopped renewing its lease"""
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT id FROM "{self.table}" WHERE status = ? AND COALESCE(lease_until, 0) < ?',
+                (RUNNING, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def renew(self) -> List[str]:
+        """Extend this process's leases; returns the IDs of its runs another process asked to cancel"""
+        with self._transaction() as db:
+            db.execute(f'UPDATE "{self.table}" SET lease_until = ? WHERE owner = ? AND status = ?',
+                       (time.time() + self.lease, self.owner, RUNNING))
+            rows = db.execute(f'SELECT id FROM "{self.table}" WHERE owner = ? AND status = ? AND cancel_requested = 1',
+                              (self.owner, RUNNING)).fetchall()
+        return [row[0] for row in rows]
+
+    def request_cancel(self, run_id: str) -> bool:
+        """Ask whichever process is executing the run to cancel it; False if none is"""
+        with self._lock:
+            return self._db.execute(
+                f'UPDATE "{self.table}" SET cancel_requested = 1 WHERE id = ? AND status = ? AND lease_until >= ?',
+                (run_id, RUNNING, time.time())
+            ).rowcount == 1
+
+    def _leased_elsewhere(self, status: str, owner: Optional[str], lease_until: Optional[float], now: float) -> bool:
+        return status == RUNNING and owner is not None and owner != self.owner and (lease_until or 0) >= now
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE takes SQLite's write lock up front: other processes wait instead of racing"""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _create_table(self) -> None:
+        # In one transaction, so worker processes starting together do not both add the columns
+        with self._transaction() as db:
+            db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}" (id TEXT PRIMARY KEY, run TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            existing = {row[1] for row in db.execute(f'PRAGMA table_info("{self.table}")')}
+            for column, kind in _COLUMNS:
+                if column not in existing:
+                    db.execute(f'ALTER TABLE "{self.table}" ADD COLUMN {column} {kind}')
+            db.execute(f"""UPDATE "{self.table}" SET status = json_extract(run, '$.status') WHERE status IS NULL""")
+
+
+class IngestRun:
+    """
+    One execution of a run: its pipeline threads, queues and subscribers.
+    stages is (fetch, cleanup, generate): fetch(video_id) returns whatever
+    cleanup(video_id, fetched) turns into a transcript string, and
+    generate(video_id, transcript, title) returns the video's result dict. An
+    exception in any stage fails that video only.
+    """
+
+    def __init__(self, state: Dict[str, Any], stages: Tuple[Callable, Callable, Callable],
+                 store: CheckpointStore, prefetch: int, fetch_workers: int, generate_workers: int,
+                 on_finish: Callable[['IngestRun'], None]):
+        self.state = state
+        self.fetch, self.cleanup, self.generate = stages
+        self.store = store
+        self.on_finish = on_finish
+        self.fetch_workers = fetch_workers
+        self.generate_workers = generate_workers
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._subscribers: List[queue.Queue] = []
+        self._todo: queue.Queue = queue.Queue()
+        self.fetched: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+        self.cleaned: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+        self._fetchers_left = fetch_workers
+        self._threads_left = 0
+        self.blocked_seconds = {"fetch": 0.0, "cleanup": 0.0}
+        # Videos finished by this execution (state counts include earlier ones when resumed)
+        self.finished = {DONE: 0, FAILED: 0}
+
+        for position, video in enumerate(state["videos"]):
+            if video["status"] == PENDING:
+                self._todo.put(position)
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    def start(self) -> None:
+        workers = [('fetch', self._fetch_worker, self.fetch_workers),
+                   ('cleanup', self._cleanup_worker, 1),
+                   ('generate', self._generate_worker, self.generate_workers)]
+        self._threads_left = sum(count for _, _, count in workers)
+        self._emit("started", pending=self._todo.qsize())
+        for name, target, count in workers:
+            for n in range(count):
+                threading.Thread(target=self._run_worker, args=(target,), name=f"ingest-{self.id[:8]}-{name}-{n}",
+                                 daemon=True).start()
+
+    def cancel(self) -> None:
+        self._stopped.set()
+
+    def subscribe(self) -> queue.Queue:
+        """Queue receiving this run's events from now on; None marks the end"""
+        events: queue.Queue = queue.Queue()
+        with self._lock:
+            if self.state["status"] != RUNNING:
+                events.put(None)
+            else:
+                self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue) -> None:
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def progress(self) -> Dict[str, Any]:
+        return {"total": len(self.state["videos"]), "done": self.state["done"], "failed": self.state["failed"],
+                "fetched_queue": self.fetched.qsize(), "cleaned_queue": self.cleaned.qsize()}
+
+    # Pipeline workers
+
+    def _run_worker(self, target: Callable[[], None]) -> None:
+        try:
+            target()
+        except Exception:
+            logger.exception("Ingest run %s worker crashed", self.id)
+            self._stopped.set()
+        finally:
+            with self._lock:
+                self._threads_left -= 1
+                last = self._threads_left == 0
+            if last:
+                self._finish()
+
+    def _fetch_worker(self) -> None:
+        try:
+            while not self._stopped.is_set():
+                try:
+                    position = self._todo.get_nowait()
+                except queue.Empty:
+                    break
+                video_id = self.state["videos"][position]["video_id"]
+                try:
+                    fetched = self.fetch(video_id)
+                except Exception as e:
+                    self._video_failed(position, 'fetch', e)
+                    continue
+                if not self._put(self.fetched, (position, fetched), 'fetch'):
+                    break
+                self._emit("fetched", index=position, video_id=video_id)
+        finally:
+            with self._lock:
+                self._fetchers_left -= 1
+                last = self._fetchers_left == 0
+            if last:
+                self._put(self.fetched, _END, 'fetch')
+
+    def _cleanup_worker(self) -> None:
+        while True:
+            item = self._get(self.fetched)
+            if item is None or item is _END:
+                break
+            position, fetched = item
+            video_id = self.state["videos"][position]["video_id"]
+            try:
+                transcript = self.cleanup(video_id, fetched)
+            except Exception as e:
+                self._video_failed(position, 'cleanup', e)
+                continue
+            if not self._put(self.cleaned, (position, transcript), 'cleanup'):
+                return
+        for _ in range(self.generate_workers):
+            self._put(self.cleaned, _END, 'cleanup')
+
+    def _generate_worker(self) -> None:
+        while True:
+            item = self._get(self.cleaned)
+            if item is None or item is _END:
+                return
+            position, transcript = item
+            video = self.state["videos"][position]
+            try:
+                result = self.generate(video["video_id"], transcript, video.get("title", ""))
+            except Exception as e:
+                self._video_failed(position, 'generate', e)
+                continue
+            self._video_done(position, result)
+
+    def _put(self, target: queue.Queue, item: Any, stage: str) -> bool:
+        """Blocking put that gives up when the run is cancelled; time spent waiting is backpressure"""
+        started = time.perf_counter()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    target.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.blocked_seconds[stage] += time.perf_counter() - started
+
+    def _get(self, source: queue.Queue) -> Any:
+        while not self._stopped.is_set():
+            try:
+                return source.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return None
+
+    # State, checkpoints and events
+
+    def _video_done(self, position: int, result: Dict[str, Any]) -> None:
+        with self._lock:
+            video = self.state["videos"][position]
+            video.update(status=DONE, error=None)
+            self.state["done"] += 1
+            self.finished[DONE] += 1
+            self._checkpoint()
+        self._emit("video", index=position, video_id=video["video_id"], result=result)
+
+    def _video_failed(self, position: int, stage: str, error: Exception) -> None:
+        with self._lock:
+            video = self.state["videos"][position]
+            video.update(status=FAILED, error=str(error), stage=stage)
+            self.state["failed"] += 1
+            self.finished[FAILED] += 1
+            self._checkpoint()
+        self._emit("video", index=position, video_id=video["video_id"],
+                   result={"success": False, "video_id": video["video_id"], "stage": stage, "error": str(error)})
+
+    def _finish(self) -> None:
+        with self._lock:
+            if self._stopped.is_set() and any(video["status"] == PENDING for video in self.state["videos"]):
+                self.state["status"] = CANCELLED
+            else:
+                self.state["status"] = COMPLETED
+            self._checkpoint()
+        self._emit("done", status=self.state["status"])
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for events in subscribers:
+            events.put(None)
+        self.on_finish(self)
+
+    def _checkpoint(self) -> None:
+        """Caller holds self._lock"""
+        self.state["updated_at"] = time.time()
+        if not self.store.save(self.state) and not self._stopped.is_set():
+            # This process stalled past its lease and another one resumed the run
+            logger.warning("Ingest run %s was taken over by another process; stopping here", self.id)
+            self._stopped.set()
+
+    def _emit(self, event: str, **fields: Any) -> None:
+        payload = {"event": event, "ingest_id": self.id, **fields, "progress": self.progress()}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            events.put(payload)
+
+
+class IngestManager:
+    """
+    Starts, resumes and tracks ingestion runs. Runs executing in another
+    process sharing the checkpoint database are read, followed and cancelled
+    through their checkpoints; with resume_interrupted, runs whose process
+    stopped are picked up here (by exactly one of the processes).
+    """
+
+    def __init__(self, fetch: Callable[[str], Any], cleanup: Callable[[str, Any], str],
+                 generate: Callable[[str, str, str], Dict[str, Any]], db_path: Optional[str] = None,
+                 prefetch: int = 4, fetch_workers: int = 4, generate_workers: int = 2, table: str = 'ingest_runs',
+                 lease: float = 60.0, poll_interval: float = 1.0, resume_interrupted: bool = False):
+        self.stages = (fetch, cleanup, generate)
+        self.store = CheckpointStore(db_path, table, lease)
+        self.prefetch = prefetch
+        self.fetch_workers = fetch_workers
+        self.generate_workers = generate_workers
+        self.poll_interval = poll_interval
+        self.resume_interrupted = resume_interrupted
+        self._lock = threading.Lock()
+        self._active: Dict[str, IngestRun] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stats = {"started": 0, "resumed": 0, "completed": 0, "cancelled": 0, "videos_done": 0, "videos_failed": 0}
+        if resume_interrupted:
+            self.resume_unfinished()
+            self._start_heartbeat()
+
+    def start(self, videos: List[Tuple[str, str]], source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Start a run over (video_id, title) pairs; returns its public state"""
+        now = time.time()
+        state = {
+            "id": uuid.uuid4().hex,
+            "status": RUNNING,
+            "source": source or {},
+            "videos": [{"video_id": video_id, "title": title, "status": PENDING, "error": None}
+                       for video_id, title in videos],
+            "done": 0,
+            "failed": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.store.save(state)
+        with self._lock:
+            self._stats["started"] += 1
+        return self._launch(state)
+
+    def resume(self, run_id: str, retry_failed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Continue a run that was interrupted or cancelled (a no-op for runs
+        executing here or in another process); retry_failed also re-queues its
+        failed videos. None if unknown.
+        """
+        return self._resume(run_id, retry_failed)[0]
+
+    def resume_unfinished(self) -> List[str]:
+        """Resume the runs left running by a process that stopped (its lease expired)"""
+        return [run_id for run_id in self.store.unfinished() if self._resume(run_id)[1]]
+
+    def _resume(self, run_id: str, retry_failed: bool = False) -> Tuple[Optional[Dict[str, Any]], bool]:
+        with self._lock:
+            run = self._active.get(run_id)
+        if run is not None:
+            return self.public(run.state, run), False
+
+        def prepare(state: Dict[str, Any]) -> bool:
+            if retry_failed:
+                for video in state["videos"]:
+                    if video["status"] == FAILED:
+                        video.update(status=PENDING, error=None)
+                        video.pop("stage", None)
+                        state["failed"] -= 1
+            if not any(video["status"] == PENDING for video in state["videos"]):
+                return False
+            state["resumed_at"] = time.time()
+            return True
+
+        claimed = self.store.claim(run_id, prepare)
+        if claimed is None:
+            return None, False
+        state, launch = claimed
+        if not launch:
+            # Nothing left to do, or still running in another process
+            return self.public(state), False
+        with self._lock:
+            self._stats["resumed"] += 1
+        return self._launch(state), True
+
+    def cancel(self, run_id: str) -> bool:
+        """Cancel a run executing here, or ask the process executing it to; False if it is not running"""
+        with self._lock:
+            run = self._active.get(run_id)
+        if run is None:
+            return self.store.request_cancel(run_id)
+        run.cancel()
+        return True
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            run = self._active.get(run_id)
+        if run is not None:
+            with run._lock:
+                return self.public(json.loads(json.dumps(run.state)), run)
+        state = self.store.load(run_id)
+        return self.public(state) if state else None
+
+    def events(self, run_id: str, heartbeat: float = 15.0) -> Iterator[Dict[str, Any]]:
+        """
+        A "progress" snapshot of the run, then its live events until it ends.
+        A "heartbeat" event is yielded after `heartbeat` quiet seconds so
+        streaming responses notice disconnected clients.
+        """
+        with self._lock:
+            run = self._active.get(run_id)
+        if run is None:
+            yield from self._follow(run_id, heartbeat)
+            return
+        events = run.subscribe()
+        try:
+            yield {"event": "progress", **self.get(run_id)}
+            while True:
+                try:
+                    event = events.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield {"event": "heartbeat", "ingest_id": run_id, "progress": run.progress()}
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            run.unsubscribe(events)
+
+    def _follow(self, run_id: str, heartbeat: float) -> Iterator[Dict[str, Any]]:
+        """
+        Events of a run not executing here, from its checkpoints: a "progress"
+        snapshot whenever it changes while another process runs it, then "done"
+        """
+        state = self.get(run_id)
+        if state is None:
+            return
+        yield {"event": "progress", **state}
+        if state["status"] != RUNNING:
+            return
+        updated_at = state["updated_at"]
+        quiet = 0.0
+        while state["status"] == RUNNING:
+            time.sleep(self.poll_interval)
+            state = self.get(run_id)
+            if state["updated_at"] != updated_at:
+                updated_at, quiet = state["updated_at"], 0.0
+                yield {"event": "progress", **state}
+                continue
+            quiet += self.poll_interval
+            if quiet >= heartbeat:
+                quiet = 0.0
+                yield {"event": "heartbeat", "ingest_id": run_id, "progress": state["progress"]}
+        yield {"event": "done", "ingest_id": run_id, "status": state["status"], "progress": state["progress"]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            runs = list(self._active.values())
+            stats = dict(self._stats)
+        stats.update(
+            active=len(runs),
+            queued_videos=sum(run.fetched.qsize() + run.cleaned.qsize() for run in runs),
+            persistent=self.store.persistent,
+        )
+        return stats
+
+    def public(self, state: Dict[str, Any], run: Optional[IngestRun] = None) -> Dict[str, Any]:
+        state = dict(state)
+        if run is None and state["status"] == RUNNING and not self.store.leased(state["id"]):
+            state["status"] = INTERRUPTED
+        state["ingest_id"] = state.pop("id")
+        state["progress"] = run.progress() if run is not None else {
+            "total": len(state["videos"]), "done": state["done"], "failed": state["failed"]
+        }
+        if run is not None:
+            state["blocked_seconds"] = {stage: round(seconds, 3) for stage, seconds in run.blocked_seconds.items()}
+        return state
+
+    def _launch(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        run = IngestRun(state, self.stages, self.store, self.prefetch, self.fetch_workers,
+                        self.generate_workers, self._finished)
+        with self._lock:
+            self._active[run.id] = run
+        self._start_heartbeat()
+        run.start()
+        return self.get(run.id)
+
+    def _start_heartbeat(self) -> None:
+        """Started with the first run, so importing the app never spawns threads"""
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._renew_leases, name=f"{self.store.table}-lease", daemon=True)
+            self._heartbeat.start()
+
+    def _renew_leases(self) -> None:
+        """Keeps this process's runs leased, applies cancellations asked for elsewhere and adopts orphaned runs"""
+        interval = min(self.store.lease / 3, self.poll_interval)
+        last_orphan_check = time.time()
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                runs = dict(self._active)
+            try:
+                if runs:
+                    for run_id in self.store.renew():
+                        if run_id in runs:
+                            runs[run_id].cancel()
+                if self.resume_interrupted and time.time() - last_orphan_check >= self.store.lease / 2:
+                    last_orphan_check = time.time()
+                    self.resume_unfinished()
+            except Exception:
+                logger.exception("Renewing ingest leases failed")
+
+    def _finished(self, run: IngestRun) -> None:
+        with self._lock:
+            self._active.pop(run.id, None)
+            self._stats["completed" if run.state["status"] == COMPLETED else "cancelled"] += 1
+            self._stats["videos_done"] += run.finished[DONE]
+            self._stats["videos_failed"] += run.finished[FAILED]
+
+
+class YouTubePlaylistApi:
+    """Lists a playlist's videos through the YouTube Data API (needs an API key)"""
+
+    URL = 'https://www.googleapis.com/youtube/v3/playlistItems'
+
+    def __init__(self, api_key: str, timeout: float = 15.0):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def playlist_videos(self, playlist_id: str, limit: int) -> List[Tuple[str, str]]:
+        """(video_id, title) pairs in playlist order, at most limit of them"""
+        if not self.api_key:
+            raise RuntimeError("YOUTUBE_API_KEY is not configured; playlist import needs the YouTube Data API")
+        videos: List[Tuple[str, str]] = []
+        page_token = ''
+        while len(videos) < limit:
+            query = {"part": "snippet", "playlistId": playlist_id, "maxResults": 50, "key": self.api_key}
+            if page_token:
+                query["pageToken"] = page_token
+            with urllib.request.urlopen(f"{self.URL}?{urllib.parse.urlencode(query)}", timeout=self.timeout) as response:
+                page = json.loads(response.read().decode('utf-8'))
+            for item in page.get("items", []):
+                snippet = item.get("snippet", {})
+                video_id = snippet.get("resourceId", {}).get("videoId")
+                if video_id:
+                    videos.append((video_id, snippet.get("title", "")))
+            page_token = page.get("nextPageToken", '')
+            if not page_token:
+                break
+        return videos[:limit]
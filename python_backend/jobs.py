@@ -0,0 +1,378 @@
+"""
+Background job queue for long-running pipeline work: a pool of worker threads,
+retries with jittered exponential backoff, de-duplication of active jobs,
+optional SQLite persistence and completion callbacks
+"""
+import ipaddress
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Columns added to the original (id, job, updated_at) table; older rows are backfilled from their JSON
+_COLUMNS = (('status', 'TEXT'), ('dedupe_key', 'TEXT'), ('run_at', 'REAL'), ('owner', 'TEXT'), ('lease_until', 'REAL'))
+
+
+
+def callback_url_error(url: str, allowed_hosts: Iterable[str] = ()) -> Optional[str]:
+    """
+    Why the server must not POST to url, or None. With allowed_hosts, only
+    those hosts are accepted; otherwise the host must resolve to public
+    addresses only, so a callback cannot reach loopback, private, link-local
+    (cloud metadata) or other internal services.
+    """
+    parsed = urllib.parse.urlsplit(str(url))
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return "callback_url must be an http(s) URL"
+    host = parsed.hostname.lower()
+    allowed = {h.strip().lower() for h in allowed_hosts if h.strip()}
+    if allowed:
+        return None if host in allowed else "callback_url host is not allowed"
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (OSError, ValueError):
+        return "callback_url host does not resolve"
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            return "callback_url must point to a public address"
+    return None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """A redirect could send the callback to an address that was never checked"""
+
+    def redirect_request(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    """
+    Jobs are plain dicts. handler(payload) returns the job result or raises;
+    exceptions listed in permanent_errors fail the job at once, anything else
+    is retried up to max_attempts times. While a job with a given dedupe key is
+    queued or running, submitting the same key returns that job instead.
+
+    The jobs table is the source of truth (an in-memory SQLite database unless
+    db_path is given), so every process sharing db_path sees the same jobs.
+    A worker claims a job with a conditional UPDATE inside an immediate
+    transaction, so each attempt runs in exactly one process, and holds a lease
+    it renews while the job runs; a job whose lease expired (its process died)
+    is claimed again, which counts as another attempt. Finished jobs are
+    deleted result_ttl after they finish.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Any], workers: int = 2,
+                 max_attempts: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 permanent_errors: Tuple[Type[BaseException], ...] = (),
+                 result_ttl: float = 3600.0, db_path: Optional[str] = None,
+                 lease: float = 60.0, poll_interval: float = 1.0, callback_hosts: Iterable[str] = ()):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.permanent_errors = permanent_errors
+        self.result_ttl = result_ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.callback_hosts = tuple(callback_hosts)
+        self.persistent = bool(db_path)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._table = f'"jobs_{name}"'
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._pruned_at = 0.0
+        self._stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retries": 0}
+
+        self._db = sqlite3.connect(db_path or ':memory:', check_same_thread=False, isolation_level=None, timeout=30)
+        if self.persistent:
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._create_table()
+        if self.persistent and self._count_active():
+            # Jobs left by a stopped process; whichever worker claims them first runs them
+            self._start_workers()
+
+    def submit(self, payload: Dict[str, Any], dedupe_key: Optional[str] = None,
+               callback_url: Optional[str] = None) -> Dict[str, Any]:
+        with self._transaction() as db:
+            if dedupe_key is not None:
+                row = db.execute(
+                    f'SELECT job FROM {self._table} WHERE dedupe_key = ? AND status IN (?, ?) LIMIT 1',
+                    (dedupe_key, QUEUED, RUNNING)
+                ).fetchone()
+                if row:
+                    self._stats["deduplicated"] += 1
+                    return self._public(json.loads(row[0]))
+
+            now = time.time()
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": QUEUED,
+                "payload": payload,
+                "dedupe_key": dedupe_key,
+                "callback_url": callback_url,
+                "attempts": 0,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            db.execute(
+                f'INSERT INTO {self._table} (id, job, updated_at, status, dedupe_key, run_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job["id"], json.dumps(job, ensure_ascii=False), now, QUEUED, dedupe_key, now)
+            )
+            self._stats["submitted"] += 1
+        self._start_workers()
+        with self._cond:
+            self._cond.notify()
+        return self._public(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            row = self._db.execute(f'SELECT job FROM {self._table} WHERE id = ?', (job_id,)).fetchone()
+        return self._public(json.loads(row[0])) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._cond:
+            depth, ready = self._db.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(run_at <= ?), 0) FROM {self._table} WHERE status = ?', (now, QUEUED)
+            ).fetchone()
+            running = self._db.execute(f'SELECT COUNT(*) FROM {self._table} WHERE status = ?', (RUNNING,)).fetchone()[0]
+            return {
+                **self._stats,
+                "depth": depth,
+                "ready": ready,
+                "running": running,
+                "running_here": self._running,
+                "workers": len(self._threads),
+                "persistent": self.persistent,
+            }
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE takes SQLite's write lock up front: other processes wait instead of racing"""
+        with self._cond:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _create_table(self) -> None:
+        # In one transaction, so worker processes starting together do not both add the columns
+        with self._transaction():
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {self._table} (id TEXT PRIMARY KEY, job TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            existing = {row[1] for row in self._db.execute(f'PRAGMA table_info({self._table})')}
+            for column, kind in _COLUMNS:
+                if column not in existing:
+                    self._db.execute(f'ALTER TABLE {self._table} ADD COLUMN {column} {kind}')
+            self._db.execute(
+                f"UPDATE {self._table} SET status = json_extract(job, '$.status'), "
+                f"dedupe_key = json_extract(job, '$.dedupe_key'), run_at = updated_at WHERE status IS NULL"
+            )
+            self._db.execute(
+                f'CREATE INDEX IF NOT EXISTS "jobs_{self.name}_status" ON {self._table} (status, run_at)'
+            )
+            self._db.execute(
+                f'CREATE INDEX IF NOT EXISTS "jobs_{self.name}_dedupe" ON {self._table} (dedupe_key, status)'
+            )
+
+    def _count_active(self) -> int:
+        with self._cond:
+            return self._db.execute(
+                f'SELECT COUNT(*) FROM {self._table} WHERE status IN (?, ?)', ACTIVE_STATUSES
+            ).fetchone()[0]
+
+    def _start_workers(self) -> None:
+        """Workers start with the first job, so importing the app never spawns threads"""
+        with self._cond:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{n}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            threading.Thread(target=self._renew_leases, name=f"{self.name}-lease", daemon=True).start()
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Take the next due job (or one whose owner's lease expired), or None.
+        Every claim counts as an attempt, so a job whose process keeps dying
+        is failed once its lease expires on the last allowed attempt.
+        """
+        while True:
+            now = time.time()
+            with self._transaction() as db:
+                row = db.execute(
+                    f'SELECT job, status FROM {self._table} WHERE (status = ? AND run_at <= ?) OR (status = ? AND COALESCE(lease_until, 0) < ?) '
+                    f'ORDER BY run_at LIMIT 1',
+                    (QUEUED, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job, previous = json.loads(row[0]), row[1]
+                if previous == RUNNING and job["attempts"] >= self.max_attempts:
+                    job.update(status=FAILED, result=None, updated_at=now,
+                               error=f"Worker stopped during attempt {job['attempts']} of {self.max_attempts} (lease expired)")
+                    job.pop("next_attempt_at", None)
+                    abandoned = db.execute(
+                        f'UPDATE {self._table} SET job = ?, status = ?, owner = NULL, lease_until = NULL, run_at = NULL, '
+                        f'updated_at = ? WHERE id = ? AND status = ?',
+                        (json.dumps(job, ensure_ascii=False), FAILED, now, job["id"], RUNNING)
+                    ).rowcount
+                else:
+                    job["status"] = RUNNING
+                    job["attempts"] += 1
+                    job["updated_at"] = now
+                    claimed = db.execute(
+                        f'UPDATE {self._table} SET job = ?, status = ?, owner = ?, lease_until = ?, updated_at = ? '
+                        f'WHERE id = ? AND status = ?',
+                        (json.dumps(job, ensure_ascii=False), RUNNING, self.owner, now + self.lease, now, job["id"], previous)
+                    ).rowcount
+                    if not claimed:
+                        return None
+                    self._running += 1
+                    return job
+            if abandoned:
+                self._abandoned(job)
+
+    def _abandoned(self, job: Dict[str, Any]) -> None:
+        with self._cond:
+            self._stats[FAILED] += 1
+        if job["callback_url"]:
+            self._callback(job["callback_url"], self._public(job))
+
+    def _idle_wait(self) -> float:
+        """Sleep until the next scheduled retry, polling for other processes' jobs when the table is shared"""
+        with self._cond:
+            next_run = self._db.execute(
+                f'SELECT MIN(run_at) FROM {self._table} WHERE status = ?', (QUEUED,)
+            ).fetchone()[0]
+        wait = self.poll_interval if self.persistent else self.result_ttl
+        if next_run is not None:
+            wait = min(wait, max(0.0, next_run - time.time()))
+        return wait
+
+    def _next_job(self) -> Dict[str, Any]:
+        while True:
+            self._prune()
+            job = self._claim()
+            if job is not None:
+                return job
+            wait = self._idle_wait()
+            with self._cond:
+                self._cond.wait(wait)
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            try:
+                result = self.handler(job["payload"])
+            except Exception as e:
+                self._failed(job, e)
+            else:
+                self._finish(job, SUCCEEDED, result=result)
+
+    def _renew_leases(self) -> None:
+        while True:
+            time.sleep(self.lease / 3)
+            with self._cond:
+                self._db.execute(
+                    f'UPDATE {self._table} SET lease_until = ? WHERE owner = ? AND status = ?',
+                    (time.time() + self.lease, self.owner, RUNNING)
+                )
+
+    def _release(self, job: Dict[str, Any], status: str, run_at: Optional[float] = None) -> bool:
+        """Write back a job this process claimed; False when its lease was lost and another process took it"""
+        with self._transaction() as db:
+            self._running -= 1
+            return db.execute(
+                f'UPDATE {self._table} SET job = ?, status = ?, owner = NULL, lease_until = NULL, run_at = ?, '
+                f'updated_at = ? WHERE id = ? AND owner = ? AND status = ?',
+                (json.dumps(job, ensure_ascii=False), status, run_at, job["updated_at"], job["id"], self.owner, RUNNING)
+            ).rowcount == 1
+
+    def _failed(self, job: Dict[str, Any], error: Exception) -> None:
+        if isinstance(error, self.permanent_errors) or job["attempts"] >= self.max_attempts:
+            self._finish(job, FAILED, error=str(error))
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (job["attempts"] - 1)) * random.uniform(0.5, 1.5)
+        job["status"] = QUEUED
+        job["error"] = str(error)
+        job["updated_at"] = time.time()
+        job["next_attempt_at"] = job["updated_at"] + delay
+        if self._release(job, QUEUED, run_at=job["next_attempt_at"]):
+            with self._cond:
+                self._stats["retries"] += 1
+                self._cond.notify()
+
+    def _finish(self, job: Dict[str, Any], status: str, result: Any = None, error: Optional[str] = None) -> None:
+        job.update(status=status, result=result, error=error, updated_at=time.time())
+        job.pop("next_attempt_at", None)
+        if not self._release(job, status):
+            return
+        with self._cond:
+            self._stats[status] += 1
+        if job["callback_url"]:
+            self._callback(job["callback_url"], self._public(job))
+
+    def _callback(self, url: str, job: Dict[str, Any]) -> None:
+        # Checked again at send time: the host's DNS may have changed since the job was submitted
+        error = callback_url_error(url, self.callback_hosts)
+        if error:
+            logger.warning("Job %s callback to %s skipped: %s", job["id"], url, error)
+            return
+        try:
+            request = urllib.request.Request(
+                url, data=json.dumps(job).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            _callback_opener.open(request, timeout=10).close()
+        except Exception as e:
+            logger.warning("Job %s callback to %s failed: %s", job["id"], url, e)
+
+    def _prune(self) -> None:
+        """Delete finished jobs older than result_ttl, at most once a minute"""
+        now = time.time()
+        with self._cond:
+            if now - self._pruned_at < 60:
+                return
+            self._pruned_at = now
+            self._db.execute(
+                f'DELETE FROM {self._table} WHERE status IN (?, ?) AND updated_at < ?',
+                (SUCCEEDED, FAILED, now - self.result_ttl)
+            )
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in job.items() if k not in ("payload", "dedupe_key", "callback_url")}
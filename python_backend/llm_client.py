@@ -0,0 +1,466 @@
+"""
+OpenAI client layer shared by every chat completion the backend makes.
+
+One pooled HTTP client per process, per-call timeouts, a token-bucket
+scheduler holding calls to the requests/minute and tokens/minute budgets,
+jittered exponential backoff on 429s and transient errors, and a concurrency
+limit that shrinks when the provider throttles and grows back while calls
+succeed. Budgets start from LLM_* settings and follow the x-ratelimit-*
+headers the provider returns. Those are account-wide: with LLM_PROCESSES
+server processes (serve.py sets it to its worker count) each process takes
+an equal share of them.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+import openai
+
+from tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in an x-ratelimit-reset-* value such as '1s', '6m0s' or '20ms'"""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested wait from a failed call's retry-after(-ms) header"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get('retry-after'))
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """What a call counts against the tokens/minute budget: its prompt plus max_tokens"""
+    prompt = sum(count_tokens(str(message.get('content') or '')) for message in kwargs.get('messages', []))
+    return prompt + int(kwargs.get('max_tokens') or 0)
+
+
+class RateLimiter:
+    """
+    Two token buckets, requests and tokens, both refilled continuously over a
+    minute. reserve() never blocks: it either takes the budget and returns 0,
+    or returns how long to wait before trying again, so the same limiter
+    serves threads and the event loop. share is the fraction of the account's
+    limits this process may use; it scales the limits the provider reports.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, share: float = 1.0):
+        self._lock = threading.Lock()
+        self.share = share
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._stats = {"granted": 0, "delayed": 0, "throttled": 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens: int) -> float:
+        # A call larger than the whole budget goes through once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                self._stats["granted"] += 1
+                return 0.0
+            self._stats["delayed"] += 1
+            wait_requests = (1 - self._requests) * 60 / self.requests_per_minute if self._requests < 1 else 0.0
+            wait_tokens = (tokens - self._tokens) * 60 / self.tokens_per_minute if self._tokens < tokens else 0.0
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct a reservation with the usage the response reported"""
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + reserved - used)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. for the retry-after of a 429"""
+        with self._lock:
+            self._stats["throttled"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Any) -> None:
+        """Adopt the limits and remaining budget the provider reports"""
+        with self._lock:
+            self._refill(time.monotonic())
+            for kind in ('requests', 'tokens'):
+                limit = _header_float(headers, f'x-ratelimit-limit-{kind}')
+                remaining = _header_float(headers, f'x-ratelimit-remaining-{kind}')
+                if limit:
+                    setattr(self, f'{kind}_per_minute', limit * self.share)
+                if remaining is not None:
+                    current = getattr(self, f'_{kind}')
+                    setattr(self, f'_{kind}', min(current, remaining * self.share, getattr(self, f'{kind}_per_minute')))
+
+    def headroom(self) -> float:
+        """Fraction of the tokens/minute budget currently available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens / self.tokens_per_minute
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                **self._stats,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "available_requests": round(self._requests, 1),
+                "available_tokens": round(self._tokens),
+            }
+
+
+def _header_float(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on calls in flight: each success raises the limit by 1/limit
+    (about one slot per limit successes), each throttled call halves it.
+    Growth stops while the provider reports little budget left.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64):
+        self._cond = threading.Condition()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def succeeded(self, can_grow: bool = True) -> None:
+        with self._cond:
+            if can_grow:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._cond.notify()
+
+    def throttled(self) -> None:
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": int(self.limit), "in_flight": self.in_flight}
+
+
+# Below this fraction of the tokens/minute budget the concurrency limit stops growing
+LOW_HEADROOM = 0.1
+
+
+class _LLMClientBase:
+    def __init__(self, rate_limiter: RateLimiter, concurrency: AdaptiveConcurrency,
+                 timeout: float = 60.0, connect_timeout: float = 10.0, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0, max_connections: int = 32):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_connections = max_connections
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+        # Bumped from request threads, job workers and the event loop alike
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "errors": 0,
+                       "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def _http_options(self) -> Dict[str, Any]:
+        return {
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            "limits": httpx.Limits(max_connections=self.max_connections,
+                                   max_keepalive_connections=self.max_connections),
+        }
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's retry-after"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        suggested = retry_after(error)
+        return max(delay, suggested) if suggested is not None else delay
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if isinstance(error, openai.RateLimitError):
+            self._count(rate_limited=1)
+            self.concurrency.throttled()
+            suggested = retry_after(error)
+            if suggested:
+                self.rate_limiter.pause(suggested)
+        if isinstance(error, RETRYABLE_ERRORS) and attempt < self.max_retries:
+            self._count(retries=1)
+            return True
+        self._count(errors=1)
+        return False
+
+    def _completed(self, headers: Any, reserved: int, usage: Any) -> None:
+        self.rate_limiter.update_from_headers(headers)
+        if usage is not None:
+            self._count(prompt_tokens=usage.prompt_tokens or 0, completion_tokens=usage.completion_tokens or 0)
+            self.rate_limiter.settle(reserved, usage.total_tokens or 0)
+        self.concurrency.succeeded(can_grow=self.rate_limiter.headroom() > LOW_HEADROOM)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counts = dict(self._stats)
+        return {**counts, "concurrency": self.concurrency.stats(), "rate_limit": self.rate_limiter.stats()}
+
+
+class LLMClient(_LLMClientBase):
+    """Blocking client for the Flask app, job workers and batch threads"""
+
+    def client(self) -> openai.OpenAI:
+        """Created on first use so the app can start (and serve /health) without an API key"""
+        with self._client_lock:
+            if self._client is None:
+                options = self._http_options()
+                self._client = openai.OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    max_retries=0,
+                    timeout=options["timeout"],
+                    http_client=httpx.Client(**options)
+                )
+            return self._client
+
+    def _wait_for_budget(self, tokens: int) -> None:
+        while True:
+            delay = self.rate_limiter.reserve(tokens)
+            if delay == 0:
+                return
+            time.sleep(delay)
+
+    def complete(self, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """chat.completions.create(**kwargs) under the rate and concurrency limits, with retries"""
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            self._wait_for_budget(tokens)
+            self.concurrency.acquire()
+            try:
+                self._count(calls=1)
+                raw = self.client().chat.completions.with_raw_response.create(
+                    **kwargs, timeout=timeout or self.timeout
+                )
+                response = raw.parse()
+                self._completed(raw.headers, tokens, getattr(response, 'usage', None))
+                return response
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self.concurrency.release()
+            logger.warning("LLM call failed (attempt %d), retrying in %.1fs", attempt + 1, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def stream(self, timeout: Optional[float] = None, **kwargs: Any) -> Iterator[Any]:
+        """
+        Streamed chat completion chunks. The concurrency slot is held until the
+        stream ends; only failures before the first chunk are retried.
+        """
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            self._wait_for_budget(tokens)
+            self.concurrency.acquire()
+            try:
+                self._count(calls=1)
+                raw = self.client().chat.completions.with_raw_response.create(
+                    **kwargs, stream=True, timeout=timeout or self.timeout
+                )
+            except Exception as e:
+                self.concurrency.release()
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("LLM stream failed (attempt %d), retrying in %.1fs", attempt + 1, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            try:
+                yield from raw.parse()
+                self._completed(raw.headers, tokens, None)
+            finally:
+                self.concurrency.release()
+            return
+
+
+class AsyncLLMClient(_LLMClientBase):
+    """Event-loop client for the ASGI app; shares the rate limiter with LLMClient"""
+
+    def client(self) -> openai.AsyncOpenAI:
+        if self._client is None:
+            options = self._http_options()
+            self._client = openai.AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                max_retries=0,
+                timeout=options["timeout"],
+                http_client=httpx.AsyncClient(**options)
+            )
+        return self._client
+
+    async def _acquire(self, tokens: int) -> None:
+        while True:
+            delay = self.rate_limiter.reserve(tokens)
+            if delay == 0:
+                break
+            await asyncio.sleep(delay)
+        while not self.concurrency.try_acquire():
+            await asyncio.sleep(0.05)
+
+    async def complete(self, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            try:
+                self._count(calls=1)
+                raw = await self.client().chat.completions.with_raw_response.create(
+                    **kwargs, timeout=timeout or self.timeout
+                )
+                response = raw.parse()
+                self._completed(raw.headers, tokens, getattr(response, 'usage', None))
+                return response
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self.concurrency.release()
+            logger.warning("LLM call failed (attempt %d), retrying in %.1fs", attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream(self, timeout: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            try:
+                self._count(calls=1)
+                raw = await self.client().chat.completions.with_raw_response.create(
+                    **kwargs, stream=True, timeout=timeout or self.timeout
+                )
+            except Exception as e:
+                self.concurrency.release()
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("LLM stream failed (attempt %d), retrying in %.1fs", attempt + 1, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            try:
+                async for chunk in raw.parse():
+                    yield chunk
+                self._completed(raw.headers, tokens, None)
+            finally:
+                self.concurrency.release()
+            return
+
+
+def client_settings() -> Dict[str, Any]:
+    """LLMClient/AsyncLLMClient keyword arguments from LLM_* environment settings"""
+    return {
+        "timeout": float(os.environ.get('LLM_TIMEOUT', 60)),
+        "connect_timeout": float(os.environ.get('LLM_CONNECT_TIMEOUT', 10)),
+        "max_retries": int(os.environ.get('LLM_MAX_RETRIES', 4)),
+        "base_delay": float(os.environ.get('LLM_RETRY_BASE_DELAY', 1.0)),
+        "max_delay": float(os.environ.get('LLM_RETRY_MAX_DELAY', 30.0)),
+        "max_connections": int(os.environ.get('LLM_MAX_CONNECTIONS', 32)),
+    }
+
+
+def llm_processes() -> int:
+    """Server processes sharing the account's LLM limits (LLM_PROCESSES, set by serve.py)"""
+    return max(1, int(os.environ.get('LLM_PROCESSES', 1)))
+
+
+def default_rate_limiter() -> RateLimiter:
+    """This process's share of the account-wide LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE"""
+    processes = llm_processes()
+    return RateLimiter(
+        requests_per_minute=float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 500)) / processes,
+        tokens_per_minute=float(os.environ.get('LLM_TOKENS_PER_MINUTE', 300000)) / processes,
+        share=1.0 / processes
+    )
+
+
+def default_concurrency() -> AdaptiveConcurrency:
+    """This process's share of the account-wide LLM_CONCURRENCY / LLM_MAX_CONCURRENCY"""
+    processes = llm_processes()
+    return AdaptiveConcurrency(
+        initial=max(1, int(os.environ.get('LLM_CONCURRENCY', 8)) // processes),
+        minimum=1,
+        maximum=max(1, int(os.environ.get('LLM_MAX_CONCURRENCY', 32)) // processes)
+    )
@@ -0,0 +1,337 @@
+"""
+LLM providers behind the summary and Q&A generation paths.
+
+Every provider takes chat.completions.create keyword arguments and returns
+OpenAI-shaped objects (ChatCompletion, or ChatCompletionChunk when streaming),
+so the prompt building and parsing in app.py do not care which one is in use:
+
+- openai: the real API through llm_client (pooling, rate limits, retries)
+- fake: deterministic local output with configurable latency and token
+  throughput, for load tests and offline development
+- replay: responses recorded earlier, looked up by a hash of the request
+- record: replay, forwarding misses to OpenAI and appending them to the file
+
+LLM_PROVIDER selects one (default openai).
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from llm_client import (
+    AsyncLLMClient, LLMClient, RateLimiter, client_settings, default_concurrency, default_rate_limiter
+)
+from tokens import count_tokens
+
+
+class ReplayMissError(LookupError):
+    """No recorded response matches the request"""
+
+
+def completion(model: str, content: str, prompt_tokens: int = 0) -> ChatCompletion:
+    completion_tokens = count_tokens(content)
+    return ChatCompletion.model_validate({
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    })
+
+
+def completion_chunk(model: str, content: str) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate({
+        "id": "chatcmpl-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    })
+
+
+def prompt_text(kwargs: Dict[str, Any]) -> str:
+    return "\n".join(str(message.get('content') or '') for message in kwargs.get('messages', []))
+
+
+def stream_pieces(content: str) -> List[str]:
+    """Content split the way a streamed reply arrives: a word (with its leading space) at a time"""
+    return re.findall(r'\s*\S+', content) or [content]
+
+
+class LLMProvider(abc.ABC):
+    """
+    complete/stream for the threaded Flask app, acomplete/astream for the ASGI
+    app. Subclasses implement all four and may extend stats().
+    """
+    name = 'base'
+
+    @abc.abstractmethod
+    def complete(self, **kwargs: Any) -> ChatCompletion:
+        ...
+
+    @abc.abstractmethod
+    def stream(self, **kwargs: Any) -> Iterator[ChatCompletionChunk]:
+        ...
+
+    @abc.abstractmethod
+    async def acomplete(self, **kwargs: Any) -> ChatCompletion:
+        ...
+
+    @abc.abstractmethod
+    def astream(self, **kwargs: Any) -> AsyncIterator[ChatCompletionChunk]:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"provider": self.name}
+
+
+class OpenAIProvider(LLMProvider):
+    """The OpenAI API; the sync and async clients share one requests/tokens budget"""
+    name = 'openai'
+
+    def __init__(self, rate_limiter: RateLimiter):
+        self.client = LLMClient(rate_limiter, default_concurrency(), **client_settings())
+        self.async_client = AsyncLLMClient(rate_limiter, default_concurrency(), **client_settings())
+
+    def complete(self, **kwargs: Any) -> ChatCompletion:
+        return self.client.complete(**kwargs)
+
+    def stream(self, **kwargs: Any) -> Iterator[ChatCompletionChunk]:
+        return self.client.stream(**kwargs)
+
+    async def acomplete(self, **kwargs: Any) -> ChatCompletion:
+        return await self.async_client.complete(**kwargs)
+
+    def astream(self, **kwargs: Any) -> AsyncIterator[ChatCompletionChunk]:
+        return self.async_client.stream(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"provider": self.name, "sync": self.client.stats(), "async": self.async_client.stats()}
+
+
+class FakeProvider(LLMProvider):
+    """
+    Plausible, deterministic replies built from the prompt's own words: JSON in
+    whichever of the app's shapes the prompt asks for (summary, questions,
+    section notes), plain prose otherwise. Each call takes latency seconds plus
+    the reply's tokens at tokens_per_second, like a real model would.
+    """
+    name = 'fake'
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 80.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def reply(self, kwargs: Dict[str, Any]) -> str:
+        prompt = prompt_text(kwargs)
+        rng = random.Random(hashlib.sha256(f"{self.seed}:{prompt}".encode('utf-8')).digest())
+        words = re.findall(r'[A-Za-z]{4,}', prompt) or ['lorem', 'ipsum', 'dolor']
+
+        def phrase(count: int) -> str:
+            return ' '.join(rng.choice(words) for _ in range(count))
+
+        def items(count: int, size: int = 4) -> List[str]:
+            return [phrase(size).capitalize() for _ in range(count)]
+
+        if (kwargs.get('response_format') or {}).get('type') != 'json_object':
+            return '. '.join(phrase(12).capitalize() for _ in range(12)) + '.'
+
+        if '"notes"' in prompt:
+            return json.dumps({
+                "main_points": items(4), "key_concepts": items(3, 2), "prerequisites": items(2, 2),
+                "applications": items(2), "notes": phrase(180), "question_ideas": items(2, 8),
+            })
+        result: Dict[str, Any] = {}
+        if '"summary"' in prompt:
+            result["summary"] = {
+                "main_points": items(5), "key_concepts": items(4, 2), "prerequisites": items(2, 2),
+                "applications": items(3), "detailed_explanation": phrase(320), "follow_up_topics": items(3, 3),
+            }
+        if '"questions"' in prompt:
+            match = re.search(r'Write (\d+) multiple-choice', prompt)
+            result["questions"] = [
+                {
+                    "question": phrase(10).capitalize() + "?",
+                    "options": [f"{letter}. {phrase(4)}" for letter in "ABCD"],
+                    "correct_answer": rng.randrange(4),
+                    "explanation": phrase(20),
+                    "difficulty": rng.choice(["Beginner", "Intermediate", "Advanced"]),
+                    "type": ["conceptual", "application", "analysis", "synthesis"][i % 4],
+                }
+                for i in range(int(match.group(1)) if match else 10)
+            ]
+        return json.dumps(result)
+
+    def _generate(self, kwargs: Dict[str, Any]) -> ChatCompletion:
+        prompt_tokens = count_tokens(prompt_text(kwargs))
+        response = completion(kwargs.get('model', self.name), self.reply(kwargs), prompt_tokens)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += response.usage.completion_tokens
+        return response
+
+    def _generation_time(self, response: ChatCompletion) -> float:
+        return self.latency + response.usage.completion_tokens / self.tokens_per_second
+
+    def complete(self, **kwargs: Any) -> ChatCompletion:
+        response = self._generate(kwargs)
+        time.sleep(self._generation_time(response))
+        return response
+
+    def stream(self, **kwargs: Any) -> Iterator[ChatCompletionChunk]:
+        response = self._generate(kwargs)
+        time.sleep(self.latency)
+        for piece in stream_pieces(response.choices[0].message.content):
+            time.sleep(count_tokens(piece) / self.tokens_per_second)
+            yield completion_chunk(response.model, piece)
+
+    async def acomplete(self, **kwargs: Any) -> ChatCompletion:
+        response = self._generate(kwargs)
+        await asyncio.sleep(self._generation_time(response))
+        return response
+
+    async def astream(self, **kwargs: Any) -> AsyncIterator[ChatCompletionChunk]:
+        response = self._generate(kwargs)
+        await asyncio.sleep(self.latency)
+        for piece in stream_pieces(response.choices[0].message.content):
+            await asyncio.sleep(count_tokens(piece) / self.tokens_per_second)
+            yield completion_chunk(response.model, piece)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"provider": self.name, "latency": self.latency,
+                    "tokens_per_second": self.tokens_per_second, **self._stats}
+
+
+# Everything in the request that shapes the reply
+REPLAY_KEY_FIELDS = ('model', 'messages', 'response_format', 'max_tokens', 'temperature')
+
+
+def replay_key(kwargs: Dict[str, Any]) -> str:
+    material = json.dumps({field: kwargs.get(field) for field in REPLAY_KEY_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serves responses from a JSON-lines recording ({"key", "model", "content",
+    "prompt_tokens"} per line). With record_from set, a miss is forwarded to
+    that provider and its reply appended to the file; without it, a miss
+    raises ReplayMissError. Streams replay the recorded content word by word.
+    """
+    name = 'replay'
+
+    def __init__(self, path: str, record_from: Optional[LLMProvider] = None, latency: float = 0.0):
+        self.path = path
+        self.record_from = record_from
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"hits": 0, "misses": 0, "recorded": 0}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record["key"]] = record
+
+    def _lookup(self, kwargs: Dict[str, Any]) -> Optional[ChatCompletion]:
+        with self._lock:
+            record = self._records.get(replay_key(kwargs))
+            self._stats["hits" if record else "misses"] += 1
+        if record is None:
+            return None
+        return completion(record["model"], record["content"], record.get("prompt_tokens", 0))
+
+    def _record(self, kwargs: Dict[str, Any], response: ChatCompletion) -> None:
+        record = {
+            "key": replay_key(kwargs),
+            "model": response.model,
+            "content": response.choices[0].message.content,
+            "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+        }
+        with self._lock:
+            self._records[record["key"]] = record
+            self._stats["recorded"] += 1
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _miss(self, kwargs: Dict[str, Any]) -> ReplayMissError:
+        return ReplayMissError(f"No recorded response for request {replay_key(kwargs)[:12]} in {self.path}")
+
+    def complete(self, **kwargs: Any) -> ChatCompletion:
+        response = self._lookup(kwargs)
+        if response is None:
+            if self.record_from is None:
+                raise self._miss(kwargs)
+            response = self.record_from.complete(**kwargs)
+            self._record(kwargs, response)
+        elif self.latency:
+            time.sleep(self.latency)
+        return response
+
+    def stream(self, **kwargs: Any) -> Iterator[ChatCompletionChunk]:
+        response = self.complete(**kwargs)
+        for piece in stream_pieces(response.choices[0].message.content):
+            yield completion_chunk(response.model, piece)
+
+    async def acomplete(self, **kwargs: Any) -> ChatCompletion:
+        response = self._lookup(kwargs)
+        if response is None:
+            if self.record_from is None:
+                raise self._miss(kwargs)
+            response = await self.record_from.acomplete(**kwargs)
+            self._record(kwargs, response)
+        elif self.latency:
+            await asyncio.sleep(self.latency)
+        return response
+
+    async def astream(self, **kwargs: Any) -> AsyncIterator[ChatCompletionChunk]:
+        response = await self.acomplete(**kwargs)
+        for piece in stream_pieces(response.choices[0].message.content):
+            yield completion_chunk(response.model, piece)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"provider": self.name, "path": self.path, "records": len(self._records),
+                    "recording": self.record_from is not None, **self._stats}
+
+
+def default_replay_path() -> str:
+    return os.environ.get('LLM_REPLAY_FILE') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '.cache', 'llm_replay.jsonl'
+    )
+
+
+def provider_from_env(rate_limiter: Optional[RateLimiter] = None) -> LLMProvider:
+    """The provider named by LLM_PROVIDER (openai, fake, replay or record)"""
+    name = os.environ.get('LLM_PROVIDER', 'openai').strip().lower()
+    if name == 'openai':
+        return OpenAIProvider(rate_limiter or default_rate_limiter())
+    if name == 'fake':
+        return FakeProvider(
+            latency=float(os.environ.get('LLM_FAKE_LATENCY', 0.2)),
+            tokens_per_second=float(os.environ.get('LLM_FAKE_TOKENS_PER_SECOND', 80)),
+            seed=int(os.environ.get('LLM_FAKE_SEED', 0))
+        )
+    if name == 'replay':
+        return ReplayProvider(default_replay_path(), latency=float(os.environ.get('LLM_REPLAY_LATENCY', 0)))
+    if name == 'record':
+        return ReplayProvider(default_replay_path(), record_from=OpenAIProvider(rate_limiter or default_rate_limiter()))
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
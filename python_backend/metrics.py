@@ -0,0 +1,266 @@
+"""
+Prometheus-style metrics, per-stage timing and an on-demand sampling profiler.
+
+Counters and histograms are kept in-process and rendered in the Prometheus
+text exposition format by Registry.render(). Stats that components already
+keep (cache hits, single-flight waits, job counts) are read at scrape time by
+collectors instead of being counted twice.
+
+stage(name) times a block into the stage histogram and, when the current
+request asked for it, into that request's Server-Timing breakdown.
+"""
+import collections
+import contextvars
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = 'le="%s"' % _number(bound)
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(cumulative)}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-2])}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {_number(series[-1])}')
+        return lines
+
+
+class StatsCollector:
+    """
+    Exports stats() dicts read at scrape time: one metric per numeric key,
+    labelled by source name. Keys listed in counters are monotonic (exported
+    as <prefix>_<key>_total), the rest are gauges.
+    """
+
+    def __init__(self, prefix: str, label: str, documentation: str,
+                 sources: Callable[[], Dict[str, Dict[str, Any]]], counters: Sequence[str] = ()):
+        self.prefix = prefix
+        self.label = label
+        self.documentation = documentation
+        self.sources = sources
+        self.counters = set(counters)
+
+    def render(self) -> List[str]:
+        series: Dict[str, List[str]] = collections.OrderedDict()
+        for source, stats in self.sources().items():
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f'{self.prefix}_{key}_total' if key in self.counters else f'{self.prefix}_{key}'
+                series.setdefault(name, []).append(f'{name}{{{self.label}="{_escape(source)}"}} {_number(value)}')
+        lines = []
+        for name, samples in series.items():
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines += [f'# HELP {name} {self.documentation}', f'# TYPE {name} {kind}'] + samples
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'focustube_stage_seconds', 'Time spent in each pipeline stage', ('stage',)
+)
+
+# Stage timings of the current request, when it asked for a Server-Timing breakdown
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    'request_timings', default=None
+)
+
+
+def start_request_timing() -> contextvars.Token:
+    return _request_timings.set([])
+
+
+def finish_request_timing(token: contextvars.Token) -> List[Tuple[str, float]]:
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Server-Timing value (durations in ms); repeated stages are summed, in first-seen order"""
+    totals: Dict[str, float] = collections.OrderedDict()
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in totals.items())
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack at a fixed interval from a background thread
+    and counts collapsed stacks (root;...;leaf), the input format of
+    flamegraph.pl and speedscope. Cheap enough to switch on in production for
+    a while; off, it costs nothing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.samples: Dict[str, int] = {}
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.interval = max(0.001, interval)
+            self.samples = {}
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                with self._lock:
+                    self.samples[key] = self.samples.get(key, 0) + 1
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return '\n'.join(f'{stack} {count}' for stack, count in
+                             sorted(self.samples.items(), key=lambda item: -item[1])) + '\n'
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"running": self.running, "interval": self.interval, "started_at": self.started_at,
+                    "samples": sum(self.samples.values()), "stacks": len(self.samples)}
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Cache priming: precompute what a video's first visitor would otherwise wait for.
+
+    python prime_cache.py dQw4w9WgXcQ https://youtu.be/...    # video IDs or URLs
+    python prime_cache.py --file course.txt                   # one per line, optionally "<url><TAB><title>"
+    python prime_cache.py --playlist PL...                    # needs YOUTUBE_API_KEY
+    python prime_cache.py --resume <run id>                   # continue an interrupted run
+
+For each video the transcript is fetched and cleaned, its search index (and,
+for long transcripts, its Q&A retrieval index) is built and written to the
+artifact store, and the summary and questions are generated. Transcripts and
+summaries land in the shared SQLite cache, so every server process sees them.
+Videos go through the ingestion pipeline (ingest.py): transcripts are fetched
+in parallel ahead of generation, and a run that was interrupted can be resumed.
+
+The server loads primed artifacts from disk on first use; with
+ARTIFACT_WARMUP=1 it also pulls the most recently primed videos into memory
+at startup.
+
+Summaries are cached per transcript and title, so videos are primed with the
+title the web client sends ("Video <id>"); --title-format '{title}' uses the
+titles from the file or playlist instead.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+# Add the current directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+# This process primes; resuming the server's ingest runs or warming its memory here would be wasted work
+os.environ.pop('INGEST_RESUME_ON_START', None)
+os.environ.pop('ARTIFACT_WARMUP', None)
+
+from cache import cache_db_path
+from ingest import IngestManager
+from retrieval import needs_index, save_transcript_index
+from search import save_search_index
+from youtube_urls import extract_playlist_id, normalize_video_urls
+
+import app as core
+
+DEFAULT_TITLE_FORMAT = 'Video {video_id}'
+
+
+def read_videos(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    """(video_id, title) pairs from the command line, --file and --playlist, de-duplicated in order"""
+    urls: List[str] = list(args.videos)
+    titles: List[str] = [''] * len(urls)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                url, _, title = line.rstrip('\n').partition('\t')
+                urls.append(url.strip())
+                titles.append(title.strip())
+    if args.playlist:
+        for video_id, title in core.playlist_api.playlist_videos(extract_playlist_id(args.playlist), args.max_videos):
+            urls.append(video_id)
+            titles.append(title)
+
+    parsed = normalize_video_urls(urls)
+    for entry in parsed["invalid"]:
+        print(f"  skipping {entry['input']!r}: {entry['error']}", file=sys.stderr)
+    return [
+        (video_id, args.title_format.format(video_id=video_id, title=titles[position]))
+        for position, video_id in zip(parsed["positions"], parsed["video_ids"])
+    ]
+
+
+def prime_generate(with_summary: bool):
+    def generate(video_id: str, transcript: str, video_title: str) -> Dict[str, Any]:
+        artifacts = ["transcript"]
+        if save_search_index(transcript):
+            artifacts.append("search_index")
+        if needs_index(transcript) and save_transcript_index(transcript):
+            artifacts.append("qa_index")
+        if with_summary:
+            core.generate_summary_and_questions(transcript, video_title, max_wait=None)
+            artifacts.append("summary")
+        core.record_primed(video_id, video_title)
+        return {"success": True, "video_id": video_id, "artifacts": artifacts, "transcript_length": len(transcript)}
+    return generate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*', help='video IDs or URLs')
+    parser.add_argument('--file', help='file with one video ID/URL per line, optionally followed by a tab and a title')
+    parser.add_argument('--playlist', help='playlist URL or ID (YouTube Data API, needs YOUTUBE_API_KEY)')
+    parser.add_argument('--max-videos', type=int, default=core.INGEST_MAX_VIDEOS, help='playlist limit')
+    parser.add_argument('--title-format', default=DEFAULT_TITLE_FORMAT,
+                        help="title the summary is generated for; {video_id} and {title} are filled in")
+    parser.add_argument('--fetch-workers', type=int, default=8, help='parallel transcript fetches')
+    parser.add_argument('--workers', type=int, default=4, help='parallel index builds and summary generations')
+    parser.add_argument('--prefetch', type=int, default=8, help='fetched transcripts to keep ready per stage')
+    parser.add_argument('--no-summary', action='store_true', help='transcripts and indexes only')
+    parser.add_argument('--resume', metavar='RUN_ID', help='continue an interrupted priming run')
+    args = parser.parse_args()
+
+    if not cache_db_path():
+        parser.error("FOCUSTUBE_CACHE_DIR is empty: disk caching is disabled, so primed artifacts would not persist")
+
+    manager = IngestManager(
+        core.ingest_fetch,
+        core.ingest_cleanup,
+        prime_generate(not args.no_summary),
+        db_path=cache_db_path(),
+        prefetch=args.prefetch,
+        fetch_workers=args.fetch_workers,
+        generate_workers=args.workers,
+        table='prime_runs'
+    )
+    if args.resume:
+        state = manager.resume(args.resume, retry_failed=True)
+        if state is None:
+            parser.error(f"Unknown priming run: {args.resume}")
+    else:
+        videos = read_videos(args)
+        if not videos:
+            parser.error("no videos to prime")
+        state = manager.start(videos, {"command": "prime_cache"})
+
+    run_id = state["ingest_id"]
+    print(f"Priming {state['progress']['total']} video(s), run {run_id} (resume with --resume {run_id})")
+    started = time.perf_counter()
+    last: Dict[str, Any] = state
+    try:
+        for event in manager.events(run_id):
+            last = event
+            if event["event"] != "video":
+                continue
+            result, progress = event["result"], event["progress"]
+            count = f"[{progress['done'] + progress['failed']}/{progress['total']}]"
+            if result.get("success"):
+                print(f"  {count} {result['video_id']}: {', '.join(result['artifacts'])}")
+            else:
+                print(f"  {count} {result['video_id']}: failed at {result['stage']}: {' '.join(result['error'].split())[:200]}")
+    except KeyboardInterrupt:
+        manager.cancel(run_id)
+        print(f"\nInterrupted; resume with --resume {run_id}")
+        sys.exit(130)
+
+    progress = last.get("progress", {})
+    print(f"Done in {time.perf_counter() - started:.1f}s: {progress.get('done', 0)} primed, "
+          f"{progress.get('failed', 0)} failed")
+    sys.exit(1 if progress.get('failed') else 0)
+
+
+if __name__ == '__main__':
+    main()
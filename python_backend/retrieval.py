@@ -0,0 +1,185 @@
+"""
+Transcript chunking and local BM25 retrieval, used to send only the relevant
+parts of a long transcript to the model when answering a question. Chunk
+indexes can be precomputed and loaded from disk.
+"""
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from cache import ArtifactStore, MemoLRU, artifact_dir
+
+CHUNK_WORDS = int(os.environ.get('QA_CHUNK_WORDS', 180))
+CHUNK_OVERLAP = int(os.environ.get('QA_CHUNK_OVERLAP', 40))
+TOP_K = int(os.environ.get('QA_CONTEXT_CHUNKS', 6))
+# Transcripts up to this many words are sent whole; retrieval only pays off beyond it
+FULL_TRANSCRIPT_WORDS = int(os.environ.get('QA_FULL_TRANSCRIPT_WORDS', 1500))
+INDEX_CACHE_SIZE = int(os.environ.get('QA_INDEX_CACHE_SIZE', 128))
+INDEX_CACHE_BYTES = int(os.environ.get('QA_INDEX_CACHE_MB', 32)) * 1024 * 1024
+# Approximate chunk index footprint per transcript character (chunks overlap), for the LRU bound
+INDEX_BYTES_PER_CHAR = 8
+# Version of the persisted index state (BM25Index.state()); bump when it, the chunking or the tokenizer changes
+INDEX_FORMAT = 1
+
+CHUNK_SEPARATOR = '\n[...]\n'
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from had has have how i if in is it its
+me my of on or so than that the their them then there these they this to was we were
+what when where which who why will with you your
+""".split())
+
+
+# Longest first; the replacement keeps common inflections of a word on the same stem
+_SUFFIXES = (
+    ('sses', 'ss'), ('ies', 'y'), ('ness', ''), ('ment', ''), ('ings', ''), ('ing', ''),
+    ('edly', ''), ('ed', ''), ('ly', ''), ('es', ''), ("'s", ''), ('s', ''),
+)
+
+
+def stem(token: str) -> str:
+    """Light suffix-stripping stemmer (a much reduced Porter) for English lecture text"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and not (suffix == 's' and token.endswith(('ss', 'us', 'is'))):
+            base = token[:-len(suffix)] + replacement
+            if len(base) >= 3:
+                token = base
+                if suffix in ('ing', 'ings', 'ed', 'edly') and len(token) > 3 \
+                        and token[-1] == token[-2] and token[-1] not in 'lsz':
+                    token = token[:-1]
+                break
+    if len(token) >= 4 and token.endswith('e'):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_words(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into windows of `size` words, each sharing `overlap` words with the previous one"""
+    words = text.split()
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    step = max(1, size - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks, stored as term -> [(chunk, tf)] postings"""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((i, tf))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def state(self) -> Tuple[Any, ...]:
+        return self.k1, self.b, self.chunks, self.lengths, self.postings
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...]) -> 'BM25Index':
+        index = cls.__new__(cls)
+        index.k1, index.b, index.chunks, index.lengths, index.postings = state
+        index.avg_length = (sum(index.lengths) / len(index.lengths)) if index.lengths else 0.0
+        return index
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.chunks)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = TOP_K) -> List[Tuple[int, float]]:
+        """Return (chunk index, score) pairs, best first"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+_index_cache = MemoLRU(INDEX_CACHE_SIZE, INDEX_CACHE_BYTES)
+# Indexes precomputed by prime_cache.py; chunking settings are part of the key
+_index_store = ArtifactStore('qa_indexes', INDEX_FORMAT, artifact_dir())
+
+
+def transcript_index(transcript: str) -> BM25Index:
+    """Chunk index for transcript, built (or loaded when precomputed) once per distinct transcript and kept in an LRU"""
+    key = _index_key(transcript)
+    return _index_cache.get_or_build(key, lambda: _load_or_build(key, transcript), len(transcript) * INDEX_BYTES_PER_CHAR)
+
+
+def _index_key(transcript: str) -> str:
+    digest = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    return f"{digest}-{CHUNK_WORDS}-{CHUNK_OVERLAP}"
+
+
+def _load_or_build(key: str, transcript: str) -> BM25Index:
+    state = _index_store.load(key)
+    if state is not None:
+        return BM25Index.from_state(state)
+    return BM25Index(chunk_words(transcript))
+
+
+def needs_index(transcript: str) -> bool:
+    """Whether questions about transcript go through retrieval (see select_context)"""
+    return len(transcript.split()) > FULL_TRANSCRIPT_WORDS
+
+
+def save_transcript_index(transcript: str) -> bool:
+    """Persist transcript's chunk index for later processes; False when disk caching is disabled"""
+    key = _index_key(transcript)
+    if _index_store.has(key):
+        return True
+    return _index_store.save(key, transcript_index(transcript).state())
+
+
+def index_store_stats() -> Dict[str, Any]:
+    return _index_store.stats()
+
+
+def select_context(question: str, transcript: str, top_k: int = TOP_K) -> str:
+    """
+    The transcript itself if it is short, otherwise the top_k chunks most
+    relevant to question, in transcript order. Falls back to the opening chunks
+    when nothing in the question matches.
+    """
+    if not needs_index(transcript):
+        return transcript
+
+    index = transcript_index(transcript)
+    hits = [i for i, _ in index.search(question, top_k)]
+    if not hits:
+        hits = list(range(min(top_k, len(index.chunks))))
+    return CHUNK_SEPARATOR.join(index.chunks[i] for i in sorted(hits))
+
+
+def index_cache_stats() -> Dict[str, Any]:
+    return _index_cache.stats()
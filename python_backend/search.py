@@ -0,0 +1,216 @@
+"""
+Full-text search over a single transcript: a positional inverted index per
+transcript (cached by content hash, and loaded from disk when precomputed),
+stemmed tokens, BM25 ranking, quoted phrase queries and character offsets for
+highlighting
+"""
+import hashlib
+import math
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from cache import ArtifactStore, MemoLRU, artifact_dir
+from retrieval import TOKEN_RE, stem
+
+SENTENCE_RE = re.compile(r'[^.!?]+[.!?]*')
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# Extra score per occurrence of a phrase (quoted, or the whole multi-word query)
+PHRASE_BOOST = 2.0
+SEARCH_INDEX_CACHE_SIZE = int(os.environ.get('SEARCH_INDEX_CACHE_SIZE', 128))
+SEARCH_INDEX_CACHE_BYTES = int(os.environ.get('SEARCH_INDEX_CACHE_MB', 64)) * 1024 * 1024
+# Approximate index footprint per transcript character (measured on synthetic lectures), for the LRU bound
+SEARCH_INDEX_BYTES_PER_CHAR = 40
+# Version of the persisted index state (state()); bump when it or the tokenizer changes
+SEARCH_INDEX_FORMAT = 1
+
+# term -> sentence index -> [(token position, char start, char end)]
+Postings = Dict[str, Dict[int, List[Tuple[int, int, int]]]]
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a query into loose terms and quoted phrases, both as stems"""
+    terms: List[str] = []
+    phrases: List[List[str]] = []
+    for match in QUERY_RE.finditer(query.lower()):
+        if match.group(1) is not None:
+            phrase = [stem(t) for t in TOKEN_RE.findall(match.group(1))]
+            if len(phrase) == 1:
+                terms.extend(phrase)
+            elif phrase:
+                phrases.append(phrase)
+        else:
+            terms.extend(stem(t) for t in TOKEN_RE.findall(match.group(2)))
+    return terms, phrases
+
+
+class TranscriptSearchIndex:
+    """Sentence-level BM25 index over one transcript"""
+
+    def __init__(self, text: str, k1: float = 1.2, b: float = 0.75):
+        self.text = text
+        self.k1 = k1
+        self.b = b
+        self.sentences: List[Tuple[int, int]] = []
+        self.lengths: List[int] = []
+        self.postings: Postings = {}
+
+        lowered = text.lower()
+        for sentence in SENTENCE_RE.finditer(text):
+            if not sentence.group().strip():
+                continue
+            index = len(self.sentences)
+            self.sentences.append(sentence.span())
+            position = 0
+            for token in TOKEN_RE.finditer(lowered, sentence.start(), sentence.end()):
+                hits = self.postings.setdefault(stem(token.group()), {}).setdefault(index, [])
+                hits.append((position, token.start(), token.end()))
+                position += 1
+            self.lengths.append(position)
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def state(self) -> Tuple[Any, ...]:
+        """Everything but the text, as plain data for ArtifactStore"""
+        return self.k1, self.b, self.sentences, self.lengths, self.postings
+
+    @classmethod
+    def from_state(cls, text: str, state: Tuple[Any, ...]) -> 'TranscriptSearchIndex':
+        index = cls.__new__(cls)
+        index.text = text
+        index.k1, index.b, index.sentences, index.lengths, index.postings = state
+        index.avg_length = (sum(index.lengths) / len(index.lengths)) if index.lengths else 0.0
+        return index
+
+    def _bm25(self, term: str) -> Dict[int, float]:
+        by_sentence = self.postings.get(term)
+        if not by_sentence:
+            return {}
+        n = len(self.sentences)
+        idf = math.log(1 + (n - len(by_sentence) + 0.5) / (len(by_sentence) + 0.5))
+        scores = {}
+        for i, hits in by_sentence.items():
+            tf = len(hits)
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+            scores[i] = idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _phrase_spans(self, phrase: List[str], sentence: int) -> List[Tuple[int, int]]:
+        """Character spans of each occurrence of phrase within sentence"""
+        per_term = []
+        for term in phrase:
+            hits = self.postings.get(term, {}).get(sentence)
+            if not hits:
+                return []
+            per_term.append({pos: (start, end) for pos, start, end in hits})
+        spans = []
+        for pos, (start, _) in per_term[0].items():
+            if all(pos + offset in positions for offset, positions in enumerate(per_term)):
+                spans.append((start, per_term[-1][pos + len(phrase) - 1][1]))
+        return spans
+
+    def search(self, query: str, limit: int = 5, context: int = 1) -> Dict[str, Any]:
+        """
+        Rank sentences for query. Loose terms are OR-ed; every quoted phrase must
+        appear in a matching sentence. Each result carries `context` sentences
+        either side and highlight offsets relative to its text.
+        """
+        terms, phrases = parse_query(query)
+
+        scores: Dict[int, float] = {}
+        for term in set(terms) | {t for phrase in phrases for t in phrase}:
+            for i, score in self._bm25(term).items():
+                scores[i] = scores.get(i, 0.0) + score
+
+        # The whole unquoted query as a phrase is a bonus, not a requirement
+        implicit = [terms] if len(terms) > 1 and not phrases else []
+        phrase_hits: Dict[int, List[Tuple[int, int]]] = {}
+        for i in list(scores):
+            spans = []
+            for phrase in phrases:
+                found = self._phrase_spans(phrase, i)
+                if not found:
+                    del scores[i]
+                    break
+                spans.extend(found)
+            else:
+                for phrase in implicit:
+                    spans.extend(self._phrase_spans(phrase, i))
+                if spans:
+                    scores[i] += PHRASE_BOOST * len(spans)
+                    phrase_hits[i] = spans
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return {
+            "results": [self._result(i, score, phrase_hits.get(i, []), set(terms), context) for i, score in ranked],
+            "total_matches": len(scores),
+        }
+
+    def _result(self, i: int, score: float, phrase_spans: List[Tuple[int, int]],
+                terms: set, context: int) -> Dict[str, Any]:
+        start = self.sentences[max(0, i - context)][0]
+        end = self.sentences[min(len(self.sentences) - 1, i + context)][1]
+        raw = self.text[start:end]
+        start += len(raw) - len(raw.lstrip())
+        end -= len(raw) - len(raw.rstrip())
+
+        spans = list(phrase_spans)
+        for term in terms:
+            spans.extend((s, e) for _, s, e in self.postings.get(term, {}).get(i, ()))
+        highlights = [[s - start, e - start] for s, e in _merge_spans(spans)]
+
+        return {
+            "text": self.text[start:end],
+            "relevance_score": round(score, 4),
+            "start": start,
+            "end": end,
+            "sentence_index": i,
+            "highlights": highlights,
+        }
+
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for s, e in sorted(spans):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+_index_cache = MemoLRU(SEARCH_INDEX_CACHE_SIZE, SEARCH_INDEX_CACHE_BYTES)
+# Indexes precomputed by prime_cache.py
+_index_store = ArtifactStore('search_indexes', SEARCH_INDEX_FORMAT, artifact_dir())
+
+
+def search_index(transcript: str) -> TranscriptSearchIndex:
+    """Index for transcript, built (or loaded when precomputed) once per distinct transcript"""
+    key = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    return _index_cache.get_or_build(
+        key, lambda: _load_or_build(key, transcript), len(transcript) * SEARCH_INDEX_BYTES_PER_CHAR
+    )
+
+
+def _load_or_build(key: str, transcript: str) -> TranscriptSearchIndex:
+    state = _index_store.load(key)
+    if state is not None:
+        return TranscriptSearchIndex.from_state(transcript, state)
+    return TranscriptSearchIndex(transcript)
+
+
+def save_search_index(transcript: str) -> bool:
+    """Persist transcript's index for later processes; False when disk caching is disabled"""
+    key = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    if _index_store.has(key):
+        return True
+    return _index_store.save(key, search_index(transcript).state())
+
+
+def index_store_stats() -> Dict[str, Any]:
+    return _index_store.stats()
+
+
+def index_cache_stats() -> Dict[str, Any]:
+    return _index_cache.stats()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the YouTube Transcript AI backend (async ASGI mode)
+
+Environment:
+    PORT                      listen port (default 5001)
+    WEB_WORKERS               uvicorn worker processes (default 2)
+    WEB_CONCURRENCY_LIMIT     max concurrent connections per worker before 503s (default 1000)
+    TRANSCRIPT_FETCH_THREADS  per-worker threads for blocking YouTube fetches (default 16)
+
+With more than one worker, background jobs are kept in the SQLite cache
+(JOB_QUEUE_PERSIST=1) so every worker sees them; without a cache directory
+the server falls back to a single worker.
+
+LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_CONCURRENCY and
+LLM_MAX_CONCURRENCY are the account's totals: each worker gets an equal share
+(LLM_PROCESSES is set to the worker count), so together they stay within them.
+ADMISSION_* settings apply per worker.
+"""
+import os
+import sys
+
+import uvicorn
+
+# Add the current directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from cache import cache_db_path
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5001))
+    workers = int(os.environ.get('WEB_WORKERS', 2))
+    concurrency = int(os.environ.get('WEB_CONCURRENCY_LIMIT', 1000))
+    if workers > 1:
+        if cache_db_path():
+            # Worker processes only share job state through SQLite
+            os.environ['JOB_QUEUE_PERSIST'] = '1'
+        else:
+            print("⚠️  FOCUSTUBE_CACHE_DIR is empty: jobs cannot be shared between workers, running 1 worker")
+            workers = 1
+    # Every worker holds its own rate limiter; each takes 1/workers of the LLM budgets
+    os.environ['LLM_PROCESSES'] = str(workers)
+    print(f"🚀 Starting YouTube Transcript AI Backend (ASGI) on port {port} with {workers} worker(s)")
+    print(f"📝 OpenAI API Key: {'✓ Configured' if os.getenv('OPENAI_API_KEY') else '✗ Missing'}")
+
+    uvicorn.run(
+        'asgi_app:app',
+        host='0.0.0.0',
+        port=port,
+        workers=workers,
+        limit_concurrency=concurrency,
+        app_dir=current_dir,
+        log_level=os.environ.get('LOG_LEVEL', 'info')
+    )
@@ -0,0 +1,156 @@
+"""
+Request coalescing: concurrent calls for the same key share one computation
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class FollowerError(Exception):
+    """Raised to a follower when the leader's exception cannot be copied"""
+
+
+def follower_error(error: BaseException) -> BaseException:
+    """
+    A copy of the leader's exception for one follower to raise (chained to
+    the original), so followers never share, and concurrently extend, one
+    exception's traceback. The copy keeps the type and attributes, so callers
+    handle it as they would the original.
+    """
+    try:
+        copy = type(error).__new__(type(error), *error.args)
+        copy.__dict__.update(error.__dict__)
+    except Exception:
+        return FollowerError(f"In-flight request failed: {error!r}")
+    return copy
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters', 'started')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.started = time.monotonic()
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for and share its result or exception.
+    The key is released as soon as the leader finishes, so a failed call is
+    never cached here and the next request starts a fresh attempt. A leader
+    still running after `timeout` no longer takes followers: the next caller
+    becomes the leader of a fresh attempt.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "failures": 0, "timeouts": 0, "stale": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and self._stale(call.started):
+                self._stats["stale"] += 1
+                call = None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                with self._lock:
+                    self._stats["failures"] += 1
+                raise
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self._remaining(call.started)):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"Timed out waiting for in-flight {self.name} request")
+        if call.error is not None:
+            raise follower_error(call.error) from call.error
+        return call.result
+
+    def _stale(self, started: float) -> bool:
+        return self.timeout is not None and time.monotonic() - started >= self.timeout
+
+    def _remaining(self, started: float) -> Optional[float]:
+        """Followers wait no longer than the leader's deadline"""
+        if self.timeout is None:
+            return None
+        return max(0.0, started + self.timeout - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The computation runs as its own task,
+    so it keeps going for the followers even if the leader's request is
+    cancelled or times out; as there, a task older than `timeout` takes no
+    new followers.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._tasks: Dict[str, Tuple[asyncio.Task, float]] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "failures": 0, "timeouts": 0, "stale": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task, started = self._tasks.get(key, (None, 0.0))
+        if task is not None and self.timeout is not None and time.monotonic() - started >= self.timeout:
+            self._stats["stale"] += 1
+            task = None
+        leader = task is None
+        if leader:
+            started = time.monotonic()
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = (task, started)
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        # asyncio.wait neither cancels the task on timeout nor when this caller is cancelled
+        remaining = None if self.timeout is None else max(0.0, started + self.timeout - time.monotonic())
+        done, _ = await asyncio.wait({task}, timeout=remaining)
+        if not done:
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"Timed out waiting for in-flight {self.name} request")
+        error = None if task.cancelled() else task.exception()
+        if error is not None and not leader:
+            raise follower_error(error) from error
+        return task.result()
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key, (None,))[0] is task:
+            del self._tasks[key]
+        if task.cancelled() or task.exception() is not None:
+            self._stats["failures"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._tasks)}
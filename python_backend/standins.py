@@ -0,0 +1,147 @@
+"""
+Local stand-ins for YouTube transcripts, for benchmarks and offline runs.
+
+Synthetic video IDs encode the video's length: syn<minutes:4><n:4> (e.g.
+syn00600003 is the fourth 60-minute video). FakeTranscriptApi serves a
+deterministic transcript of that length for any such ID, spoken at about 150
+words a minute in caption-sized segments, with the occasional [Music]
+annotation the cleanup has to strip. The OpenAI stand-in is the fake provider
+in llm_providers.py; FakePlaylistApi lists synthetic playlists for ingestion.
+"""
+import random
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+WORDS_PER_MINUTE = 150
+SEGMENT_WORDS = (6, 12)
+ANNOTATIONS = ('[Music]', '[Applause]', '[Laughter]')
+
+VOCABULARY = (
+    "energy cell membrane protein enzyme reaction molecule atom electron photon light wave frequency "
+    "force mass acceleration velocity momentum gravity orbit planet star galaxy universe theory model "
+    "experiment hypothesis data evidence variable function equation derivative integral limit vector "
+    "matrix algorithm program memory network signal system process structure pattern example problem "
+    "solution method analysis result conclusion history culture economy market price demand supply "
+    "policy government society language grammar sentence meaning context argument essay research "
+    "photosynthesis respiration mitochondria chloroplast nucleus evolution selection species ecosystem "
+    "climate temperature pressure volume density chemical bond solution acid base reaction rate"
+).split()
+CONNECTIVES = "the a of and to in is that this we so because which when then also how why".split()
+
+
+def synthetic_video_id(minutes: int, n: int = 0) -> str:
+    return f"syn{minutes:04d}{n:04d}"
+
+
+def synthetic_minutes(video_id: str) -> int:
+    """Length in minutes encoded in a synthetic video ID; raises ValueError for other IDs"""
+    if len(video_id) != 11 or not video_id.startswith('syn'):
+        raise ValueError(video_id)
+    return int(video_id[3:7])
+
+
+def synthetic_entries(minutes: float, seed: Any = 0) -> List[Dict[str, Any]]:
+    """Caption entries ({'text', 'start', 'duration'}) for a video of the given length"""
+    rng = random.Random(f"{seed}:{minutes}")
+    total_words = max(1, int(minutes * WORDS_PER_MINUTE))
+    seconds_per_word = 60.0 / WORDS_PER_MINUTE
+    entries = []
+    spoken = 0
+    sentence_left = rng.randint(8, 20)
+    while spoken < total_words:
+        count = min(rng.randint(*SEGMENT_WORDS), total_words - spoken)
+        words = []
+        for _ in range(count):
+            words.append(rng.choice(VOCABULARY) if rng.random() < 0.6 else rng.choice(CONNECTIVES))
+            sentence_left -= 1
+            if sentence_left == 0:
+                words[-1] += '.'
+                sentence_left = rng.randint(8, 20)
+        text = ' '.join(words)
+        if rng.random() < 0.03:
+            text = f"{rng.choice(ANNOTATIONS)} {text}"
+        if rng.random() < 0.2:
+            text = text.replace(' ', '\n', 1)
+        entries.append({'text': text, 'start': round(spoken * seconds_per_word, 2),
+                        'duration': round(count * seconds_per_word, 2)})
+        spoken += count
+    return entries
+
+
+def synthetic_transcript(minutes: float, seed: Any = 0) -> str:
+    """Raw transcript text (before cleanup) of a synthetic video"""
+    return ' '.join(entry['text'] for entry in synthetic_entries(minutes, seed))
+
+
+class FakeTrack:
+    def __init__(self, video_id: str, latency: float):
+        self.video_id = video_id
+        self.language_code = 'en'
+        self.is_generated = True
+        self.latency = latency
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return synthetic_entries(synthetic_minutes(self.video_id), seed=self.video_id)
+
+
+class FakeTranscriptList:
+    def __init__(self, tracks: List[FakeTrack]):
+        self.tracks = tracks
+
+    def __iter__(self) -> Iterator[FakeTrack]:
+        return iter(self.tracks)
+
+    def find_generated_transcript(self, language_codes: List[str]) -> FakeTrack:
+        for track in self.tracks:
+            if track.is_generated and track.language_code in language_codes:
+                return track
+        raise NoTranscriptFound(self.tracks[0].video_id if self.tracks else '', language_codes, None)
+
+    def find_manually_created_transcript(self, language_codes: List[str]) -> FakeTrack:
+        raise NoTranscriptFound(self.tracks[0].video_id if self.tracks else '', language_codes, None)
+
+
+class FakeTranscriptApi:
+    """
+    Drop-in for YouTubeTranscriptApi in TranscriptResolver (resolver.api).
+    Listing and fetching each take `latency` seconds; IDs that are not
+    synthetic behave like videos with transcripts disabled.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def list_transcripts(self, video_id: str) -> FakeTranscriptList:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            synthetic_minutes(video_id)
+        except ValueError:
+            raise TranscriptsDisabled(video_id)
+        return FakeTranscriptList([FakeTrack(video_id, self.latency)])
+
+
+def synthetic_playlist_id(minutes: int, count: int) -> str:
+    """Playlist of `count` synthetic videos of the given length: PLsyn<minutes:4><count:4>"""
+    return f"PLsyn{minutes:04d}{count:04d}"
+
+
+class FakePlaylistApi:
+    """Drop-in for ingest.YouTubePlaylistApi serving synthetic playlists (synthetic_playlist_id)"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def playlist_videos(self, playlist_id: str, limit: int) -> List[Tuple[str, str]]:
+        if self.latency:
+            time.sleep(self.latency)
+        if len(playlist_id) != 13 or not playlist_id.startswith('PLsyn'):
+            raise ValueError(f"Unknown playlist: {playlist_id}")
+        minutes, count = int(playlist_id[5:9]), int(playlist_id[9:13])
+        return [(synthetic_video_id(minutes, n), f"Lecture {n + 1}") for n in range(min(count, limit))]
@@ -0,0 +1,184 @@
+"""
+Schema checks and salvage for the model's summary/questions JSON.
+
+Instead of all-or-nothing json.loads, each part of the response is decoded and
+validated on its own, so a reply that is truncated, wrapped in prose, or wrong
+in one section still yields whatever parts are usable. The caller then asks the
+model again for just the missing part.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+SUMMARY_LIST_FIELDS = ('main_points', 'key_concepts', 'prerequisites', 'applications', 'follow_up_topics')
+QUESTION_OPTIONS = 4
+DIFFICULTIES = ('Beginner', 'Intermediate', 'Advanced')
+QUESTION_TYPES = ('conceptual', 'application', 'analysis', 'synthesis')
+
+_decoder = json.JSONDecoder()
+_LETTER_RE = re.compile(r'^\s*\(?([A-Da-d])[).:\s]')
+# A JSON string (kept as is) or a comma right before a closing bracket (dropped)
+_TRAILING_COMMA_RE = re.compile(r'("(?:\\.|[^"\\])*")|,\s*(?=[}\]])')
+
+
+def validate_summary(value: Any) -> Optional[Dict[str, Any]]:
+    """
+    The summary object if usable: it needs a detailed_explanation and at least
+    one main point. Missing or malformed list fields become empty lists.
+    """
+    if not isinstance(value, dict):
+        return None
+    explanation = value.get('detailed_explanation')
+    if not isinstance(explanation, str) or not explanation.strip():
+        return None
+    summary: Dict[str, Any] = {}
+    for field in SUMMARY_LIST_FIELDS:
+        items = value.get(field)
+        summary[field] = [str(item) for item in items if item] if isinstance(items, list) else []
+    if not summary['main_points']:
+        return None
+    summary['detailed_explanation'] = explanation
+    return summary
+
+
+def validate_question(value: Any) -> Optional[Dict[str, Any]]:
+    """
+    A normalized question, or None. Needs question text, four options and a
+    resolvable correct answer (index, digit string or option letter).
+    """
+    if not isinstance(value, dict):
+        return None
+    text = value.get('question')
+    options = value.get('options')
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if not isinstance(options, list) or len(options) != QUESTION_OPTIONS or not all(isinstance(o, str) for o in options):
+        return None
+    answer = _answer_index(value.get('correct_answer'), options)
+    if answer is None:
+        return None
+    difficulty = value.get('difficulty')
+    kind = value.get('type')
+    return {
+        'question': text,
+        'options': options,
+        'correct_answer': answer,
+        'explanation': value.get('explanation') if isinstance(value.get('explanation'), str) else '',
+        'difficulty': difficulty if difficulty in DIFFICULTIES else 'Intermediate',
+        'type': kind if kind in QUESTION_TYPES else 'conceptual',
+    }
+
+
+def _answer_index(answer: Any, options: List[str]) -> Optional[int]:
+    if isinstance(answer, bool):
+        return None
+    if isinstance(answer, int):
+        return answer if 0 <= answer < len(options) else None
+    if isinstance(answer, str):
+        answer = answer.strip()
+        if answer.isdigit():
+            return _answer_index(int(answer), options)
+        match = _LETTER_RE.match(answer + ' ')
+        if match:
+            return 'abcd'.index(match.group(1).lower())
+        if answer in options:
+            return options.index(answer)
+    return None
+
+
+def validate_questions(values: Any) -> List[Dict[str, Any]]:
+    """The valid questions from a list, dropping malformed ones and duplicates"""
+    if not isinstance(values, list):
+        return []
+    questions = []
+    seen = set()
+    for value in values:
+        question = validate_question(value)
+        if question is None:
+            continue
+        key = question['question'].strip().lower()
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions
+
+
+def salvage_summary_content(content: Optional[str]) -> Dict[str, Any]:
+    """
+    {"summary": dict or None, "questions": [...]} from raw model output. A
+    response that parses is validated part by part; one that does not (cut off
+    by max_tokens, wrapped in prose) is scanned for a complete "summary" object
+    and for every complete question before the break, ignoring trailing commas.
+    """
+    if not content:
+        return {'summary': None, 'questions': []}
+    try:
+        result = json.loads(content)
+    except ValueError:
+        content = _strip_trailing_commas(content)
+        return {
+            'summary': validate_summary(_decode_after_key(content, 'summary')),
+            'questions': validate_questions(_decode_array_items(content, 'questions')),
+        }
+    if not isinstance(result, dict):
+        return {'summary': None, 'questions': []}
+    return {'summary': validate_summary(result.get('summary')), 'questions': validate_questions(result.get('questions'))}
+
+
+def salvage_questions_content(content: Optional[str]) -> List[Dict[str, Any]]:
+    """Valid questions from a questions-only reply ({"questions": [...]})"""
+    return salvage_summary_content(content)['questions']
+
+
+def salvage_summary_only_content(content: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The summary from a summary-only reply, given either as {"summary": {...}} or bare"""
+    salvaged = salvage_summary_content(content)['summary']
+    if salvaged is not None or not content:
+        return salvaged
+    try:
+        return validate_summary(json.loads(content))
+    except ValueError:
+        return None
+
+
+def _strip_trailing_commas(content: str) -> str:
+    """content without commas before a closing } or ], which json rejects; commas inside strings stay"""
+    return _TRAILING_COMMA_RE.sub(lambda m: m.group(1) or '', content)
+
+
+def _value_start(content: str, key: str, opener: str) -> int:
+    """Index of the opener following "key": in content, or -1"""
+    match = re.search(r'"%s"\s*:\s*' % re.escape(key), content)
+    if not match or not content.startswith(opener, match.end()):
+        return -1
+    return match.end()
+
+
+def _decode_after_key(content: str, key: str) -> Any:
+    start = _value_start(content, key, '{')
+    if start < 0:
+        return None
+    try:
+        value, _ = _decoder.raw_decode(content, start)
+    except ValueError:
+        return None
+    return value
+
+
+def _decode_array_items(content: str, key: str) -> List[Any]:
+    """The complete items of the array under key, stopping at the first incomplete one"""
+    start = _value_start(content, key, '[')
+    if start < 0:
+        return []
+    items = []
+    pos = start + 1
+    while True:
+        while pos < len(content) and content[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(content) or content[pos] == ']':
+            return items
+        try:
+            item, pos = _decoder.raw_decode(content, pos)
+        except ValueError:
+            return items
+        items.append(item)
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before app is imported: a throwaway cache and the offline LLM stand-in
+os.environ.setdefault('FOCUSTUBE_CACHE_DIR', tempfile.mkdtemp(prefix='focustube-test-'))
+os.environ.setdefault('LLM_PROVIDER', 'fake')
+os.environ.setdefault('LLM_FAKE_LATENCY', '0.01')
+os.environ.setdefault('LLM_FAKE_TOKENS_PER_SECOND', '20000')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
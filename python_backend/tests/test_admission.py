@@ -0,0 +1,108 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+import pytest
+
+import app
+from admission import BULK, INTERACTIVE, AdmissionController, AdmissionRejected, PriorityClass
+from standins import FakeTranscriptApi, synthetic_transcript, synthetic_video_id
+
+REQUESTS = 60
+
+
+@pytest.fixture
+def tight_admission(monkeypatch):
+    """One bulk slot with a short queue: without coalescing, most of REQUESTS duplicates are shed"""
+    controller = AdmissionController({
+        INTERACTIVE: PriorityClass(INTERACTIVE, priority=0, concurrency=4, tokens_per_minute=10 ** 9,
+                                   max_wait=5, max_queue=4),
+        BULK: PriorityClass(BULK, priority=1, concurrency=1, tokens_per_minute=10 ** 9, max_wait=5, max_queue=2),
+    })
+    monkeypatch.setattr(app, 'admission', controller)
+    # Slow enough that every duplicate joins the first request's flight
+    monkeypatch.setattr(app.llm, 'latency', 0.3)
+    return controller
+
+
+def test_concurrent_identical_requests_are_admitted_once(tight_admission, monkeypatch):
+    monkeypatch.setattr(app.transcript_resolver, 'api', FakeTranscriptApi())
+    video_id = synthetic_video_id(3, random.randrange(10000))
+    transcript = app.get_transcript(video_id)
+    expected_tokens = app.summary_prompt_tokens(transcript, "title", app.summary_sections(transcript))
+    barrier = threading.Barrier(REQUESTS)
+    statuses = []
+
+    def request():
+        client = app.app.test_client()
+        barrier.wait()
+        statuses.append(client.post('/process_video', json={"video_url": video_id, "video_title": "title"}).status_code)
+
+    threads = [threading.Thread(target=request) for _ in range(REQUESTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * REQUESTS
+    bulk = tight_admission.stats()[BULK]
+    assert bulk["admitted"] == 1
+    assert bulk["admitted_tokens"] == expected_tokens
+
+
+def test_concurrent_identical_requests_are_admitted_once_on_the_event_loop(tight_admission):
+    import asgi_app
+
+    transcript = synthetic_transcript(3, seed=uuid.uuid4().hex)
+
+    async def requests():
+        return await asyncio.gather(
+            *(asgi_app.generate_summary_and_questions(transcript, "title") for _ in range(REQUESTS))
+        )
+
+    results = asyncio.run(requests())
+    assert len(results) == REQUESTS
+    assert tight_admission.stats()[BULK]["admitted"] == 1
+
+
+def test_shedding_callers_do_not_wait_behind_a_deferred_generation(tight_admission, monkeypatch):
+    bulk = tight_admission.classes[BULK]
+    monkeypatch.setattr(bulk, 'max_wait', 0.05)
+    transcript = synthetic_transcript(3, seed=uuid.uuid4().hex)
+    results = []
+    deferred = threading.Thread(target=lambda: results.append(
+        app.generate_summary_and_questions(transcript, "title", max_wait=None)))
+    deferred.start()
+    wait_for(lambda: tight_admission.stats()[BULK]["admitted"] == 1)
+
+    with pytest.raises(AdmissionRejected) as shed:
+        app.generate_summary_and_questions(transcript, "title")
+    deferred.join()
+
+    assert shed.value.priority_class == BULK
+    assert results and results[0]["questions"]
+
+
+def test_question_prompt_is_built_once_per_request(monkeypatch):
+    transcript = synthetic_transcript(3, seed=uuid.uuid4().hex)
+    build = app.question_completion_kwargs
+    calls = []
+
+    def counted(*args):
+        calls.append(args)
+        return build(*args)
+
+    monkeypatch.setattr(app, 'question_completion_kwargs', counted)
+    response = app.app.test_client().post('/ask_question', json={"question": "What is covered?", "transcript": transcript})
+
+    assert response.status_code == 200
+    assert len(calls) == 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
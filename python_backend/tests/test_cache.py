@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+import pytest
+
+from cache import ArtifactStore, MemoLRU, TieredCache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_memory_tier_evicts_least_recently_used_by_size():
+    cache = TieredCache("lru", max_memory_bytes=10)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    assert cache.get("a") is not None
+    cache.set("c", "xxxx")
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == "xxxx" and cache.get("c").value == "xxxx"
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["memory_bytes"] == 8
+
+
+def test_values_larger_than_the_memory_tier_are_only_kept_on_disk(db_path):
+    cache = TieredCache("large", db_path, max_memory_bytes=4)
+    cache.set("key", "too large")
+
+    assert cache.stats()["memory_entries"] == 0
+    assert cache.get("key").value == "too large"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_hits_survive_a_new_instance_and_are_promoted(db_path):
+    TieredCache("shared", db_path).set("key", "value")
+    cache = TieredCache("shared", db_path)
+
+    assert cache.get("key").value == "value"
+    assert cache.get("key").value == "value"
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+
+def test_expired_entries_are_dropped_from_both_tiers(db_path):
+    cache = TieredCache("ttl", db_path)
+    cache.set("key", "value", ttl=0.05)
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
+    assert TieredCache("ttl", db_path).get("key") is None
+    # Counted once for each tier it expired from
+    assert cache.stats()["expirations"] == 2
+
+
+def test_negative_entries_carry_their_message_and_own_ttl(db_path):
+    cache = TieredCache("negative", db_path, negative_ttl=0.05)
+    cache.set_negative("key", "no transcript")
+
+    entry = TieredCache("negative", db_path).get("key")
+    assert entry.negative and entry.value == "no transcript"
+    assert cache.get("key").negative and cache.stats()["negative_hits"] == 1
+    time.sleep(0.1)
+    assert cache.get("key") is None
+
+
+def test_delete_and_clear_reach_the_disk_tier(db_path):
+    cache = TieredCache("delete", db_path)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.delete("a")
+    assert TieredCache("delete", db_path).get("a") is None
+    cache.clear()
+    assert TieredCache("delete", db_path).get("b") is None
+    assert cache.get("b") is None
+
+
+def test_threads_share_the_cache_through_their_own_connections(db_path):
+    cache = TieredCache("threads", db_path, max_memory_bytes=64)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(200):
+                key = f"{n}:{i % 20}"
+                cache.set(key, key * 3)
+                entry = cache.get(key)
+                assert entry is None or entry.value == key * 3
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert TieredCache("threads", db_path).get("7:19").value == "7:19" * 3
+
+
+def test_memo_lru_builds_once_and_evicts_the_oldest():
+    memo = MemoLRU(max_entries=2)
+    builds = []
+
+    def build(key):
+        builds.append(key)
+        return key.upper()
+
+    for key in ["a", "b", "a", "c", "b"]:
+        assert memo.get_or_build(key, lambda: build(key)) == key.upper()
+
+    assert builds == ["a", "b", "c", "b"]
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 2)
+
+
+def test_artifacts_round_trip_and_count_missing_files(tmp_path):
+    store = ArtifactStore("index", version=1, directory=str(tmp_path))
+
+    assert store.load("key") is None
+    assert store.save("key", {"terms": ["a", "b"], "lengths": [1, 2]})
+    assert store.has("key")
+    assert store.load("key") == {"terms": ["a", "b"], "lengths": [1, 2]}
+    stats = store.stats()
+    assert (stats["loads"], stats["misses"], stats["saves"]) == (1, 1, 1)
+
+
+def test_corrupted_or_empty_artifacts_are_ignored(tmp_path):
+    store = ArtifactStore("index", version=1, directory=str(tmp_path))
+    store.save("corrupt", list(range(100)))
+    with open(store.path("corrupt"), "r+b") as f:
+        f.truncate(10)
+    store.save("empty", "value")
+    open(store.path("empty"), "wb").close()
+
+    assert store.load("corrupt") is None
+    assert store.load("empty") is None
+    assert store.stats()["errors"] == 2
+
+
+def test_artifacts_of_another_version_or_a_disabled_store_are_not_loaded(tmp_path):
+    ArtifactStore("index", version=1, directory=str(tmp_path)).save("key", "old")
+
+    assert ArtifactStore("index", version=2, directory=str(tmp_path)).load("key") is None
+    disabled = ArtifactStore("index", version=1)
+    assert not disabled.save("key", "value") and disabled.load("key") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "index", "key.v2.marshal"))
+
+
+def test_memo_lru_is_bounded_by_the_size_estimates():
+    memo = MemoLRU(max_entries=10, max_bytes=100)
+    for key in "abc":
+        memo.get_or_build(key, lambda: key, size=40)
+    assert memo.get_or_build("huge", lambda: "huge", size=101) == "huge"
+
+    stats = memo.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 80, 1)
+    assert memo.get_or_build("a", lambda: "rebuilt", size=40) == "rebuilt"
+    assert memo.get_or_build("c", lambda: "rebuilt", size=40) == "c"
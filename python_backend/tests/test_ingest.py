@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+
+from ingest import CANCELLED, COMPLETED, INTERRUPTED, RUNNING, IngestManager
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def manager(db_path, gate=None, **kwargs):
+    def generate(video_id, transcript, title):
+        if gate is not None:
+            gate.wait(5)
+        return {"success": True, "video_id": video_id}
+
+    return IngestManager(lambda video_id: video_id, lambda video_id, fetched: fetched, generate,
+                         db_path=db_path, fetch_workers=1, generate_workers=1, poll_interval=0.05, **kwargs)
+
+
+VIDEOS = [(f"video{n:06d}", "") for n in range(3)]
+
+
+def test_other_workers_see_follow_and_cancel_a_running_run(tmp_path):
+    db_path = str(tmp_path / 'ingest.sqlite3')
+    gate = threading.Event()
+    owner = manager(db_path, gate)
+    other = manager(db_path)
+    run_id = owner.start(VIDEOS)["ingest_id"]
+
+    # Running in the owner: not interrupted elsewhere, and not resumed twice
+    assert other.get(run_id)["status"] == RUNNING
+    assert other.resume_unfinished() == []
+    assert other.resume(run_id)["status"] == RUNNING
+    assert run_id not in other._active
+
+    events = other.events(run_id, heartbeat=0.2)
+    assert next(events)["event"] == "progress"
+    assert other.cancel(run_id)
+    # Picked up by the owner's lease renewal
+    assert wait_for(lambda: owner._active[run_id]._stopped.is_set())
+    gate.set()
+    rest = list(events)
+    assert rest[-1]["event"] == "done" and rest[-1]["status"] == CANCELLED
+    assert owner.get(run_id)["status"] == CANCELLED
+
+
+def test_follow_sees_progress_until_completion(tmp_path):
+    db_path = str(tmp_path / 'ingest.sqlite3')
+    gate = threading.Event()
+    owner = manager(db_path, gate)
+    other = manager(db_path)
+    run_id = owner.start(VIDEOS)["ingest_id"]
+
+    events = other.events(run_id)
+    assert next(events)["progress"]["done"] == 0
+    gate.set()
+    rest = list(events)
+    assert rest[-1] == {"event": "done", "ingest_id": run_id, "status": COMPLETED,
+                        "progress": {"total": 3, "done": 3, "failed": 0}}
+    assert [event["progress"]["done"] for event in rest if event["event"] == "progress"][-1] == 3
+
+
+def test_run_of_a_stopped_process_is_resumed_by_exactly_one(tmp_path):
+    db_path = str(tmp_path / 'ingest.sqlite3')
+    dead = manager(db_path, lease=0.3)
+    # Checkpointed as running but never launched: nothing renews the lease, as if the process died
+    state = {"id": "orphan", "status": RUNNING, "source": {}, "done": 1, "failed": 0,
+             "videos": [{"video_id": "video000000", "title": "", "status": "done", "error": None},
+                        {"video_id": "video000001", "title": "", "status": "pending", "error": None}],
+             "created_at": time.time(), "updated_at": time.time()}
+    dead.store.save(state)
+
+    first, second = manager(db_path), manager(db_path)
+    assert first.get("orphan")["status"] == RUNNING
+    assert first.resume_unfinished() == []
+
+    time.sleep(0.35)
+    assert first.get("orphan")["status"] == INTERRUPTED
+    assert first.resume_unfinished() == ["orphan"]
+    assert second.resume_unfinished() == []
+    assert wait_for(lambda: second.get("orphan")["status"] == COMPLETED)
+    assert second.get("orphan")["progress"]["done"] == 2
+
+
+def test_old_checkpoint_table_is_migrated(tmp_path):
+    db_path = str(tmp_path / 'ingest.sqlite3')
+    db = sqlite3.connect(db_path)
+    db.execute('CREATE TABLE ingest_runs (id TEXT PRIMARY KEY, run TEXT NOT NULL, updated_at REAL NOT NULL)')
+    db.execute("INSERT INTO ingest_runs VALUES ('old', ?, 0)",
+               ('{"id": "old", "status": "running", "source": {}, "done": 0, "failed": 0, "videos": '
+                '[{"video_id": "video000000", "title": "", "status": "pending", "error": null}], '
+                '"created_at": 0, "updated_at": 0}',))
+    db.commit()
+    db.close()
+
+    resumed = manager(db_path)
+    assert resumed.get("old")["status"] == INTERRUPTED
+    assert resumed.resume_unfinished() == ["old"]
+    assert wait_for(lambda: resumed.get("old")["status"] == COMPLETED)
@@ -0,0 +1,143 @@
+import socket
+import threading
+import time
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, callback_url_error
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_queues_sharing_a_database_see_and_run_each_job_once(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    runs = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        with lock:
+            runs.append(payload["n"])
+        time.sleep(0.01)
+        return payload["n"]
+
+    first = JobQueue('t', handler, workers=3, db_path=db_path, poll_interval=0.05)
+    second = JobQueue('t', handler, workers=3, db_path=db_path, poll_interval=0.05)
+    second._start_workers()
+    jobs = [first.submit({"n": n}) for n in range(20)]
+
+    assert wait_for(lambda: all(second.get(job["id"])["status"] == SUCCEEDED for job in jobs))
+    assert sorted(runs) == list(range(20))
+    assert second.get(jobs[3]["id"])["result"] == 3
+
+
+def test_dedupe_key_is_shared_between_queues(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    release = threading.Event()
+    first = JobQueue('t', lambda payload: release.wait(5), workers=1, db_path=db_path)
+    second = JobQueue('t', lambda payload: None, workers=1, db_path=db_path)
+
+    job = first.submit({}, dedupe_key='same')
+    assert second.submit({}, dedupe_key='same')["id"] == job["id"]
+    release.set()
+    assert wait_for(lambda: first.get(job["id"])["status"] == SUCCEEDED)
+    assert second.submit({}, dedupe_key='same')["id"] != job["id"]
+
+
+def test_job_of_a_dead_owner_is_claimed_again_after_its_lease(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    dead = JobQueue('t', lambda payload: None, workers=1, db_path=db_path, lease=0.2)
+    dead._start_workers = lambda: None
+    job = dead.submit({})
+    # Claimed by a process that then died without finishing or renewing the lease
+    with dead._transaction() as db:
+        db.execute('UPDATE "jobs_t" SET status = ?, owner = ?, lease_until = ? WHERE id = ?',
+                   (RUNNING, 'gone', time.time() + 0.2, job["id"]))
+
+    survivor = JobQueue('t', lambda payload: 'ok', workers=1, db_path=db_path, poll_interval=0.05)
+    assert survivor.get(job["id"])["status"] in (QUEUED, RUNNING)
+    assert wait_for(lambda: survivor.get(job["id"])["status"] == SUCCEEDED)
+    assert survivor.get(job["id"])["result"] == 'ok'
+
+
+def test_a_job_whose_worker_keeps_dying_fails_after_max_attempts(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    dead = JobQueue('t', lambda payload: None, workers=1, db_path=db_path, max_attempts=2)
+    dead._start_workers = lambda: None
+    job = dead.submit({})
+    runs = []
+
+    def crash_during_attempt():
+        # Claimed like a worker would, then the process died before finishing or renewing
+        claimed = dead._claim()
+        with dead._transaction() as db:
+            db.execute('UPDATE "jobs_t" SET owner = ?, lease_until = ? WHERE id = ?', ('gone', 0, claimed["id"]))
+        dead._running -= 1
+        return claimed
+
+    assert crash_during_attempt()["attempts"] == 1
+    assert crash_during_attempt()["attempts"] == 2
+    survivor = JobQueue('t', lambda payload: runs.append(1), workers=1, db_path=db_path, max_attempts=2,
+                        poll_interval=0.05)
+
+    assert wait_for(lambda: survivor.stats()["failed"] == 1)
+    failed = survivor.get(job["id"])
+    assert failed["status"] == FAILED and failed["attempts"] == 2 and "lease expired" in failed["error"]
+    assert runs == []
+
+
+def test_failures_retry_then_fail_and_finished_jobs_are_pruned():
+    attempts = []
+
+    def handler(payload):
+        attempts.append(1)
+        raise RuntimeError("boom")
+
+    queue = JobQueue('t', handler, workers=1, max_attempts=2, base_delay=0.01, result_ttl=0.1)
+    job = queue.submit({})
+    assert wait_for(lambda: queue.get(job["id"])["status"] == FAILED)
+    assert len(attempts) == 2 and queue.stats()["retries"] == 1
+
+    time.sleep(0.15)
+    queue._pruned_at = 0
+    queue._prune()
+    assert queue.get(job["id"]) is None
+
+
+def test_callback_urls_must_resolve_to_public_addresses(monkeypatch):
+    resolved = {'hooks.example.com': '93.184.216.34', 'internal.example.com': '10.0.0.5'}
+    monkeypatch.setattr(socket, 'getaddrinfo', lambda host, port, **kw: [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', (resolved.get(host, host), port))
+    ])
+
+    assert callback_url_error('https://hooks.example.com/done') is None
+    for url in ('ftp://hooks.example.com/', 'http://127.0.0.1/', 'http://169.254.169.254/latest/meta-data',
+                'http://internal.example.com/', 'http://192.168.1.1:8080/', 'http://0.0.0.0/'):
+        assert callback_url_error(url) is not None, url
+
+    assert callback_url_error('http://internal.example.com/', ['internal.example.com']) is None
+    assert callback_url_error('https://hooks.example.com/', ['internal.example.com']) is not None
+
+
+def test_process_video_jobs_are_deduplicated_on_every_input(monkeypatch):
+    import app as core
+
+    release = threading.Event()
+    queue = JobQueue('dedupe_test', lambda payload: release.wait(5), workers=1)
+    monkeypatch.setattr(core, 'job_queue', queue)
+    try:
+        first, _ = core.submit_process_video_job('dQw4w9WgXcQ', {"video_title": "A"})
+        same, _ = core.submit_process_video_job('dQw4w9WgXcQ', {"video_title": "A"})
+        titled, _ = core.submit_process_video_job('dQw4w9WgXcQ', {"video_title": "B"})
+        bare, _ = core.submit_process_video_job('dQw4w9WgXcQ', {"video_title": "A", "include_transcript": False})
+        assert same["job"]["id"] == first["job"]["id"]
+        assert len({first["job"]["id"], titled["job"]["id"], bare["job"]["id"]}) == 3
+
+        body, status = core.submit_process_video_job('dQw4w9WgXcQ', {"callback_url": "http://127.0.0.1:5001/"})
+        assert status == 400
+    finally:
+        release.set()
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from llm_client import AdaptiveConcurrency, LLMClient, RateLimiter, default_concurrency, default_rate_limiter
+from llm_providers import FakeProvider, LLMProvider
+
+
+def test_provider_must_implement_every_call():
+    class CompleteOnly(LLMProvider):
+        def complete(self, **kwargs):
+            return None
+
+    with pytest.raises(TypeError):
+        LLMProvider()
+    with pytest.raises(TypeError):
+        CompleteOnly()
+    assert FakeProvider(latency=0).stats()["provider"] == "fake"
+
+
+def test_client_counters_survive_concurrent_updates():
+    client = LLMClient(RateLimiter(1000, 100000), AdaptiveConcurrency(4))
+
+    def bump():
+        for _ in range(5000):
+            client._count(calls=1, prompt_tokens=2)
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = client.stats()
+    assert stats["calls"] == 40000
+    assert stats["prompt_tokens"] == 80000
+
+
+def test_budgets_are_split_between_server_processes(monkeypatch):
+    monkeypatch.setenv('LLM_PROCESSES', '2')
+    monkeypatch.setenv('LLM_REQUESTS_PER_MINUTE', '500')
+    monkeypatch.setenv('LLM_TOKENS_PER_MINUTE', '300000')
+    monkeypatch.setenv('LLM_MAX_CONCURRENCY', '32')
+    limiter = default_rate_limiter()
+    assert (limiter.requests_per_minute, limiter.tokens_per_minute) == (250, 150000)
+    assert default_concurrency().maximum == 16
+
+    # The provider reports the account's limits; this process adopts its half
+    limiter.update_from_headers({'x-ratelimit-limit-tokens': '400000', 'x-ratelimit-remaining-tokens': '100000'})
+    stats = limiter.stats()
+    assert stats["tokens_per_minute"] == 200000
+    assert stats["available_tokens"] == 50000
@@ -0,0 +1,49 @@
+import retrieval
+from retrieval import BM25Index, chunk_words, select_context, stem, tokenize
+
+
+def test_stemming_maps_inflections_to_one_term():
+    assert {stem(w) for w in ["derivative", "derivatives"]} == {"derivativ"}
+    assert stem("running") == stem("runs") == "run"
+    assert stem("classes") == "class" and stem("focus") == "focus"
+    assert tokenize("What is the Integral of it?") == ["integral"]
+
+
+def test_chunks_overlap_and_cover_the_text():
+    words = [f"w{i}" for i in range(25)]
+    chunks = chunk_words(" ".join(words), size=10, overlap=4)
+
+    assert chunks[0].split() == words[:10]
+    assert chunks[1].split()[:4] == words[6:10]
+    assert chunks[-1].split()[-1] == "w24"
+
+
+def test_bm25_prefers_rarer_and_denser_terms():
+    index = BM25Index([
+        "eigenvalues of a matrix and eigenvalues of its transpose",
+        "a matrix can be multiplied by a matrix",
+        "the determinant of a matrix",
+    ])
+    ranked = index.search("matrix eigenvalue")
+
+    assert ranked[0][0] == 0
+    assert [i for i, _ in ranked] == [0, 1, 2]
+    assert index.search("unrelated") == []
+
+
+def test_long_transcripts_send_the_relevant_chunks_in_order(monkeypatch):
+    monkeypatch.setattr(retrieval, "FULL_TRANSCRIPT_WORDS", 20)
+    filler = " ".join(["lecture"] * 400)
+    transcript = f"{filler} photosynthesis converts light {filler} mitochondria produce energy {filler}"
+
+    context = select_context("How does photosynthesis work in mitochondria?", transcript, top_k=2)
+    parts = context.split(retrieval.CHUNK_SEPARATOR)
+
+    assert len(parts) == 2
+    assert "photosynthesis" in parts[0] and "mitochondria" in parts[1]
+
+
+def test_short_transcripts_and_unmatched_questions_fall_back():
+    assert select_context("anything", "a short transcript") == "a short transcript"
+    index = BM25Index(["alpha", "beta", "gamma"])
+    assert index.search("delta") == []
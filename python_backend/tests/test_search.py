@@ -0,0 +1,56 @@
+from search import TranscriptSearchIndex, parse_query
+
+TRANSCRIPT = (
+    "Today we cover gradient descent. "
+    "The gradient points uphill, so descent steps go the other way. "
+    "Learning rates control the step size. "
+    "A learning rate that is too large makes training diverge. "
+    "We will compare stochastic methods next week."
+)
+
+
+def test_queries_split_into_stemmed_terms_and_phrases():
+    terms, phrases = parse_query('Learning "gradient descents" "rates"')
+    assert terms == ["learn", "rat"]
+    assert phrases == [["gradient", "descent"]]
+
+
+def test_sentences_are_ranked_by_bm25_with_inflections_matching():
+    results = TranscriptSearchIndex(TRANSCRIPT).search("learned rate", context=0)["results"]
+
+    # Both sentences hold the phrase; the shorter one ranks first
+    assert [r["sentence_index"] for r in results] == [2, 3]
+    assert results[0]["relevance_score"] > results[1]["relevance_score"]
+    assert [[r["text"][s:e] for s, e in r["highlights"]] for r in results] == [["Learning rates"], ["learning rate"]]
+
+
+def test_quoted_phrases_must_match_in_order():
+    index = TranscriptSearchIndex(TRANSCRIPT)
+
+    found = index.search('"gradient descent"', context=0)
+    assert found["total_matches"] == 1
+    assert found["results"][0]["text"] == "Today we cover gradient descent."
+    assert index.search('"descent gradient"')["total_matches"] == 0
+
+
+def test_an_unquoted_multi_word_query_boosts_adjacent_matches():
+    results = TranscriptSearchIndex(TRANSCRIPT).search("gradient descent", context=0)["results"]
+
+    assert results[0]["sentence_index"] == 0
+    assert results[0]["highlights"] == [[15, 31]]
+    assert {r["sentence_index"] for r in results} == {0, 1}
+
+
+def test_results_carry_surrounding_sentences_and_offsets():
+    result = TranscriptSearchIndex(TRANSCRIPT).search("stochastic", context=1)["results"][0]
+
+    assert result["text"].startswith("A learning rate")
+    assert TRANSCRIPT[result["start"]:result["end"]] == result["text"]
+    s, e = result["highlights"][0]
+    assert result["text"][s:e] == "stochastic"
+
+
+def test_index_state_round_trips():
+    index = TranscriptSearchIndex(TRANSCRIPT)
+    restored = TranscriptSearchIndex.from_state(TRANSCRIPT, index.state())
+    assert restored.search("step size") == index.search("step size")
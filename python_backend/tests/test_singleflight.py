@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+import pytest
+
+from admission import AdmissionRejected
+from singleflight import AsyncSingleFlight, SingleFlight
+
+FOLLOWERS = 8
+
+
+def run_coalesced(flight, fn, callers=FOLLOWERS + 1):
+    """Call flight.do from `callers` threads while fn holds the leader; returns each result or exception"""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            outcome = flight.do("key", fn)
+        except BaseException as e:
+            outcome = e
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def gated(result=None, error=None, entered=None):
+    gate = threading.Event()
+
+    def fn():
+        if entered is not None:
+            entered.set()
+        gate.wait(5)
+        if error is not None:
+            raise error
+        return result
+    return gate, fn
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight("test", timeout=5)
+    gate, fn = gated(result="value")
+    threading.Timer(0.2, gate.set).start()
+
+    assert run_coalesced(flight, fn) == ["value"] * (FOLLOWERS + 1)
+    stats = flight.stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, FOLLOWERS, 0)
+
+
+def test_each_follower_raises_its_own_copy_of_the_leaders_error():
+    flight = SingleFlight("test", timeout=5)
+    original = AdmissionRejected("queue full", 1.5, "bulk")
+    gate, fn = gated(error=original)
+    threading.Timer(0.2, gate.set).start()
+
+    errors = run_coalesced(flight, fn)
+
+    assert all(isinstance(e, AdmissionRejected) for e in errors)
+    assert len({id(e) for e in errors}) == len(errors)
+    followers = [e for e in errors if e is not original]
+    assert len(followers) == FOLLOWERS
+    assert all(e.__cause__ is original and e.retry_after == 1.5 and str(e) == "queue full" for e in followers)
+    assert flight.stats()["failures"] == 1
+    # The key is released, so the next call is a fresh attempt
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_followers_time_out_at_the_leaders_deadline_and_a_stale_leader_is_replaced():
+    flight = SingleFlight("test", timeout=0.2)
+    entered = threading.Event()
+    gate, fn = gated(result="slow", entered=entered)
+    leader = threading.Thread(target=flight.do, args=("key", fn))
+    leader.start()
+    entered.wait(5)
+
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "unused")
+    assert flight.do("key", lambda: "fresh") == "fresh"
+    gate.set()
+    leader.join()
+
+    stats = flight.stats()
+    assert (stats["timeouts"], stats["stale"], stats["leaders"], stats["in_flight"]) == (1, 1, 2, 0)
+
+
+def test_async_followers_share_one_task_and_get_their_own_errors():
+    flight = AsyncSingleFlight("test", timeout=5)
+    calls = []
+    original = ValueError("no transcript")
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise original
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(FOLLOWERS + 1)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(main())
+
+    assert calls == [1]
+    assert errors[0] is original
+    assert all(isinstance(e, ValueError) and e is not original and e.__cause__ is original for e in errors[1:])
+    assert flight.stats()["failures"] == 1 and flight.stats()["in_flight"] == 0
+
+
+def test_async_timeouts_leave_the_task_running_for_later_callers():
+    flight = AsyncSingleFlight("test", timeout=0.1)
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return "slow"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(TimeoutError):
+            await flight.do("key", slow)
+        with pytest.raises(TimeoutError):
+            await first
+        # The stale task takes no new followers
+        assert await flight.do("key", lambda: asyncio.sleep(0, result="fresh")) == "fresh"
+
+    asyncio.run(main())
+    stats = flight.stats()
+    assert (stats["timeouts"], stats["stale"], stats["leaders"]) == (2, 1, 2)
@@ -0,0 +1,46 @@
+import threading
+import uuid
+
+import app
+from metrics import finish_request_timing, start_request_timing
+from standins import synthetic_transcript
+
+
+def timed(fn, *args):
+    token = start_request_timing()
+    try:
+        fn(*args)
+    finally:
+        timings = finish_request_timing(token)
+    return [name for name, _ in timings]
+
+
+def test_section_notes_threads_report_to_the_request():
+    transcript = synthetic_transcript(60, seed=uuid.uuid4().hex)
+    sections = app.split_by_token_budget(transcript, app.SUMMARY_CHUNK_TOKENS)
+    assert len(sections) > 1
+    names = timed(app._summarize_sections, sections, "title")
+    assert names.count('llm_section_notes') == len(sections)
+
+
+def test_repair_threads_report_to_the_request():
+    partial = {"summary": None, "questions": []}
+    names = timed(app._repair_summary, partial, synthetic_transcript(2, seed=uuid.uuid4().hex), "title")
+    assert sorted(names) == ['llm_repair_questions', 'llm_repair_summary']
+
+
+def test_repair_counts_are_not_lost_between_threads():
+    before = app.summary_repair_counts()
+
+    def request_repairs():
+        for _ in range(2000):
+            app.summary_repair_requests({"summary": None, "questions": []}, "transcript", "title")
+
+    threads = [threading.Thread(target=request_repairs) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = app.summary_repair_counts()
+    assert after["summary"] - before["summary"] == 8000
+    assert after["questions"] - before["questions"] == 8000
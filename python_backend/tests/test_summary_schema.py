@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import app
+from summary_schema import (
+    salvage_questions_content, salvage_summary_content, salvage_summary_only_content, validate_question
+)
+
+SUMMARY = {
+    "main_points": ["Gradients point uphill", "Step size matters"],
+    "key_concepts": ["gradient descent"],
+    "prerequisites": ["calculus"],
+    "applications": ["training neural networks"],
+    "detailed_explanation": "Gradient descent walks downhill, one step at a time.",
+    "follow_up_topics": ["momentum"],
+}
+
+
+def question(n, **overrides):
+    value = {
+        "question": f"Question {n}?",
+        "options": ["A. one", "B. two", "C. three", "D. four"],
+        "correct_answer": n % 4,
+        "explanation": "Because.",
+        "difficulty": "Beginner",
+        "type": "conceptual",
+    }
+    value.update(overrides)
+    return value
+
+
+def reply(questions=3):
+    return json.dumps({"summary": SUMMARY, "questions": [question(n) for n in range(questions)]})
+
+
+def test_valid_reply_passes_through_unchanged():
+    salvaged = salvage_summary_content(reply())
+    assert salvaged == {"summary": SUMMARY, "questions": [question(n) for n in range(3)]}
+
+
+@pytest.mark.parametrize("content, summary, questions", [
+    # Cut off by max_tokens inside the third question
+    (reply()[:reply().rindex('"explanation"')], True, 2),
+    # Cut off inside the summary: nothing before the questions survives
+    (reply()[:40], False, 0),
+    # Code fence and prose around the object
+    ("Here you go:\n```json\n" + reply() + "\n```", True, 3),
+    # Trailing commas in the summary lists and after the last question
+    (reply().replace('"calculus"]', '"calculus",]').replace('}]}', '},]}'), True, 3),
+    # Partial array: the questions array never closes
+    (reply()[:-2], True, 3),
+    ("", False, 0),
+    ("not json at all", False, 0),
+    ("[1, 2, 3]", False, 0),
+], ids=["truncated-question", "truncated-summary", "code-fence", "trailing-commas", "unclosed-array",
+        "empty", "prose", "not-an-object"])
+def test_salvage_keeps_every_complete_part(content, summary, questions):
+    salvaged = salvage_summary_content(content)
+    assert (salvaged["summary"] == SUMMARY) is summary
+    assert salvaged["questions"] == [question(n) for n in range(questions)]
+
+
+def test_trailing_comma_inside_a_string_is_kept():
+    summary = dict(SUMMARY, detailed_explanation="Lists end like [a, b,] here.")
+    content = json.dumps({"summary": summary}) + ',,'
+    assert salvage_summary_content(content)["summary"]["detailed_explanation"] == "Lists end like [a, b,] here."
+
+
+@pytest.mark.parametrize("value, expected", [
+    (question(1, correct_answer="C"), 2),
+    (question(1, correct_answer="(b)"), 1),
+    (question(1, correct_answer="3"), 3),
+    (question(1, correct_answer="C. three"), 2),
+    (question(1, correct_answer=4), None),
+    (question(1, correct_answer=True), None),
+    (question(1, options=["A", "B"]), None),
+    (question(1, question=" "), None),
+])
+def test_correct_answer_forms(value, expected):
+    normalized = validate_question(value)
+    assert (normalized["correct_answer"] if normalized else None) == expected
+
+
+def test_invalid_and_duplicate_questions_are_dropped():
+    content = json.dumps({"questions": [question(1), question(1), question(2, options="abcd"), question(3)]})
+    assert [q["question"] for q in salvage_questions_content(content)] == ["Question 1?", "Question 3?"]
+
+
+def test_summary_only_reply_may_be_bare():
+    assert salvage_summary_only_content(json.dumps(SUMMARY)) == SUMMARY
+    assert salvage_summary_only_content(json.dumps({"summary": SUMMARY})) == SUMMARY
+    assert salvage_summary_only_content(json.dumps(dict(SUMMARY, main_points=[]))) is None
+
+
+def test_repair_asks_only_for_missing_parts_and_merges_them():
+    truncated = reply(questions=4)[:reply(questions=4).rindex('"explanation"')]
+    partial = salvage_summary_content(truncated)
+    assert [part for part, _ in app.summary_repair_requests(partial, "transcript", "title")] == ["questions"]
+
+    more = json.dumps({"questions": [question(n) for n in range(2, 12)]})
+    app.apply_summary_repair(partial, "questions", more)
+    assert [q["question"] for q in partial["questions"]] == [f"Question {n}?" for n in range(app.QUESTION_COUNT)]
+
+
+def test_repair_regenerates_a_lost_summary():
+    partial = salvage_summary_content('{"summary": {"main_points": ["x"]}, "questions": []}')
+    parts = [part for part, _ in app.summary_repair_requests(partial, "transcript", "title")]
+    assert parts == ["summary", "questions"]
+
+    app.apply_summary_repair(partial, "summary", "```json\n" + json.dumps({"summary": SUMMARY}) + "\n```")
+    assert partial["summary"] == SUMMARY
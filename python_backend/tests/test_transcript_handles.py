@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+import app
+
+VIDEO_ID = "noCaptions1"
+
+
+@pytest.fixture
+def captionless_video():
+    app.transcript_cache.set_negative(VIDEO_ID, "Could not fetch transcript: Transcripts are disabled")
+    return VIDEO_ID
+
+
+def test_handles_without_a_transcript_are_not_found(captionless_video):
+    client = app.app.test_client()
+    responses = [
+        client.post('/ask_question', json={"question": "Why?", "transcript_handle": captionless_video}),
+        client.post('/search_transcript', json={"query": "why", "transcript_handle": captionless_video}),
+        client.get(f'/transcripts/{captionless_video}'),
+    ]
+    assert [response.status_code for response in responses] == [404] * 3
+    assert all("Transcripts are disabled" in response.get_json()["error"] for response in responses)
+
+
+def test_handles_without_a_transcript_are_not_found_on_the_event_loop(captionless_video):
+    import asgi_app
+
+    async def requests():
+        client = asgi_app.app.test_client()
+        return [
+            await client.post('/ask_question', json={"question": "Why?", "transcript_handle": captionless_video}),
+            await client.post('/search_transcript', json={"query": "why", "transcript_handle": captionless_video}),
+            await client.get(f'/transcripts/{captionless_video}'),
+        ]
+
+    assert [response.status_code for response in asyncio.run(requests())] == [404] * 3
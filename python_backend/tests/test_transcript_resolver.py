@@ -0,0 +1,132 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from youtube_transcript_api import NoTranscriptFound
+
+from cache import TieredCache
+from standins import FakeTranscriptApi, synthetic_video_id
+from transcript_model import Transcript
+from transcript_resolver import TranscriptResolver, raw_entries
+
+
+class Snippet:
+    def __init__(self, text, start, duration):
+        self.text, self.start, self.duration = text, start, duration
+
+
+class FetchedTranscript(list):
+    """Shaped like 1.x: iterable snippet objects plus to_raw_data()"""
+
+    def to_raw_data(self):
+        return [{'text': s.text, 'start': s.start, 'duration': s.duration} for s in self]
+
+
+class TrackList(list):
+    def find_generated_transcript(self, language_codes):
+        return self._find(language_codes, True)
+
+    def find_manually_created_transcript(self, language_codes):
+        return self._find(language_codes, False)
+
+    def _find(self, language_codes, is_generated):
+        for track in self:
+            if track.is_generated == is_generated and track.language_code in language_codes:
+                return track
+        raise NoTranscriptFound('abcdefghijk', language_codes, None)
+
+
+class InstanceApi:
+    """The 1.x instance API: list() only, no list_transcripts"""
+
+    def __init__(self, fetched):
+        self.fetched = fetched
+
+    def list(self, video_id):
+        return TrackList([SimpleNamespace(language_code='en', is_generated=True, fetch=lambda: self.fetched)])
+
+
+def test_instance_api_results_become_entry_dicts():
+    snippets = [Snippet('hello there', 0.0, 1.5), Snippet('general kenobi', 1.5, 2.0)]
+    for fetched in (FetchedTranscript(snippets), list(snippets)):
+        entries = TranscriptResolver(api=InstanceApi(fetched)).fetch('abcdefghijk')
+        assert entries == [{'text': 'hello there', 'start': 0.0, 'duration': 1.5},
+                           {'text': 'general kenobi', 'start': 1.5, 'duration': 2.0}]
+        assert Transcript.from_entries(entries).text == 'hello there general kenobi'
+
+
+def test_list_transcripts_api_still_works():
+    video_id = synthetic_video_id(3)
+    entries = TranscriptResolver(api=FakeTranscriptApi()).fetch(video_id)
+    assert entries and all(isinstance(entry, dict) and entry['text'] for entry in entries)
+
+
+def test_raw_entries_passes_dicts_through():
+    entries = [{'text': 'a', 'start': 0, 'duration': 1}]
+    assert raw_entries(entries) == entries
+
+
+def track(language_code, is_generated, fetched=None, fetches=None):
+    def fetch():
+        if fetches is not None:
+            fetches.append(language_code)
+        if fetched is None:
+            raise Exception("track is gone")
+        return fetched
+    return SimpleNamespace(language_code=language_code, is_generated=is_generated, fetch=fetch)
+
+
+class ListApi:
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.lists = 0
+
+    def list(self, video_id):
+        self.lists += 1
+        return TrackList(self.tracks)
+
+
+def remembering_resolver(api, choice):
+    resolver = TranscriptResolver(languages=['en', 'de'], choices=TieredCache('tracks_test'), api=api)
+    resolver._remember('abcdefghijk', *choice)
+    return resolver
+
+
+def chosen(resolver):
+    return tuple(json.loads(resolver.choices.get('abcdefghijk').value).values())
+
+
+def test_a_remembered_track_is_fetched_without_ranking_the_others():
+    fetches = []
+    api = ListApi([track('en', False, [{'text': 'manual'}], fetches), track('de', True, [{'text': 'german'}], fetches)])
+    resolver = remembering_resolver(api, ('de', True))
+
+    assert resolver.fetch('abcdefghijk') == [{'text': 'german'}]
+    assert (fetches, api.lists) == (['de'], 1)
+
+
+def test_a_failing_remembered_track_falls_back_to_the_ranked_list():
+    fetches = []
+    api = ListApi([track('de', True, None, fetches), track('en', True, [{'text': 'auto'}], fetches)])
+    resolver = remembering_resolver(api, ('de', True))
+
+    assert resolver.fetch('abcdefghijk') == [{'text': 'auto'}]
+    assert fetches == ['de', 'en']
+    assert chosen(resolver) == ('en', True)
+
+
+def test_a_vanished_remembered_track_is_forgotten():
+    api = ListApi([track('en', True, [{'text': 'auto'}])])
+    resolver = remembering_resolver(api, ('en', False))
+
+    assert resolver.fetch('abcdefghijk') == [{'text': 'auto'}]
+    assert chosen(resolver) == ('en', True)
+
+
+def test_the_choice_is_dropped_when_no_track_can_be_fetched():
+    api = ListApi([track('de', True)])
+    resolver = remembering_resolver(api, ('de', True))
+
+    with pytest.raises(Exception, match="de: track is gone"):
+        resolver.fetch('abcdefghijk')
+    assert resolver.choices.get('abcdefghijk') is None
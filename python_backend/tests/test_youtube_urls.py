@@ -0,0 +1,75 @@
+import pytest
+
+from youtube_urls import extract_playlist_id, extract_video_id, normalize_video_urls
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+PLAYLIST_ID = 'PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf'
+
+VIDEO_URLS = [
+    # watch, with v= first, later in the query, and with extra parameters
+    f'https://www.youtube.com/watch?v={VIDEO_ID}',
+    f'http://youtube.com/watch?v={VIDEO_ID}&t=42s',
+    f'www.youtube.com/watch?feature=share&v={VIDEO_ID}',
+    f'youtube.com/watch/?v={VIDEO_ID}#comments',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&list={PLAYLIST_ID}&index=3',
+    # youtu.be
+    f'https://youtu.be/{VIDEO_ID}',
+    f'youtu.be/{VIDEO_ID}?si=abc123',
+    # shorts, embed, live and the older /v/ and /e/ paths
+    f'https://www.youtube.com/shorts/{VIDEO_ID}',
+    f'https://www.youtube.com/embed/{VIDEO_ID}?autoplay=1',
+    f'https://www.youtube-nocookie.com/embed/{VIDEO_ID}',
+    f'https://www.youtube.com/live/{VIDEO_ID}?feature=shared',
+    f'https://www.youtube.com/v/{VIDEO_ID}',
+    f'https://www.youtube.com/e/{VIDEO_ID}',
+    # m. and music. hosts, any case
+    f'https://m.youtube.com/watch?v={VIDEO_ID}',
+    f'https://music.youtube.com/watch?v={VIDEO_ID}&list={PLAYLIST_ID}',
+    f'HTTPS://WWW.YOUTUBE.COM/watch?v={VIDEO_ID}',
+    # bare IDs, surrounding whitespace ignored
+    VIDEO_ID,
+    f'  {VIDEO_ID}\n',
+]
+
+INVALID_URLS = [
+    ('', 'Invalid YouTube URL or video ID'),
+    ('not a url', 'Invalid YouTube URL or video ID'),
+    (VIDEO_ID[:10], 'Invalid YouTube URL or video ID'),
+    (VIDEO_ID + 'X', 'Invalid YouTube URL or video ID'),
+    (f'https://youtu.be/{VIDEO_ID}X', 'Invalid YouTube URL or video ID'),
+    ('https://www.youtube.com/watch?v=', 'Invalid YouTube URL or video ID'),
+    (f'https://vimeo.com/{VIDEO_ID}', 'Invalid YouTube URL or video ID'),
+    (f'https://www.youtube.com/channel/{VIDEO_ID}', 'Invalid YouTube URL or video ID'),
+    (f'https://www.youtube.com/playlist?list={PLAYLIST_ID}', 'Playlist URL without a video ID'),
+]
+
+
+@pytest.mark.parametrize('url', VIDEO_URLS)
+def test_extract_video_id(url):
+    assert extract_video_id(url) == VIDEO_ID
+
+
+@pytest.mark.parametrize('url, error', INVALID_URLS)
+def test_extract_video_id_rejects(url, error):
+    with pytest.raises(ValueError, match=error):
+        extract_video_id(url)
+
+
+@pytest.mark.parametrize('url', [
+    f'https://www.youtube.com/playlist?list={PLAYLIST_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&list={PLAYLIST_ID}',
+    f'https://music.youtube.com/playlist?list={PLAYLIST_ID}',
+    PLAYLIST_ID,
+])
+def test_extract_playlist_id(url):
+    assert extract_playlist_id(url) == PLAYLIST_ID
+
+
+def test_normalize_matches_extract_for_every_form():
+    urls = VIDEO_URLS + [url for url, _ in INVALID_URLS]
+    result = normalize_video_urls(urls)
+    assert result['video_ids'] == [VIDEO_ID]
+    assert result['positions'] == [0]
+    assert result['duplicates'] == len(VIDEO_URLS) - 1
+    assert [(item['input'], item['error']) for item in result['invalid']] == INVALID_URLS
+    assert result['playlists'] == [PLAYLIST_ID]
@@ -0,0 +1,56 @@
+"""
+Local prompt token counting. Uses tiktoken when it is installed and falls back
+to a characters-per-token estimate otherwise.
+"""
+import math
+import re
+from typing import List
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except Exception:  # not installed, or encoding files unavailable offline
+    _encoding = None
+
+# Average for English prose with OpenAI tokenizers
+CHARS_PER_TOKEN = 4.0
+
+SENTENCE_RE = re.compile(r'[^.!?]+[.!?]*\s*')
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_by_token_budget(text: str, budget: int) -> List[str]:
+    """
+    Split text into consecutive pieces of at most `budget` tokens, breaking on
+    sentence boundaries (or word boundaries for over-long sentences)
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(''.join(current).strip())
+        current, current_tokens = [], 0
+
+    for sentence in SENTENCE_RE.findall(text):
+        tokens = count_tokens(sentence)
+        if tokens > budget:
+            flush()
+            words = sentence.split()
+            step = max(1, len(words) * budget // tokens)
+            for start in range(0, len(words), step):
+                chunks.append(' '.join(words[start:start + step]))
+            continue
+        if current_tokens + tokens > budget:
+            flush()
+        current.append(sentence)
+        current_tokens += tokens
+    flush()
+    return [chunk for chunk in chunks if chunk]
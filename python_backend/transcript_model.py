@@ -0,0 +1,121 @@
+"""
+Segment-preserving transcript: the cleaned full text plus, per caption
+segment, its character offset into that text and its start/duration in
+seconds, held in flat arrays rather than a list of dicts
+"""
+import base64
+import bisect
+import json
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+# Annotations like [Music] and any whitespace around them collapse to one space, in one pass
+CLEANUP_RE = re.compile(r'(?:\s|\[[^\]]*\])+')
+
+FORMAT_VERSION = 1
+
+
+def clean_segment_text(text: str) -> str:
+    return CLEANUP_RE.sub(' ', text).strip()
+
+
+class Transcript:
+    __slots__ = ('text', 'offsets', 'starts', 'durations')
+
+    def __init__(self, text: str, offsets: Optional[array] = None,
+                 starts: Optional[array] = None, durations: Optional[array] = None):
+        self.text = text
+        self.offsets = offsets if offsets is not None else array('l')
+        self.starts = starts if starts is not None else array('d')
+        self.durations = durations if durations is not None else array('d')
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]]) -> 'Transcript':
+        """Build from youtube_transcript_api entries ({'text', 'start', 'duration'}), cleaning each segment once"""
+        parts: List[str] = []
+        offsets = array('l')
+        starts = array('d')
+        durations = array('d')
+        length = 0
+        for entry in entries:
+            text = clean_segment_text(entry['text'])
+            if not text:
+                continue
+            if parts:
+                length += 1  # joining space
+            offsets.append(length)
+            starts.append(float(entry.get('start', 0.0)))
+            durations.append(float(entry.get('duration', 0.0)))
+            parts.append(text)
+            length += len(text)
+        return cls(' '.join(parts), offsets, starts, durations)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @property
+    def has_timestamps(self) -> bool:
+        return len(self.offsets) > 0
+
+    def time_at(self, offset: int) -> Optional[float]:
+        """Start time (seconds) of the segment containing character offset"""
+        if not self.offsets:
+            return None
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        return self.starts[max(0, i)]
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Segments as API-friendly dicts"""
+        bounds = list(self.offsets[1:]) + [len(self.text) + 1]
+        return [
+            {"text": self.text[self.offsets[i]:bounds[i] - 1], "start": self.starts[i], "duration": self.durations[i]}
+            for i in range(len(self.offsets))
+        ]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the payload (text plus arrays)"""
+        return (len(self.text.encode('utf-8'))
+                + self.offsets.itemsize * len(self.offsets)
+                + self.starts.itemsize * len(self.starts)
+                + self.durations.itemsize * len(self.durations))
+
+    def dumps(self) -> str:
+        """Compact serialized form: the text plus the three arrays packed as base64 bytes"""
+        return json.dumps({
+            "v": FORMAT_VERSION,
+            "text": self.text,
+            "offsets": base64.b64encode(array('q', self.offsets).tobytes()).decode('ascii'),
+            "starts": base64.b64encode(self.starts.tobytes()).decode('ascii'),
+            "durations": base64.b64encode(self.durations.tobytes()).decode('ascii'),
+        }, ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, raw: str) -> 'Transcript':
+        """Inverse of dumps; plain strings (entries cached before timestamps were kept) load without segments"""
+        if not raw.startswith('{"v": '):
+            return cls(raw)
+        data = json.loads(raw)
+        offsets = array('q')
+        offsets.frombytes(base64.b64decode(data["offsets"]))
+        starts = array('d')
+        starts.frombytes(base64.b64decode(data["starts"]))
+        durations = array('d')
+        durations.frombytes(base64.b64decode(data["durations"]))
+        return cls(data["text"], array('l', offsets), starts, durations)
+
+
+class TranscriptCodec:
+    """TieredCache codec storing Transcript objects"""
+
+    @staticmethod
+    def dumps(value: Transcript) -> str:
+        return value.dumps()
+
+    @staticmethod
+    def loads(raw: str) -> Transcript:
+        return Transcript.loads(raw)
+
+    @staticmethod
+    def size(value: Transcript) -> int:
+        return value.nbytes()
@@ -0,0 +1,145 @@
+"""
+Picks and fetches the best transcript track for a video with a single listing
+call, instead of trying get_transcript with one language list after another
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
+
+from cache import TieredCache, cache_db_path
+
+DEFAULT_LANGUAGES = 'en,en-US,en-GB,en-AU'
+
+
+class NoUsableTranscriptError(Exception):
+    """The video lists no transcript tracks at all"""
+
+
+def youtube_api() -> Any:
+    """YouTubeTranscriptApi as the installed version expects it: an instance on 1.x, the class on 0.6.x"""
+    return YouTubeTranscriptApi() if hasattr(YouTubeTranscriptApi, 'list') else YouTubeTranscriptApi
+
+
+def list_tracks(api: Any, video_id: str) -> Any:
+    """The video's TranscriptList through list() (1.x) or list_transcripts() (0.6.x)"""
+    if hasattr(api, 'list'):
+        return api.list(video_id)
+    return api.list_transcripts(video_id)
+
+
+def raw_entries(fetched: Any) -> List[Dict[str, Any]]:
+    """Entry dicts from a fetch: 1.x returns a FetchedTranscript of snippet objects, 0.6.x the dicts"""
+    if hasattr(fetched, 'to_raw_data'):
+        return fetched.to_raw_data()
+    return [entry if isinstance(entry, dict) else
+            {'text': entry.text, 'start': entry.start, 'duration': entry.duration}
+            for entry in fetched]
+
+
+class TranscriptResolver:
+    """
+    Ranks a video's tracks once: any track in a preferred language beats the
+    rest, then manual beats auto-generated (when prefer_manual), then the
+    language order. A region variant (en-IN) counts as its base language (en)
+    ranked just after the exact codes. The chosen (language, generated) pair is
+    remembered per video so later fetches go straight to that track.
+    """
+
+    def __init__(self, languages: Optional[List[str]] = None, prefer_manual: bool = True,
+                 choices: Optional[TieredCache] = None, api: Any = None):
+        self.languages = [code.strip() for code in (languages or DEFAULT_LANGUAGES.split(',')) if code.strip()]
+        self.prefer_manual = prefer_manual
+        self.choices = choices
+        # Anything with list(video_id) or list_transcripts(video_id); local stand-ins (standins.py) replace YouTube here
+        self.api = api if api is not None else youtube_api()
+
+    def rank(self, language_code: str, is_generated: bool) -> Tuple[int, int, int]:
+        if language_code in self.languages:
+            language_rank = self.languages.index(language_code)
+        else:
+            base = language_code.split('-')[0]
+            bases = [code.split('-')[0] for code in self.languages]
+            language_rank = len(self.languages) + bases.index(base) if base in bases else -1
+        matched = 0 if language_rank >= 0 else 1
+        generated = int(is_generated) if self.prefer_manual else 0
+        return matched, generated, language_rank if language_rank >= 0 else 0
+
+    def fetch(self, video_id: str) -> List[Dict[str, Any]]:
+        """
+        Transcript entries ({'text', 'start', 'duration'}) of the best track.
+        The listing is the only source of the (signed, short-lived) track URLs,
+        so it is one call either way; a remembered choice skips the ranking and
+        the tracks that failed before it. If the remembered track is gone or
+        fails, the choice is dropped and the listing ranked afresh.
+        """
+        transcript_list = list_tracks(self.api, video_id)
+
+        skipped, errors = None, []
+        remembered = self._remembered(video_id)
+        if remembered is not None:
+            track = self._find(transcript_list, *remembered)
+            if track is not None:
+                try:
+                    return raw_entries(track.fetch())
+                except Exception as e:
+                    skipped = remembered
+                    errors.append(f"{track.language_code}: {str(e)}")
+            self._forget(video_id)
+
+        tracks = sorted(
+            (t for t in transcript_list if (t.language_code, t.is_generated) != skipped),
+            key=lambda t: self.rank(t.language_code, t.is_generated)
+        )
+        if not tracks and skipped is None:
+            raise NoUsableTranscriptError("No transcripts available for this video")
+
+        for track in tracks:
+            try:
+                entries = raw_entries(track.fetch())
+            except Exception as e:
+                errors.append(f"{track.language_code}: {str(e)}")
+                continue
+            self._remember(video_id, track.language_code, track.is_generated)
+            return entries
+        raise Exception(f"Could not fetch any transcript track ({'; '.join(errors)})")
+
+    def _find(self, transcript_list: Any, language_code: str, is_generated: bool) -> Optional[Any]:
+        try:
+            if is_generated:
+                return transcript_list.find_generated_transcript([language_code])
+            return transcript_list.find_manually_created_transcript([language_code])
+        except NoTranscriptFound:
+            return None
+
+    def _remembered(self, video_id: str) -> Optional[Tuple[str, bool]]:
+        if self.choices is None:
+            return None
+        entry = self.choices.get(video_id)
+        if entry is None:
+            return None
+        choice = json.loads(entry.value)
+        return choice["language_code"], choice["is_generated"]
+
+    def _forget(self, video_id: str) -> None:
+        if self.choices is not None:
+            self.choices.delete(video_id)
+
+    def _remember(self, video_id: str, language_code: str, is_generated: bool) -> None:
+        if self.choices is not None:
+            self.choices.set(video_id, json.dumps({"language_code": language_code, "is_generated": is_generated}))
+
+
+def default_resolver() -> TranscriptResolver:
+    """Resolver configured from TRANSCRIPT_LANGUAGES / TRANSCRIPT_PREFER_MANUAL, sharing the SQLite cache"""
+    return TranscriptResolver(
+        languages=os.environ.get('TRANSCRIPT_LANGUAGES', DEFAULT_LANGUAGES).split(','),
+        prefer_manual=os.environ.get('TRANSCRIPT_PREFER_MANUAL', '1') == '1',
+        choices=TieredCache(
+            'transcript_tracks',
+            db_path=cache_db_path(),
+            max_memory_bytes=4 * 1024 * 1024,
+            ttl=float(os.environ.get('TRANSCRIPT_TRACK_TTL', 30 * 24 * 3600))
+        )
+    )
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Long-lived transcript worker speaking JSON lines over stdin/stdout.
+
+Request:  {"id": "1", "video_id": "dQw4w9WgXcQ"}
+Response: {"id": "1", "transcript": "..."} or {"id": "1", "error": "..."}
+
+The Node server keeps a pool of these running (server/transcript-service.ts),
+so interpreter startup and the youtube_transcript_api import are paid once per
+worker instead of once per request. Each worker fetches up to
+TRANSCRIPT_WORKER_THREADS transcripts at once, answering in completion order.
+Transcripts share the backend's SQLite cache when it is enabled.
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from cache import TieredCache, cache_db_path
+from transcript_model import Transcript, TranscriptCodec
+
+try:
+    from transcript_resolver import default_resolver
+except ImportError:
+    print("ERROR: youtube-transcript-api not installed. Please run: pip install youtube-transcript-api", file=sys.stderr)
+    sys.exit(1)
+
+transcript_cache = TieredCache(
+    'transcripts',
+    db_path=cache_db_path(),
+    max_memory_bytes=int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    ttl=float(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600)),
+    codec=TranscriptCodec
+)
+
+transcript_resolver = default_resolver()
+
+
+def get_transcript(video_id: str) -> str:
+    cached = transcript_cache.get(video_id)
+    if cached is not None and not cached.negative:
+        return cached.value.text
+
+    transcript = Transcript.from_entries(transcript_resolver.fetch(video_id))
+    if len(transcript.text) < 10:
+        raise Exception("Transcript too short or empty")
+    transcript_cache.set(video_id, transcript)
+    return transcript.text
+
+
+def handle(line: str) -> dict:
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return {"id": None, "error": "Invalid JSON request"}
+    request_id = message.get("id")
+    try:
+        return {"id": request_id, "transcript": get_transcript(str(message["video_id"]))}
+    except Exception as e:
+        return {"id": request_id, "error": f"Could not fetch transcript: {str(e)}"}
+
+
+WORKER_THREADS = int(os.environ.get('TRANSCRIPT_WORKER_THREADS', 8))
+_stdout_lock = threading.Lock()
+
+
+def respond(line: str) -> None:
+    response = json.dumps(handle(line), ensure_ascii=False) + '\n'
+    with _stdout_lock:
+        sys.stdout.write(response)
+        sys.stdout.flush()
+
+
+def main() -> None:
+    with ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='transcript') as pool:
+        for line in sys.stdin:
+            if line.strip():
+                pool.submit(respond, line)
+
+
+if __name__ == '__main__':
+    main()
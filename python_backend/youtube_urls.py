@@ -0,0 +1,123 @@
+"""
+YouTube URL parsing: video and playlist IDs from every common URL form, with
+one precompiled pattern per ID kind, plus bulk normalization for batch and
+playlist imports.
+
+Recognized video forms (with or without scheme, on www., m., music. or
+youtube-nocookie.com):
+
+    youtube.com/watch?v=ID (v= anywhere in the query), youtu.be/ID,
+    youtube.com/embed/ID, /v/ID, /e/ID, /shorts/ID, /live/ID, and a bare ID
+"""
+import re
+from typing import Any, Dict, Iterable, List
+
+VIDEO_ID_PATTERN = r'[A-Za-z0-9_-]{11}'
+
+_VIDEO_RE = re.compile(
+    r'''^\s*(?:
+        (?:https?://)?(?:(?:www|m|music)\.)?
+        (?:
+            youtube(?:-nocookie)?\.com/
+            (?:watch/?\?(?:[^#]*?&)?v=|embed/|v/|e/|shorts/|live/)
+            (?P<path_id>%(id)s)
+          | youtu\.be/(?P<short_id>%(id)s)
+        )
+        (?![A-Za-z0-9_-])
+      | (?P<bare_id>%(id)s)\s*$
+    )''' % {'id': VIDEO_ID_PATTERN},
+    re.VERBOSE | re.IGNORECASE
+)
+
+_PLAYLIST_RE = re.compile(
+    r'^\s*(?:https?://)?(?:(?:www|m|music)\.)?(?:youtube\.com|youtu\.be)/[^#]*?[?&]list=(?P<list_id>[A-Za-z0-9_-]{2,})',
+    re.IGNORECASE
+)
+
+_BARE_PLAYLIST_RE = re.compile(r'\s*((?:PL|UU|LL|FL|OL|RD)[A-Za-z0-9_-]{10,})\s*')
+
+_CHANNEL_RE = re.compile(
+    r'^\s*(?:(?:https?://)?(?:(?:www|m)\.)?youtube\.com/channel/)?(?P<channel_id>UC[A-Za-z0-9_-]{22})(?![A-Za-z0-9_-])'
+)
+
+
+def extract_video_id(url: str) -> str:
+    """Extract YouTube video ID from various URL formats"""
+    match = _VIDEO_RE.match(url)
+    if match:
+        return match.group('path_id') or match.group('short_id') or match.group('bare_id')
+    if 'list=' in url and _PLAYLIST_RE.match(url):
+        raise ValueError("Playlist URL without a video ID")
+    raise ValueError("Invalid YouTube URL or video ID")
+
+
+def extract_playlist_id(url: str) -> str:
+    """Playlist ID from a playlist (or watch-in-playlist) URL, or a bare playlist ID"""
+    match = _PLAYLIST_RE.match(url)
+    if match:
+        return match.group('list_id')
+    bare = _BARE_PLAYLIST_RE.fullmatch(url)
+    if bare:
+        return bare.group(1)
+    raise ValueError("Invalid YouTube playlist URL or ID")
+
+
+def extract_channel_id(url: str) -> str:
+    """Channel ID (UC...) from a youtube.com/channel/ URL or a bare channel ID; @handles need an API lookup"""
+    match = _CHANNEL_RE.match(url)
+    if match:
+        return match.group('channel_id')
+    raise ValueError("Invalid YouTube channel URL or ID (use the /channel/UC... form)")
+
+
+def uploads_playlist_id(channel_id: str) -> str:
+    """Every channel's uploads are the playlist UU + the channel ID without its UC prefix"""
+    return 'UU' + channel_id[2:]
+
+
+def normalize_video_urls(urls: Iterable[Any]) -> Dict[str, Any]:
+    """
+    Bulk parse for imports: unique video IDs in first-seen order (and the
+    input position of each), the inputs that name no video (with their
+    positions and the reason), how many were repeats, and the playlist IDs
+    mentioned along the way so callers can expand them. Pure playlist URLs
+    are reported both as invalid (carrying their playlist_id) and under
+    playlists.
+    """
+    video_ids: List[str] = []
+    positions: List[int] = []
+    invalid: List[Dict[str, Any]] = []
+    playlists: List[str] = []
+    seen = set()
+    seen_playlists = set()
+    duplicates = 0
+    match_video = _VIDEO_RE.match
+    for index, url in enumerate(urls):
+        text = url if isinstance(url, str) else str(url)
+        match = match_video(text)
+        playlist = _PLAYLIST_RE.match(text) if 'list=' in text else None
+        if playlist and playlist.group('list_id') not in seen_playlists:
+            seen_playlists.add(playlist.group('list_id'))
+            playlists.append(playlist.group('list_id'))
+        if match is None:
+            if playlist:
+                invalid.append({"index": index, "input": url, "error": "Playlist URL without a video ID",
+                                "playlist_id": playlist.group('list_id')})
+            else:
+                invalid.append({"index": index, "input": url, "error": "Invalid YouTube URL or video ID"})
+            continue
+        video_id = match.group('path_id') or match.group('short_id') or match.group('bare_id')
+        if video_id in seen:
+            duplicates += 1
+            continue
+        seen.add(video_id)
+        video_ids.append(video_id)
+        positions.append(index)
+    return {
+        "video_ids": video_ids,
+        "positions": positions,
+        "invalid": invalid,
+        "duplicates": duplicates,
+        "playlists": playlists,
+    }
+
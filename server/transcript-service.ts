@@ -1,4 +1,5 @@
-import { spawn } from 'child_process';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import path from 'path';
 import OpenAI from 'openai';
 
 const openai = new OpenAI({
@@ -50,86 +51,171 @@ export function extractVideoId(url: string): string {
   throw new Error('Invalid YouTube URL or video ID');
 }
 
-export function getTranscript(videoId: string): Promise<string> {
-  return new Promise((resolve, reject) => {
-    // Use Python subprocess to get transcript
-    const pythonScript = `
-import sys
-import json
-import re
-
-try:
-    from youtube_transcript_api import YouTubeTranscriptApi
-except ImportError:
-    print("ERROR: youtube-transcript-api not installed. Please run: pip install youtube-transcript-api", file=sys.stderr)
-    sys.exit(1)
-
-try:
-    video_id = sys.argv[1]
-    
-    # Try to get transcript with different language options
-    try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-    except Exception as e1:
-        try:
-            # Try with auto-generated English
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-        except Exception as e2:
-            try:
-                # Try to get any available transcript
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en-US', 'en-GB', 'en-AU'])
-            except Exception as e3:
-                # Last resort - try to list available transcripts and use the first one
-                try:
-                    available_transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
-                    for transcript in available_transcripts:
-                        try:
-                            transcript_list = transcript.fetch()
-                            break
-                        except:
-                            continue
-                    else:
-                        raise Exception("No transcripts available for this video")
-                except Exception as e4:
-                    raise Exception(f"Could not fetch any transcript: {str(e4)}")
-    
-    # Combine all transcript text
-    full_transcript = ' '.join([entry['text'] for entry in transcript_list])
-    
-    # Clean up the transcript
-    full_transcript = re.sub(r'\\[.*?\\]', '', full_transcript)  # Remove annotations
-    full_transcript = re.sub(r'\\s+', ' ', full_transcript)  # Normalize whitespace
-    
-    if len(full_transcript.strip()) < 10:
-        raise Exception("Transcript too short or empty")
-    
-    print(full_transcript.strip())
-    
-except Exception as e:
-    print(f"ERROR: Could not fetch transcript: {str(e)}", file=sys.stderr)
-    sys.exit(1)
-`;
+interface PendingTranscript {
+  resolve: (transcript: string) => void;
+  reject: (error: Error) => void;
+}
+
+interface QueuedTranscript extends PendingTranscript {
+  id: string;
+  videoId: string;
+}
+
+interface InFlightTranscript extends PendingTranscript {
+  timer: NodeJS.Timeout;
+}
+
+const TRANSCRIPT_WORKER_SCRIPT = process.env.TRANSCRIPT_WORKER_SCRIPT
+  || path.resolve(process.cwd(), 'python_backend', 'transcript_worker.py');
+const TRANSCRIPT_WORKERS = parseInt(process.env.TRANSCRIPT_WORKERS || '2', 10);
+// Fetches each worker runs at once (its thread pool); more requests wait here, not in the worker
+const TRANSCRIPT_WORKER_THREADS = Math.max(1, parseInt(process.env.TRANSCRIPT_WORKER_THREADS || '8', 10));
+const TRANSCRIPT_TIMEOUT_MS = parseInt(process.env.TRANSCRIPT_TIMEOUT_MS || '60000', 10);
 
-    const python = spawn('python', ['-c', pythonScript, videoId]);
-    let transcript = '';
-    let error = '';
+// A persistent `python transcript_worker.py` process speaking JSON lines, so
+// interpreter startup and the youtube_transcript_api import happen once.
+// Requests are written only while the worker has a free thread, and each
+// one's timeout starts when it is written, so waiting in line never counts.
+class TranscriptWorker {
+  private process: ChildProcessWithoutNullStreams | null = null;
+  private buffer = '';
+  private stderr = '';
+  private queue: QueuedTranscript[] = [];
+  private inFlight = new Map<string, InFlightTranscript>();
+  // Timed out but still holding a worker thread until the fetch returns
+  private abandoned = new Set<string>();
 
-    python.stdout.on('data', (data) => {
-      transcript += data.toString();
+  get load(): number {
+    return this.queue.length + this.inFlight.size + this.abandoned.size;
+  }
+
+  request(id: string, videoId: string): Promise<string> {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id, videoId, resolve, reject });
+      this.drain();
     });
+  }
 
-    python.stderr.on('data', (data) => {
-      error += data.toString();
+  private drain() {
+    while (this.queue.length > 0 && this.inFlight.size + this.abandoned.size < TRANSCRIPT_WORKER_THREADS) {
+      const { id, videoId, resolve, reject } = this.queue.shift()!;
+      const child = this.ensureStarted();
+      const timer = setTimeout(() => this.timeOut(id), TRANSCRIPT_TIMEOUT_MS);
+      this.inFlight.set(id, { resolve, reject, timer });
+      child.stdin.write(JSON.stringify({ id, video_id: videoId }) + '\n');
+    }
+  }
+
+  private timeOut(id: string) {
+    const pending = this.inFlight.get(id);
+    if (!pending) return;
+    this.inFlight.delete(id);
+    this.abandoned.add(id);
+    pending.reject(new Error('Timed out fetching transcript'));
+    // Only when every thread is stuck is the worker replaced; nothing else is in flight then
+    if (this.abandoned.size >= TRANSCRIPT_WORKER_THREADS) {
+      this.restart(new Error('Transcript worker stopped responding'));
+    }
+  }
+
+  private ensureStarted(): ChildProcessWithoutNullStreams {
+    if (this.process) return this.process;
+
+    const child = spawn('python', [TRANSCRIPT_WORKER_SCRIPT], {
+      env: { ...process.env, TRANSCRIPT_WORKER_THREADS: String(TRANSCRIPT_WORKER_THREADS) },
     });
+    this.process = child;
+    this.buffer = '';
+    this.stderr = '';
 
-    python.on('close', (code) => {
-      if (code === 0 && transcript.trim()) {
-        resolve(transcript.trim());
-      } else {
-        reject(new Error(error || 'Failed to fetch transcript'));
+    child.stdout.on('data', (data) => {
+      this.buffer += data.toString();
+      let newline: number;
+      while ((newline = this.buffer.indexOf('\n')) >= 0) {
+        const line = this.buffer.slice(0, newline);
+        this.buffer = this.buffer.slice(newline + 1);
+        if (line.trim()) this.handleLine(line);
       }
     });
-  });
+
+    child.stderr.on('data', (data) => {
+      this.stderr = (this.stderr + data.toString()).slice(-4000);
+    });
+
+    child.on('error', (error) => this.failInFlight(child, error));
+    child.on('close', () => {
+      this.failInFlight(child, new Error(this.stderr || 'Transcript worker exited'));
+    });
+    child.stdin.on('error', () => {
+      // Surfaced through 'close'
+    });
+
+    return child;
+  }
+
+  private handleLine(line: string) {
+    let message: { id: string; transcript?: string; error?: string };
+    try {
+      message = JSON.parse(line);
+    } catch {
+      return;
+    }
+    if (this.abandoned.delete(message.id)) {
+      this.drain();
+      return;
+    }
+    const pending = this.inFlight.get(message.id);
+    if (!pending) return;
+    this.inFlight.delete(message.id);
+    clearTimeout(pending.timer);
+    if (message.transcript) {
+      pending.resolve(message.transcript);
+    } else {
+      pending.reject(new Error(message.error || 'Failed to fetch transcript'));
+    }
+    this.drain();
+  }
+
+  private restart(error: Error) {
+    const child = this.process;
+    if (child) {
+      this.failInFlight(child, error);
+      child.kill();
+    }
+  }
+
+  // The process is gone: what it was running fails, queued requests go to a fresh one
+  private failInFlight(child: ChildProcessWithoutNullStreams, error: Error) {
+    if (this.process !== child) return;
+    this.process = null;
+    for (const pending of Array.from(this.inFlight.values())) {
+      clearTimeout(pending.timer);
+      pending.reject(error);
+    }
+    this.inFlight.clear();
+    this.abandoned.clear();
+    this.drain();
+  }
+}
+
+class TranscriptWorkerPool {
+  private workers: TranscriptWorker[];
+  private nextId = 0;
+
+  constructor(size: number) {
+    this.workers = Array.from({ length: Math.max(1, size) }, () => new TranscriptWorker());
+  }
+
+  getTranscript(videoId: string): Promise<string> {
+    const worker = this.workers.reduce((least, w) => (w.load < least.load ? w : least));
+    return worker.request(String(++this.nextId), videoId);
+  }
+}
+
+const transcriptWorkers = new TranscriptWorkerPool(TRANSCRIPT_WORKERS);
+
+export function getTranscript(videoId: string): Promise<string> {
+  return transcriptWorkers.getTranscript(videoId);
 }
 
 export async function generateSummaryAndQuestions(